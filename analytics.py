@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+
+from grading import assign_grades, grade_order
+
+# ===========================
+# STATUS ENGINE
+# ===========================
+# Vectorized replacement for the per-row get_status/get_icon helpers that
+# used to live in show_dashboard. Marks are coerced to numbers once and every
+# consumer (Status column, headline metrics, document icons) reads the same masks.
+
+MARK_COLS = ["FYP 1 Marks", "FYP 2 Marks", "LI Marks"]
+DOC_COLS = ["Lapor Diri", "Aku Janji"]
+
+STATUS_LABELS = ["Incomplete", "Ongoing", "Graded"]
+STATUS_DTYPE = pd.CategoricalDtype(STATUS_LABELS)
+
+
+def numeric_marks(df):
+    """Mark columns as floats ('-', '' and junk -> NaN). Missing columns are all-NaN."""
+    return pd.DataFrame(
+        {c: pd.to_numeric(df[c], errors="coerce") if c in df.columns else np.nan for c in MARK_COLS},
+        index=df.index
+    )
+
+
+def status_masks(df, marks=None):
+    """
+    Boolean masks over df (raw values, before icon conversion):
+    - '<doc>_missing': document path '' or NULL/NaN (nothing uploaded). Icon, Status and
+      the pending metrics all use this; the row-wise code counted NULL as missing for
+      the icon only, so such rows were Ongoing with a ❌ next to them.
+    - 'docs_missing': any document missing
+    - 'graded': every subject has a mark > 0
+    - 'grading_pending': no subject has a mark (NULL or 0)
+    """
+    marks = numeric_marks(df) if marks is None else marks
+    masks = {}
+    for c in DOC_COLS:
+        col = df[c] if c in df.columns else pd.Series(None, index=df.index, dtype=object)
+        masks[f"{c}_missing"] = (col.isna() | (col == "")).to_numpy()
+    masks["docs_missing"] = np.logical_or.reduce([masks[f"{c}_missing"] for c in DOC_COLS])
+
+    vals = marks.to_numpy()
+    masks["graded"] = (vals > 0).all(axis=1)
+    masks["grading_pending"] = (np.isnan(vals) | (vals == 0)).all(axis=1)
+    return masks
+
+
+def classify_status(masks):
+    """Incomplete (docs missing) > Graded (all marks) > Ongoing, as a categorical."""
+    status = np.select([masks["docs_missing"], masks["graded"]], ["Incomplete", "Graded"], default="Ongoing")
+    return pd.Categorical(status, dtype=STATUS_DTYPE)
+
+
+def doc_icons(masks, doc_col):
+    return np.where(masks[f"{doc_col}_missing"], "❌", "✅")
+
+
+# ===========================
+# SUBJECT AGGREGATES
+# ===========================
+# All three subject summaries (FYP 1, FYP 2, LI) in one grouped pass over a
+# long-format frame. app.py caches the result per (roster version, filters).
+
+SUBJECTS = {
+    "FYP 1": {"mark": "FYP 1 Marks", "sv": "FYP 1 SV", "state": "FYP_State"},
+    "FYP 2": {"mark": "FYP 2 Marks", "sv": "FYP 2 SV", "state": "FYP_State"},
+    "LI": {"mark": "LI Marks", "sv": "LI Industry SV", "state": "LI_State"},
+}
+
+def _column(df, col, default="-"):
+    return df[col] if col in df.columns else pd.Series(default, index=df.index)
+
+
+def subject_summaries(df, scales=None):
+    """
+    {subject: {total, assign_rate, grade_rate, avg_marks, state_counts, grade_counts}}
+    state_counts: DataFrame[State, Count] ('-' excluded)
+    grade_counts: DataFrame[Grade Range, Count] over grading.grade_order(scales)
+    scales: stored grade scales {(program, cohort): GradeScale}, default scale if empty
+    """
+    total = len(df)
+    long = pd.concat([
+        pd.DataFrame({
+            "Subject": subject,
+            "Mark": pd.to_numeric(_column(df, cols["mark"], np.nan), errors="coerce").to_numpy(),
+            "Assigned": (_column(df, cols["sv"]).notna() & (_column(df, cols["sv"]) != "-")).to_numpy(),
+            "State": _column(df, cols["state"]).to_numpy(),
+            "Program": _column(df, "Program", None).to_numpy(),
+            "Cohort": _column(df, "Cohort", None).to_numpy(),
+        })
+        for subject, cols in SUBJECTS.items()
+    ], ignore_index=True)
+    long["Graded"] = long["Mark"] > 0
+
+    graded = long[long["Graded"]]
+    by_subject = long.groupby("Subject", sort=False).agg(assigned=("Assigned", "sum"), graded=("Graded", "sum")).reindex(list(SUBJECTS), fill_value=0)
+    avg_marks = graded.groupby("Subject")["Mark"].mean()
+    states = long[long["State"].notna() & (long["State"] != "-")].groupby(["Subject", "State"]).size()
+    grades = graded.assign(
+        Grade=assign_grades(graded["Mark"], graded["Program"], graded["Cohort"], scales)
+    ).groupby(["Subject", "Grade"]).size()
+    all_grades = grade_order(scales)
+
+    summaries = {}
+    for subject in SUBJECTS:
+        row = by_subject.loc[subject]
+        sc = states[subject].sort_values(ascending=False) if subject in states.index.get_level_values(0) else pd.Series(dtype=int)
+        gc = grades[subject] if subject in grades.index.get_level_values(0) else pd.Series(dtype=int)
+        summaries[subject] = {
+            "total": total,
+            "assign_rate": float(row["assigned"] / total * 100) if total > 0 else 0.0,
+            "grade_rate": float(row["graded"] / total * 100) if total > 0 else 0.0,
+            "avg_marks": float(avg_marks.get(subject, 0) or 0),
+            "state_counts": pd.DataFrame({"State": sc.index, "Count": sc.to_numpy()}),
+            "grade_counts": pd.DataFrame({"Grade Range": all_grades, "Count": gc.reindex(all_grades, fill_value=0).to_numpy()}),
+        }
+    return summaries
+
+
+def subject_charts(subject, summary):
+    """Altair charts for one subject summary: {'state': chart or None, 'grades': chart}."""
+    import altair as alt
+
+    y_max = max(summary["total"], 5) # Fixed Y-scale based on total students
+
+    state_chart = None
+    if not summary["state_counts"].empty:
+        base = alt.Chart(summary["state_counts"]).encode(
+            x=alt.X('State', sort='-y', axis=alt.Axis(labelAngle=-45)),
+            y=alt.Y('Count',
+                    axis=alt.Axis(tickMinStep=1, title='Number of Students', format='d'),
+                    scale=alt.Scale(domain=[0, y_max])
+                   ),
+            tooltip=['State', 'Count']
+        )
+        state_chart = (base.mark_bar() + base.mark_text(align='center', dy=-5).encode(text='Count')).properties(
+            title=f"Distribution for {subject}"
+        )
+
+    base_g = alt.Chart(summary["grade_counts"]).encode(
+        x=alt.X('Grade Range', sort=summary["grade_counts"]["Grade Range"].tolist(), axis=alt.Axis(labelAngle=0)),
+        y=alt.Y('Count',
+                title='Students',
+                axis=alt.Axis(tickMinStep=1, format='d'),
+                scale=alt.Scale(domain=[0, y_max])
+               ),
+        tooltip=['Grade Range', 'Count']
+    )
+    grade_chart = base_g.mark_bar(color='teal') + base_g.mark_text(align='center', dy=-5, fontSize=14).encode(
+        text=alt.Text('Count', format='.0f')
+    )
+    return {"state": state_chart, "grades": grade_chart}
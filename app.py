@@ -2,47 +2,70 @@ import streamlit as st
 import database as db
 import pandas as pd
 import os
-import smtplib
 import base64
-import requests
+import hashlib
+import tempfile
+import time
 import supabase_handler as sb
+from analytics import status_masks, classify_status, doc_icons, subject_summaries, subject_charts
+from marking import mark_changes, invalid_marks, mark_patches, MARK_FIELDS, edit_baseline, baseline_row
+from grading import GradeScale, DEFAULT_SCALE, scales_from_frame, scales_key, assign_grades
+from roster_cache import RosterCache
+from roster_store import SnapshotStore
+from change_feed import ChangeFeed, SupabaseRealtimeSource
+from session_cache import IdentityCache
+from credentials import is_hashed
+from mail_queue import MailQueue, MailWorker, SmtpSender, DEFAULT_RATE_PER_MINUTE, DEFAULT_DAILY_CAP, CAP_WINDOW
+import campaigns
+from roster_export import export_roster, FORMATS as EXPORT_FORMATS
+from reports import generate_reports, REPORT_SUBJECTS
+from roster_index import StaffIndex, SearchIndex, resolve_selection, matrix_indexed, sort_for_editor, page_bounds, DASHBOARD_ROLES, STAFF_ROLE_COLUMNS, SEARCH_FIELDS, roster_version
+
+
+def mail_limits():
+    """(rate per minute, daily cap) for the mail account, from secrets; a cap of 0 disables it."""
+    try:
+        return (int(st.secrets.get("EMAIL_RATE_PER_MINUTE", DEFAULT_RATE_PER_MINUTE)),
+                int(st.secrets.get("EMAIL_DAILY_CAP", DEFAULT_DAILY_CAP)))
+    except Exception:
+        return DEFAULT_RATE_PER_MINUTE, DEFAULT_DAILY_CAP
 
-from email.mime.text import MIMEText
-
-def send_recovery_email(to_email, password):
-    """Sends password recovery email if secrets are configured."""
-    has_secrets = False
+@st.cache_resource(show_spinner=False)
+def get_mailer():
+    """Process-wide outbox + background SMTP worker; None if email secrets are missing."""
     try:
         # Check if secrets exist without throwing error if file is missing
-        if "EMAIL_USER" in st.secrets and "EMAIL_PASSWORD" in st.secrets:
-            has_secrets = True
+        if not ("EMAIL_USER" in st.secrets and "EMAIL_PASSWORD" in st.secrets):
+            return None
     except Exception:
-        pass # Secrets file likely missing
+        return None # Secrets file likely missing
 
-    if not has_secrets:
+    queue = MailQueue()
+    sender = SmtpSender(
+        st.secrets.get("EMAIL_HOST", "smtp.gmail.com"), # Defaulting to Gmail SMTP
+        int(st.secrets.get("EMAIL_PORT", 587)),
+        st.secrets["EMAIL_USER"], st.secrets["EMAIL_PASSWORD"]
+    )
+    rate, cap = mail_limits()
+    MailWorker(queue, sender, rate_per_minute=rate, daily_cap=cap).start()
+    return queue
+
+def send_recovery_email(to_email, password):
+    """Queues a temporary password mail (passwords are stored hashed); returns immediately."""
+    mailer = get_mailer()
+    if mailer is None:
+        # The temporary password is never shown on screen; the current one keeps working
         st.warning("⚠️ Email configuration missing. Please add `EMAIL_USER` and `EMAIL_PASSWORD` to `.streamlit/secrets.toml`.")
-        # Fallback for demo purposes locally
-        st.info(f"[DEV MODE] Simulated Email to {to_email}: Your password is {password}")
         return False
     
-    sender_email = st.secrets["EMAIL_USER"]
-    sender_password = st.secrets["EMAIL_PASSWORD"]
-    
     subject = "WBL System - Password Recovery"
-    body = f"Hello,\n\nYou requested a password recovery.\n\nYour Password: {password}\n\nPlease verify this is you."
-    
-    msg = MIMEText(body)
-    msg['Subject'] = subject
-    msg['From'] = sender_email
-    msg['To'] = to_email
+    body = (f"Hello,\n\nYou requested a password recovery.\n\nYour temporary password: {password}\n\n"
+            f"It is valid for {db.RESET_TTL_HOURS} hours and replaces your current password once you log in with it; "
+            "please change it afterwards. If this wasn't you, ignore this email or contact the coordinator.")
     
     try:
-        # Defaulting to Gmail SMTP
-        with smtplib.SMTP('smtp.gmail.com', 587) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.send_message(msg)
-        st.success(f"✅ Password has been sent to {to_email}")
+        mailer.enqueue(to_email, subject, body, campaign=campaigns.RECOVERY_CAMPAIGN)
+        st.success(f"✅ A temporary password is on its way to {to_email}")
         return True
     except Exception as e:
         st.error(f"Error sending email: {str(e)}")
@@ -57,9 +80,14 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Initialize DB and Filesystem
-db.init_db()
-os.makedirs("uploads", exist_ok=True)
+@st.cache_resource(show_spinner=False)
+def init_app():
+    """Initialize DB and Filesystem once per process, not on every rerun."""
+    db.init_db()
+    os.makedirs("uploads", exist_ok=True)
+    return True
+
+init_app()
 
 def main():
     st.markdown("""
@@ -136,6 +164,43 @@ def main():
             st.session_state["student_name"] = None
             st.rerun()
 
+# Staff portal (Subject, Role) filter -> role flag columns from db.get_students_for_marking
+MARKING_SUBJECT_FLAGS = {
+    "FYP 1": {"SV Only": ["is_fyp1_sv"], "Panel Only": ["is_fyp1_panel"]},
+    "FYP 2": {"SV Only": ["is_fyp2_sv"], "Panel Only": ["is_fyp2_panel"]},
+    "LI": {"SV Only": ["is_li_sv"], "Panel Only": []}, # No LI panels
+}
+
+def marking_role_flags(subject, role):
+    """Flag columns to OR together for a subject/role choice ('All' widens either side)."""
+    subjects = list(MARKING_SUBJECT_FLAGS) if subject == "All" else [subject]
+    roles = ["SV Only", "Panel Only"] if role == "All" else [role]
+    return [f for s in subjects for r in roles for f in MARKING_SUBJECT_FLAGS[s][r]]
+
+def start_staff_session(staff_data):
+    """Login hook: start fetching this staff member's working set in the background."""
+    staff_db_id = staff_data['staff_id']
+    dept = staff_data.get('department')
+    roster = get_roster_cache()
+
+    def data_version(tables):
+        # Own writes bump db.change_version; other users' arrive as roster cache versions.
+        # A refetch only refreshes the view: Save checks against the editor's render-time baseline.
+        return tuple(db.change_version(t) for t in tables) + ((roster.version,) if "students" in tables else ())
+
+    st.session_state["staff_cache"] = IdentityCache(staff_db_id, {
+        "students": (lambda: db.get_students_for_marking(staff_db_id, program=dept or None), ["students"]),
+        "rubrics": (db.get_rubrics, ["rubrics"]),
+        "grade_scales": (db.get_grade_scales, ["grade_scales"]),
+    }, version_fn=data_version, capture=db.collect_errors)
+
+def session_data(cache, name):
+    """A prefetched working-set value; errors its background load reported are shown here."""
+    value = cache.get(name)
+    for msg in cache.errors(name):
+        st.error(msg)
+    return value
+
 def show_staff_marking_portal():
     st.header("📝 Staff Marking Portal")
     
@@ -158,6 +223,7 @@ def show_staff_marking_portal():
                     st.session_state["staff_db_id"] = staff_data['staff_id']
                     st.session_state["staff_name"] = staff_data['staff_name']
                     st.session_state["staff_dept"] = staff_data.get('department')
+                    start_staff_session(staff_data)
                     st.success("Login successful!")
                     st.rerun()
                 else:
@@ -169,10 +235,10 @@ def show_staff_marking_portal():
                 rec_id = st.text_input("Staff ID", key="rec_sid")
                 rec_em = st.text_input("Email", key="rec_sem")
                 if st.button("Recover Password"):
-                    sd = db.get_staff_by_id_number(rec_id)
-                    if sd and sd['staff_email'] == rec_em:
-                        send_recovery_email(rec_em, sd['staff_password'])
-                    else: st.error("ID and Email do not match our records.")
+                    ok, temp = db.reset_staff_password(rec_id, rec_em)
+                    if ok:
+                        send_recovery_email(rec_em, temp)
+                    else: st.error(temp)
         return
 
     # User Profile / Logout / Change Pwd Header
@@ -185,6 +251,7 @@ def show_staff_marking_portal():
     st.sidebar.info(f"👨‍🏫 {st.session_state['staff_name']}")
     if st.sidebar.button("🚪 Logout Staff", key="staff_logout_sidebar"):
          st.session_state["staff_id_num"] = None
+         st.session_state.pop("staff_cache", None)
          st.rerun()
 
     with st.expander("🔐 Change Password", expanded=False):
@@ -198,22 +265,29 @@ def show_staff_marking_portal():
 
     # Marking Section
     st.subheader("Your Students")
-    df = db.get_students_for_marking(st.session_state["staff_db_id"])
-    
-    # Filter by Department if set
-    dept = st.session_state.get("staff_dept")
-    if dept and not df.empty:
-        # Filter where Program matches Department (case-insensitive partial match or exact?)
-        # User requested "same department/program". Let's assume exact match first, or contain.
-        # df['Program'] contains the program name.
-        df = df[df['Program'] == dept]
+    # Working set prefetched at login (department filter runs server-side)
+    staff_cache = st.session_state.get("staff_cache")
+    if staff_cache is None or staff_cache.user_id != st.session_state["staff_db_id"]:
+        start_staff_session({"staff_id": st.session_state["staff_db_id"], "department": st.session_state.get("staff_dept")})
+        staff_cache = st.session_state["staff_cache"]
+    df = session_data(staff_cache, "students")
     
     if df.empty:
         st.warning("No students assigned to you.")
         return
 
     # --- RUBRICS SECTION ---
-
+    rubrics = session_data(staff_cache, "rubrics")
+    if not rubrics.empty and "cohort" in rubrics.columns:
+        rubrics = rubrics[rubrics["cohort"].astype(str).isin(df["Cohort"].dropna().astype(str))]
+    if not rubrics.empty:
+        with st.expander(f"📑 Marking Rubrics ({len(rubrics)})"):
+            labels = {f"{r['subject']} · {r['item_name']} (Cohort {r['cohort']})": r['filename'] for _, r in rubrics.iterrows()}
+            choice = st.selectbox("Rubric", list(labels), key="staff_rubric_pick")
+            if st.button("🔗 Get Link", key="staff_rubric_link"):
+                url = sb.get_signed_url("rubrics", labels[choice]) or sb.get_public_url("rubrics", labels[choice])
+                if url: st.link_button("📥 Open/Download", url)
+                else: st.error("Link Error")
 
     # Filters for Staff Portal
     c1, c2, c3, c4, c5 = st.columns(5)
@@ -230,49 +304,13 @@ def show_staff_marking_portal():
         cohorts = ["All"] + sorted(df['Cohort'].dropna().unique().tolist())
         selected_cohort = st.selectbox("📅 Cohort", cohorts)
     
-    filtered_df = df.copy()
-    staff_id = st.session_state["staff_db_id"]
-    
-    # 1. Filter by Subject & Role
-    if subject_filter == "FYP 1":
-        if role_filter == "SV Only":
-            filtered_df = filtered_df[filtered_df['fyp1_sv_id'] == staff_id]
-        elif role_filter == "Panel Only":
-            filtered_df = filtered_df[filtered_df['fyp1_panel_id'] == staff_id]
-        else:
-            filtered_df = filtered_df[(filtered_df['fyp1_sv_id'] == staff_id) | (filtered_df['fyp1_panel_id'] == staff_id)]
-    
-    elif subject_filter == "FYP 2":
-        if role_filter == "SV Only":
-            filtered_df = filtered_df[filtered_df['fyp2_sv_id'] == staff_id]
-        elif role_filter == "Panel Only":
-            filtered_df = filtered_df[filtered_df['fyp2_panel_id'] == staff_id]
-        else:
-            filtered_df = filtered_df[(filtered_df['fyp2_sv_id'] == staff_id) | (filtered_df['fyp2_panel_id'] == staff_id)]
-            
-    elif subject_filter == "LI":
-        if role_filter == "SV Only":
-            filtered_df = filtered_df[(filtered_df['li_industry_sv_id'] == staff_id) | (filtered_df['li_uni_sv_id'] == staff_id)]
-        elif role_filter == "Panel Only":
-            filtered_df = filtered_df.iloc[0:0] # Panels don't exist for LI in this logic
-        else:
-            filtered_df = filtered_df[(filtered_df['li_industry_sv_id'] == staff_id) | (filtered_df['li_uni_sv_id'] == staff_id)]
-            
-    else: # Subject: All
-        if role_filter == "SV Only":
-            mask = (filtered_df['fyp1_sv_id'] == staff_id) | (filtered_df['fyp2_sv_id'] == staff_id) | \
-                   (filtered_df['li_industry_sv_id'] == staff_id) | (filtered_df['li_uni_sv_id'] == staff_id)
-            filtered_df = filtered_df[mask]
-        elif role_filter == "Panel Only":
-            mask = (filtered_df['fyp1_panel_id'] == staff_id) | (filtered_df['fyp2_panel_id'] == staff_id)
-            filtered_df = filtered_df[mask]
-
-    # 2. Filter by Search
+    # 1. Filter by Subject & Role (precomputed role flag columns)
+    flags = marking_role_flags(subject_filter, role_filter)
+    filtered_df = df[df[flags].any(axis=1)] if flags else df.iloc[0:0]
+
+    # 2. Filter by Search (token index over this staff's roster, best match first)
     if search_q:
-        filtered_df = filtered_df[
-            (filtered_df['Student_Name'].str.contains(search_q, case=False, na=False)) | 
-            (filtered_df['Matrix_No'].str.contains(search_q, case=False, na=False))
-        ]
+        filtered_df = load_search_index(roster_version(df, list(SEARCH_FIELDS)), df).select(filtered_df, search_q)
 
     # 3. Filter by Program & Cohort
     if selected_prog != "All": filtered_df = filtered_df[filtered_df['Program'] == selected_prog]
@@ -315,6 +353,17 @@ def show_staff_marking_portal():
     
     df_to_show = filtered_df[final_cols].copy()
 
+    # Letter grade next to each visible mark column (program/cohort grade scale)
+    grade_scales = scales_from_frame(session_data(staff_cache, "grade_scales"))
+    for mc in ["FYP 1 Marks", "FYP 2 Marks", "LI Marks"]:
+        if mc in df_to_show.columns:
+            gcol = mc.replace("Marks", "Grade")
+            grades = assign_grades(df_to_show[mc], df_to_show.get("Program"), df_to_show.get("Cohort"), grade_scales)
+            df_to_show.insert(df_to_show.columns.get_loc(mc) + 1, gcol, grades)
+            config[gcol] = st.column_config.Column(disabled=True, width="small")
+
+    # Marks as shown before the grader's edits; the live roster may move on before Save
+    baseline = editor_baseline("_baseline_marking", "marking_editor", filtered_df, list(MARK_FIELDS))
     edited_df = st.data_editor(
         df_to_show,
         column_config=config,
@@ -324,34 +373,42 @@ def show_staff_marking_portal():
     )
 
     if st.button("Save Marks", type="primary"):
-        success_count = 0
-        errors = []
-        for index, row in edited_df.iterrows():
-            # Check if any marks changed vs original 'df' is tricky in direct loop without comparing.
-            # We'll just update all valid rows for robustness or only changed if we wanted to optimize.
-            # Simple update for now.
-            matrix = row['Matrix_No']
-            f1 = row['FYP 1 Marks']
-            f2 = row['FYP 2 Marks']
-            li = row['LI Marks']
-            
-            # Validation (handled by UI constraint mostly, but double check)
-            if (pd.notna(f1) and (f1 < 0 or f1 > 100)) or \
-               (pd.notna(f2) and (f2 < 0 or f2 > 100)) or \
-               (pd.notna(li) and (li < 0 or li > 100)):
-               st.toast(f"⚠️ Validation Error for {matrix}: Marks must be between 0 and 100.", icon="⚠️")
-               errors.append(f"Validation Error for {matrix}: Marks must be between 0 and 100.")
-               continue
-
-            changed_by = st.session_state.get("staff_name", "Staff")
-            success, msg = db.update_student_marks(matrix, f1, f2, li, changed_by=changed_by)
-            if success: success_count += 1
-            else: errors.append(f"Error {matrix}: {msg}")
+        # Only cells the grader edited, compared with what they saw; hidden subjects are left alone
+        shown = df_to_show["Matrix_No"].tolist()
+        edited_cells = {(shown[int(i)], col) for i, cols in st.session_state["marking_editor"]["edited_rows"].items()
+                        if int(i) < len(shown) for col in cols}
+        changes = mark_changes(baseline, edited_df, edited_cells)
+        bad = invalid_marks(changes)
+        bad_matrices = changes.loc[bad, "Matrix_No"].unique().tolist()
+        errors = [f"Validation Error for {m}: Marks must be between 0 and 100." for m in bad_matrices]
+        for e in errors: st.toast(f"⚠️ {e}", icon="⚠️")
+
+        to_save = changes[~changes["Matrix_No"].isin(bad_matrices)]
+        if to_save.empty and not errors:
+            st.info("No mark changes to save.")
+            return
+
+        changed_by = st.session_state.get("staff_name", "Staff")
+        results = db.save_marks_batch(mark_patches(to_save), changed_by=changed_by)
+        success_count = sum(1 for ok, _ in results.values() if ok)
+        # Saved rows are re-baselined from the refreshed roster; conflicting ones keep what the grader saw
+        for m, (ok, _) in results.items():
+            if ok: baseline.pop(m, None)
+        conflicts = [f"{m}: {msg}" for m, (ok, msg) in results.items() if not ok and msg.startswith("Conflict")]
+        errors += [f"Error {m}: {msg}" for m, (ok, msg) in results.items() if not ok and not msg.startswith("Conflict")]
             
         if success_count > 0:
             st.success(f"Updated marks for {success_count} students!")
+        if conflicts:
+            st.warning("Some marks were changed by another staff member since you loaded them and were not overwritten:\n\n"
+                       + "\n".join(f"- {c}" for c in conflicts))
         if errors:
             for e in errors: st.error(e)
+        if results:
+            with st.expander("Save details"):
+                st.dataframe(pd.DataFrame(
+                    [{"Matrix_No": m, "Saved": ok, "Message": msg} for m, (ok, msg) in results.items()]
+                ), hide_index=True, use_container_width=True)
 
 
 
@@ -403,9 +460,9 @@ def show_student_portal():
                 rec_sid = st.text_input("Matrix Number", key="r_mid")
                 rec_sem = st.text_input("Email", key="r_mem")
                 if st.button("Retrieve Password", use_container_width=True):
-                    sd = db.get_student_by_matrix(rec_sid)
-                    if sd and sd.get('email') == rec_sem:
-                        send_recovery_email(rec_sem, sd['password'])
+                    ok, temp = db.reset_student_password(rec_sid, rec_sem)
+                    if ok:
+                        send_recovery_email(rec_sem, temp)
                     else: st.error("No record found with this ID/Email combo.")
         return
 
@@ -469,19 +526,255 @@ def show_student_portal():
         if st.button("Submit Aku Janji"):
             handle_upload(f2, "aku_janji")
 
+@st.cache_data(ttl=600, show_spinner=False)
+def load_grade_scales():
+    """Stored grade scales (rarely change; cleared when a scale is saved)."""
+    return db.get_grade_scales()
+
+def _load_roster(include_archived):
+    return db.get_all_students_data(include_archived=include_archived)
+
+def _load_lookups():
+    return {"companies": db.get_company_labels(), "staff": db.get_staff_options()}
+
+@st.cache_resource(show_spinner=False)
+def get_roster_cache():
+    """
+    Process-wide roster snapshot shared by all sessions; any db write invalidates it.
+    Refreshes probe students.updated_at and merge only changed rows. After a restart
+    the first load comes from the on-disk snapshot while it syncs in the background.
+    """
+    cache = RosterCache(_load_roster, _load_lookups, ttl=300,
+                        probe=db.get_students_watermark, delta_loader=db.get_students_changed_since,
+                        store=SnapshotStore())
+    db.on_change(cache.invalidate)
+    _start_change_feed(cache)
+    return cache
+
+def _start_change_feed(cache):
+    """Realtime row patches from other users' writes (skipped without Supabase credentials)."""
+    try:
+        url, key = sb.get_supabase_credentials()
+    except Exception:
+        return None
+    if not (url and key):
+        return None
+    feed = ChangeFeed(cache, db.resolve_student_rows).start()
+    SupabaseRealtimeSource(url, key).subscribe(feed)
+    return feed
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_archived_roster(version):
+    """Archive table, once per students write counter (archive/unarchive bump it)."""
+    return db.get_archived_students()
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def load_matrix_index(version, _df):
+    """Roster keyed by Matrix_No, once per snapshot."""
+    return matrix_indexed(_df)
+
+# Paginated dashboard editors: only the current page is serialized to the browser
+EDITOR_PAGE_SIZES = [50, 100, 250, 500, "All"]
+
+def editor_pages(spec_id):
+    """[(matrix numbers shown, editor state)] for every page editor rendered in a tab."""
+    pages = st.session_state.get(f"_pages_{spec_id}", {})
+    return [(matrices, st.session_state.get(key)) for key, matrices in pages.items()]
+
+def has_data_edits(state):
+    """True if an editor's state holds cell edits (Sync? ticks are selection, not data)."""
+    return any(set(changes) - {"Sync?"} for changes in (state or {}).get("edited_rows", {}).values())
+
+def editor_baseline(store_key, editor_key, rows, columns):
+    """
+    Edit baseline (marking.edit_baseline) of the rows an editor shows, kept in
+    st.session_state[store_key][editor_key]. Retaken on each render until the editor
+    holds edits, then frozen: saves are checked against what the user was editing,
+    not the roster as delta sync / the change feed moved it since.
+    """
+    baselines = st.session_state.setdefault(store_key, {})
+    if editor_key not in baselines or not has_data_edits(st.session_state.get(editor_key)):
+        baselines[editor_key] = edit_baseline(rows, columns)
+    else:
+        # Rows first shown (or saved) since the edits began start from the current data
+        new_rows = rows[~rows["Matrix_No"].isin(list(baselines[editor_key]))]
+        if not new_rows.empty:
+            baselines[editor_key].update(edit_baseline(new_rows, columns))
+    return baselines[editor_key]
+
+def editor_view_id(*parts):
+    """Short id of a dashboard view (filters, search, page size, sort) for page editor keys."""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:10]
+
+def prune_editor_pages(spec_id, prefix):
+    """Drop page editors (their edits and Sync? ticks) whose key isn't part of the current view."""
+    pages = st.session_state.get(f"_pages_{spec_id}", {})
+    for key in [k for k in pages if not k.startswith(prefix)]:
+        del pages[key]
+        st.session_state.pop(key, None)
+        st.session_state.get(f"_baseline_{spec_id}", {}).pop(key, None)
+
+def sync_ticks(spec_id):
+    """Fingerprint of the Sync? edits across a tab's page editors."""
+    return tuple(sorted(
+        (matrices[int(k)], bool(v["Sync?"]))
+        for matrices, state in editor_pages(spec_id)
+        for k, v in (state or {}).get("edited_rows", {}).items()
+        if "Sync?" in v and int(k) < len(matrices)
+    ))
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def load_staff_index(version, _df):
+    """One StaffIndex per roster snapshot (keyed by version, df itself is not hashed)."""
+    return StaffIndex(_df)
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def load_search_index(version, _df):
+    """One SearchIndex per roster snapshot for the search boxes."""
+    return SearchIndex(_df)
+
+@st.cache_resource(max_entries=32, show_spinner=False)
+def load_dashboard_analytics(version, filters, _filtered_df, _scales=None):
+    """
+    Subject summaries and their Altair charts for one (roster version, filter tuple).
+    Switching tabs or toggling a column checkbox reuses them instead of recomputing.
+    """
+    summaries = subject_summaries(_filtered_df, _scales)
+    charts = {subject: subject_charts(subject, stats) for subject, stats in summaries.items()}
+    return summaries, charts
+
+DASHBOARD_SEARCH_LABEL = "🔍 Search Student (Name/Matrix/Email/Title)"
+DASHBOARD_FILTER_KEYS = ["flt_program", "flt_cohort", "flt_state", "flt_staff", "flt_role"]
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_filter_options(version):
+    """Sidebar option lists from distinct queries (used while the roster isn't loaded)."""
+    return db.get_filter_options()
+
+@st.cache_data(ttl=300, show_spinner=False, max_entries=16)
+def load_roster_slice(version, filters):
+    """Active students matching the sidebar filters, fetched with server-side predicates."""
+    return db.get_students_slice(filters)
+
+def roster_slice_version():
+    """Cache key for load_roster_slice: own writes plus the server watermark, so other users' writes refetch."""
+    try:
+        watermark = db.get_students_watermark()
+    except Exception:
+        watermark = None # probe failed: fall back to own writes + ttl
+    return db.change_version("students"), watermark
+
+@st.fragment(run_every=2)
+def roster_sync_status(roster_cache, shown_version, saved_at):
+    """Staleness note while the dashboard shows the on-disk snapshot; reruns the page once it's synced."""
+    if roster_cache.get().version != shown_version:
+        st.rerun()
+    age = max(time.time() - saved_at, 0)
+    age_text = f"{age / 3600:.1f} h" if age >= 3600 else f"{age / 60:.0f} min"
+    st.caption(f"🕒 Showing the saved roster from {time.strftime('%d %b %H:%M', time.localtime(saved_at))} "
+               f"({age_text} old) while it syncs with the database…")
+
+def dashboard_slice_filters(pending, roster_cache):
+    """Sidebar selections as database.get_students_slice filters ({} = nothing narrowed)."""
+    filters = {}
+    for key, name in [("flt_program", "program"), ("flt_cohort", "cohort"), ("flt_state", "state")]:
+        if pending[key] != "All":
+            filters[name] = pending[key]
+    if pending["flt_staff"] != "All":
+        staff_id = roster_cache.lookups()["staff"].get(pending["flt_staff"])
+        if staff_id is not None:
+            filters["staff_id"] = staff_id
+            filters["staff_columns"] = [c for role in DASHBOARD_ROLES.get(pending["flt_role"], []) for c in STAFF_ROLE_COLUMNS[role]]
+    return filters
+
+def render_dashboard_filters(programs, cohorts, states, staff_labels):
+    """Sidebar filters + search box; returns {widget key: selection}."""
+    options = {
+        "flt_program": ["All"] + programs,
+        "flt_cohort": ["All"] + cohorts,
+        "flt_state": ["All"] + states,
+        "flt_staff": ["All"] + staff_labels,
+        "flt_role": ["Both (Any)", "Supervisor (SV)", "Panelist"],
+    }
+    # A selection missing from the new option list (e.g. after switching views) falls back to the default
+    for key, opts in options.items():
+        if key in st.session_state and st.session_state[key] not in opts:
+            del st.session_state[key]
+
+    st.sidebar.markdown("---")
+    st.sidebar.subheader("Filters")
+    st.sidebar.selectbox("Filter by Program", options["flt_program"], key="flt_program")
+    st.sidebar.selectbox("Filter by Cohort", options["flt_cohort"], key="flt_cohort")
+    st.sidebar.selectbox("Filter by State", options["flt_state"], key="flt_state")
+
+    # New Filters: Search and Staff
+    st.sidebar.markdown("---")
+    st.sidebar.subheader("🔍 Search & Staff")
+    st.sidebar.text_input(DASHBOARD_SEARCH_LABEL, key="dash_search")
+    st.sidebar.selectbox("🧑‍🏫 Filter by Staff", options["flt_staff"], key="flt_staff")
+
+    # Staff Role Filter
+    st.sidebar.selectbox("🎯 Filter by Role", options["flt_role"], key="flt_role")
+    return {key: st.session_state[key] for key in DASHBOARD_FILTER_KEYS}
+
 def show_dashboard():
     st.header("📊 Student Dashboard")
     
     view_archived = st.sidebar.toggle("📂 View Archived Students", value=False)
     
-    df = db.get_all_students_data(include_archived=view_archived)
+    # Sidebar filter values from the previous run (widgets are drawn below, once options are known)
+    pending = {key: st.session_state.get(key, "All") for key in DASHBOARD_FILTER_KEYS}
+    pending["flt_role"] = st.session_state.get("flt_role", "Both (Any)")
+    roster_cache = get_roster_cache()
+    slice_filters = dashboard_slice_filters(pending, roster_cache)
+
+    # Large rosters + active search: let the DB search so only matching rows cross the wire
+    search_query = st.session_state.get("dash_search", "")
+    server_search = False
+    if search_query:
+        n_students = db.count_students(include_archived=view_archived)
+        # Unknown size (count failed, error shown above): don't risk downloading everything
+        server_search = n_students is None or n_students > db.SERVER_SEARCH_THRESHOLD
+    pushdown = False
+    if server_search:
+        search_filters = {"is_archived": 1 if view_archived else 0, "program": slice_filters.get("program"), "cohort": slice_filters.get("cohort")}
+        df = db.search_students(search_query, search_filters, limit=db.SERVER_SEARCH_LIMIT)
+        roster_key = roster_version(df)
+        if len(df) >= db.SERVER_SEARCH_LIMIT:
+            st.info(f"Showing the first {db.SERVER_SEARCH_LIMIT} matches for '{search_query}'. Refine the search to see the rest.")
+    elif view_archived:
+        # Archived students live in their own table, read only when this view is open
+        df = load_archived_roster(db.change_version("students"))
+        roster_key = f"a{db.change_version('students')}-{roster_version(df, ['Matrix_No', 'updated_at'])}"
+    elif slice_filters and not roster_cache.is_warm():
+        # Cold cache + a narrowed view: fetch only that slice (the pandas filters below still apply)
+        pushdown = True
+        df = load_roster_slice(roster_slice_version(), slice_filters)
+        roster_key = f"s{db.change_version('students')}-{roster_version(df, ['Matrix_No', 'updated_at'])}"
+    else:
+        # Shared snapshot: reruns (filters, ticks, tab switches) don't refetch the roster
+        roster = roster_cache.get()
+        df = roster.df
+        roster_key = f"v{roster.version}-0"
+        if roster.from_disk:
+            roster_sync_status(roster_cache, roster.version, roster.saved_at)
     
     if view_archived:
         # Filter to show ONLY archived if toggle is ON
         if "is_archived" in df.columns:
             df = df[df["is_archived"] == 1]
     
+    if df.empty and pushdown:
+        options = load_filter_options(db.change_version("students"))
+        render_dashboard_filters(options["programs"], options["cohorts"], options["states"], sorted(roster_cache.lookups()["staff"]))
+        st.info("No students match the selected filters.")
+        return
     if df.empty:
+        if server_search:
+            # Keep the search box so the user can change/clear the query
+            st.sidebar.text_input(DASHBOARD_SEARCH_LABEL, key="dash_search")
+            st.info(f"No students match '{search_query}'.")
+            return
         st.info("No students found. Please add students to view them here.")
         return
 
@@ -489,32 +782,23 @@ def show_dashboard():
     st.divider()
 
     # Data needed for editors
-    companies_map = db.get_company_labels()
+    lookups = roster_cache.lookups()
+    companies_map = lookups["companies"]
     company_options = ["-"] + list(companies_map.keys())
-    staff_options_map = db.get_staff_options() # Label: ID
+    staff_options_map = lookups["staff"] # Label: ID
     staff_labels = ["-"] + list(staff_options_map.keys())
 
-    # Sidebar Filters
-    st.sidebar.markdown("---")
-    st.sidebar.subheader("Filters")
-    programs = ["All"] + sorted(df['Program'].dropna().unique().tolist())
-    cohorts = ["All"] + sorted(df['Cohort'].dropna().unique().tolist())
-    states = ["All"] + sorted(set(df['FYP_State'].tolist() + df['LI_State'].tolist()))
-    if "-" in states: states.remove("-")
-    
-    selected_program = st.sidebar.selectbox("Filter by Program", programs)
-    selected_cohort = st.sidebar.selectbox("Filter by Cohort", cohorts)
-    selected_state = st.sidebar.selectbox("Filter by State", ["All"] + sorted(states))
-    
-    # New Filters: Search and Staff
-    st.sidebar.markdown("---")
-    st.sidebar.subheader("🔍 Search & Staff")
-    search_query = st.sidebar.text_input("🔍 Search Student (Name/Matrix)", "")
-    staff_filter_options = ["All"] + sorted(list(staff_options_map.keys()))
-    selected_staff = st.sidebar.selectbox("🧑‍🏫 Filter by Staff", staff_filter_options)
-    
-    # Staff Role Filter
-    selected_role = st.sidebar.selectbox("🎯 Filter by Role", ["Both (Any)", "Supervisor (SV)", "Panelist"])
+    # Sidebar Filters: options of the whole roster, not just a fetched slice
+    if pushdown:
+        options = load_filter_options(db.change_version("students"))
+        programs, cohorts, states = options["programs"], options["cohorts"], options["states"]
+    else:
+        programs = sorted(df['Program'].dropna().unique().tolist())
+        cohorts = sorted(df['Cohort'].dropna().unique().tolist())
+        states = sorted(set(df['FYP_State'].tolist() + df['LI_State'].tolist()) - {"-"})
+    selections = render_dashboard_filters(programs, cohorts, states, sorted(staff_options_map.keys()))
+    selected_program, selected_cohort, selected_state, selected_staff, selected_role = (selections[k] for k in DASHBOARD_FILTER_KEYS)
+    search_query = st.session_state.get("dash_search", "")
     
     filtered_df = df.copy()
     if selected_program != "All": filtered_df = filtered_df[filtered_df['Program'] == selected_program]
@@ -522,23 +806,25 @@ def show_dashboard():
     if selected_state != "All":
         filtered_df = filtered_df[(filtered_df['FYP_State'] == selected_state) | (filtered_df['LI_State'] == selected_state)]
     
-    if search_query:
-        filtered_df = filtered_df[
-            (filtered_df['Student_Name'].str.contains(search_query, case=False, na=False)) | 
-            (filtered_df['Matrix_No'].str.contains(search_query, case=False, na=False))
-        ]
+    if search_query and not server_search:
+        filtered_df = load_search_index(roster_key, df).select(filtered_df, search_query)
     
+    # Inverted index (staff id -> rows per role), built once per roster snapshot
+    staff_index = load_staff_index(roster_key, df)
+    roles = DASHBOARD_ROLES.get(selected_role)
+    with st.sidebar.expander("👥 Students per Staff" + (" (filtered view)" if pushdown else "")):
+        if pushdown:
+            st.caption("Counts cover only the students loaded for the current filters.")
+        staff_names = {str(v): k for k, v in staff_options_map.items()}
+        per_staff = staff_index.students_per_staff(roles)
+        st.dataframe(
+            pd.DataFrame({"Staff": [staff_names.get(i, i) for i in per_staff.index], "Students": per_staff.values}),
+            hide_index=True, use_container_width=True
+        )
+
     if selected_staff != "All":
-        if selected_role == "Supervisor (SV)":
-            staff_cols = ["FYP 1 SV", "FYP 2 SV", "LI Industry SV", "LI Uni SV"]
-        elif selected_role == "Panelist":
-            staff_cols = ["FYP 1 Panel", "FYP 2 Panel"]
-        else: # Both (Any)
-            staff_cols = ["FYP 1 SV", "FYP 1 Panel", "FYP 2 SV", "FYP 2 Panel", "LI Industry SV", "LI Uni SV"]
-            
-        # Match the exact staff label in the specified columns
-        mask = filtered_df[staff_cols].apply(lambda row: selected_staff in row.values, axis=1)
-        filtered_df = filtered_df[mask]
+        filtered_df = staff_index.select(filtered_df, staff_options_map.get(selected_staff), roles)
+        st.sidebar.caption(f"👥 {len(staff_index.rows(staff_options_map.get(selected_staff), roles))} student(s) held as {selected_role}")
 
     # Selection & Bulk Sync (Moved to Top)
     # Selection Header
@@ -560,19 +846,10 @@ def show_dashboard():
         unique_companies.discard(None)
         t_companies = len(unique_companies)
         
-        # Docs Pending: Count where Lapor Diri or Aku Janji is invalid (before icon conversion)
-        # Note: In the raw DB, empty strings or NULL are problem. 
-        # In df from get_all_students_data, COALESCE is used so they are '' if null.
-        docs_pending = len(filtered_df[
-            (filtered_df['Lapor Diri'] == '') | (filtered_df['Aku Janji'] == '')
-        ])
-        
-        # Grading Pending: Check marks. In df, they are floats or None.
-        grading_pending = len(filtered_df[
-            ((filtered_df['FYP 1 Marks'].isna()) | (filtered_df['FYP 1 Marks'] == 0)) &
-            ((filtered_df['FYP 2 Marks'].isna()) | (filtered_df['FYP 2 Marks'] == 0)) &
-            ((filtered_df['LI Marks'].isna()) | (filtered_df['LI Marks'] == 0))
-        ])
+        # Docs/Grading Pending: same masks as the Status column below (raw values, before icon conversion)
+        masks = status_masks(filtered_df)
+        docs_pending = int(masks["docs_missing"].sum())
+        grading_pending = int(masks["grading_pending"].sum())
         
         m1, m2, m3, m4 = st.columns(4)
         m1.metric("Total Students", t_students)
@@ -584,35 +861,12 @@ def show_dashboard():
 
     st.divider()
 
-    # Calculate Status Column
-    def get_status(row):
-        # 1. Check Docs (Raw values before icon conversion)
-        if row['Lapor Diri'] == '' or row['Aku Janji'] == '':
-            return "Incomplete"
-            
-        # 2. Check Marks
-        def valid_mark(m):
-            try:
-                return pd.notna(m) and float(m) > 0
-            except: return False
-            
-        f1 = row['FYP 1 Marks']
-        f2 = row['FYP 2 Marks']
-        li = row['LI Marks']
-        
-        if valid_mark(f1) and valid_mark(f2) and valid_mark(li):
-            return "Graded"
-            
-        return "Ongoing"
-
-    filtered_df['Status'] = filtered_df.apply(get_status, axis=1)
+    # Calculate Status Column (Incomplete / Ongoing / Graded) from the metric masks
+    filtered_df['Status'] = classify_status(masks)
 
     # Add Document Status Icons to DF for display
-    def get_icon(val):
-        return "✅" if val and val != "" else "❌"
-    
-    filtered_df['Lapor Diri'] = filtered_df['Lapor Diri'].apply(get_icon)
-    filtered_df['Aku Janji'] = filtered_df['Aku Janji'].apply(get_icon)
+    filtered_df['Lapor Diri'] = doc_icons(masks, 'Lapor Diri')
+    filtered_df['Aku Janji'] = doc_icons(masks, 'Aku Janji')
 
     # Add Selection Column for Syncing (RESTORED)
     filtered_df.insert(0, "Sync?", select_all)
@@ -704,150 +958,62 @@ def show_dashboard():
         return get_visible_cols(subject_type, shown_local)
 
     # Identify ticked students across tabs for Sync and Document actions
-    ticked_matrices = set()
-    rows_to_download = [] # List of (Name, Matrix, LaporPath, AkuPath)
-    tab_keys = ["editor_FYP_1", "editor_FYP_2", "editor_LI"]
-    
-    for idx, row in filtered_df.iterrows():
-        matrix = row["Matrix_No"]
-        is_ticked = select_all 
-        for key in tab_keys:
-            if key in st.session_state:
-                edits = st.session_state[key].get("edited_rows", {})
-                if str(idx) in edits and "Sync?" in edits[str(idx)]:
-                    is_ticked = edits[str(idx)]["Sync?"]
-                elif idx in edits and "Sync?" in edits[idx]:
-                    is_ticked = edits[idx]["Sync?"]
-        if is_ticked:
-            ticked_matrices.add(matrix)
-            src_row = df[df['Matrix_No'] == matrix].iloc[0]
-            rows_to_download.append(src_row)
-
-    def render_subject_analytics(df_viz, subject):
+    # (edited_rows are keyed by row position; source rows come from the raw roster keyed by Matrix_No)
+    tab_specs = ["FYP_1", "FYP_2", "LI"]
+    # Pages of a previous filter/search view no longer map to the rows shown: drop their edits and ticks
+    filters_id = editor_view_id(view_archived, selected_program, selected_cohort, selected_state, search_query, selected_staff, selected_role)
+    for spec in tab_specs:
+        prune_editor_pages(spec, f"editor_{spec}_{filters_id}_")
+    ticked_matrices, rows_to_download = resolve_selection(
+        filtered_df, load_matrix_index(roster_key, df), select_all,
+        [page for spec in tab_specs for page in editor_pages(spec)]
+    )
+    for spec in tab_specs:
+        st.session_state[f"_ticks_{spec}"] = sync_ticks(spec)
+
+    # Subject summaries + charts: one grouped pass, cached per (roster version, filter tuple)
+    grade_scales = scales_from_frame(load_grade_scales())
+    analytics_filters = (view_archived, selected_program, selected_cohort, selected_state, search_query, selected_staff, selected_role, scales_key(grade_scales))
+    subject_stats, subject_chart_specs = load_dashboard_analytics(
+        roster_key, analytics_filters, filtered_df, grade_scales
+    )
+
+    def render_subject_analytics(subject):
         """Displays metrics and charts for a specific subject (FYP 1, FYP 2, LI)"""
+        stats = subject_stats[subject]
+        charts = subject_chart_specs[subject]
         with st.container():
             st.markdown(f"### 📊 Analysis for {subject}")
-            
-            # 1. Config mapping
-            if subject == "FYP 1":
-                mark_col = "FYP 1 Marks"
-                comp_col = "FYP_Company"
-                sv_col = "FYP 1 SV"
-            elif subject == "FYP 2":
-                mark_col = "FYP 2 Marks"
-                comp_col = "FYP_Company"
-                sv_col = "FYP 2 SV"
-            else: # LI
-                mark_col = "LI Marks"
-                comp_col = "LI_Company"
-                sv_col = "LI Industry SV" 
-
-            # 2. Metrics Calculation
-            total_students = len(df_viz)
-            
-            # Assigned Rate: Count non-null/non-dash SVs
-            assigned_count = len(df_viz[ (df_viz[sv_col] != "-") & (df_viz[sv_col].notna()) ])
-            assign_rate = (assigned_count / total_students * 100) if total_students > 0 else 0
-            
-            # Grading Progress: Marks > 0
-            # Ensure marks are numeric (handle cases where they might be strings like "-")
-            numeric_vals = pd.to_numeric(df_viz[mark_col], errors='coerce')
-            
-            graded_df = df_viz[ (numeric_vals.notna()) & (numeric_vals > 0) ]
-            graded_count = len(graded_df)
-            grade_rate = (graded_count / total_students * 100) if total_students > 0 else 0
-            
-            # Avg Marks
-            # use the numeric series for mean calculation
-            avg_marks = numeric_vals[numeric_vals > 0].mean() if not numeric_vals[numeric_vals > 0].empty else 0
-            
+
             m1, m2, m3, m4 = st.columns(4)
-            m1.metric("Total Students", total_students)
-            m2.metric("Assignment Rate", f"{assign_rate:.1f}%")
-            m3.metric("Grading Progress", f"{grade_rate:.1f}%")
-            m4.metric("Average Marks", f"{avg_marks:.2f}")
+            m1.metric("Total Students", stats["total"])
+            m2.metric("Assignment Rate", f"{stats['assign_rate']:.1f}%")
+            m3.metric("Grading Progress", f"{stats['grade_rate']:.1f}%")
+            m4.metric("Average Marks", f"{stats['avg_marks']:.2f}")
 
             st.markdown("---")
             
             # State Distribution Chart (Context Aware)
-            state_col = "LI_State" if "LI" in subject.upper() or "Li" in subject else "FYP_State"
-            if state_col in df_viz.columns:
-                state_counts = df_viz[state_col].value_counts().reset_index()
-                state_counts.columns = ["State", "Count"]
-                state_counts = state_counts[state_counts["State"] != "-"]
-                
-                if not state_counts.empty:
-                    with st.expander(f"🗺️ Student Distribution by State ({subject})", expanded=True):
-                        import altair as alt
-                        max_y = len(df_viz)
-                        if max_y < 5: max_y = 5
-                        
-                        base = alt.Chart(state_counts).encode(
-                            x=alt.X('State', sort='-y', axis=alt.Axis(labelAngle=-45)),
-                            y=alt.Y('Count', 
-                                    axis=alt.Axis(tickMinStep=1, title='Number of Students', format='d'),
-                                    scale=alt.Scale(domain=[0, max_y])
-                                   ),
-                            tooltip=['State', 'Count']
-                        )
-                        bars = base.mark_bar()
-                        text = base.mark_text(align='center', dy=-5).encode(text='Count')
-                        c = (bars + text).properties(title=f"Distribution for {subject}")
-                        st.altair_chart(c, use_container_width=True)
+            if charts["state"] is not None:
+                with st.expander(f"🗺️ Student Distribution by State ({subject})", expanded=True):
+                    st.altair_chart(charts["state"], use_container_width=True)
             
             st.markdown("---")
             
-            # 3. Charts - Grade Distribution Only
-            import altair as alt
-            
+            # Grade Distribution
             with st.expander("📈 Grade Distribution", expanded=False):
-                # Define bins
-                def get_grade_bin(m):
-                    if m >= 80: return "A"
-                    elif m >= 75: return "A-"
-                    elif m >= 70: return "B+"
-                    elif m >= 65: return "B"
-                    elif m >= 60: return "B-"
-                    elif m >= 55: return "C+"
-                    elif m >= 50: return "C"
-                    elif m >= 47: return "C-"
-                    elif m >= 44: return "D+"
-                    elif m >= 40: return "D"
-                    else: return "E"
-    
-                all_grades = ["A", "A-", "B+", "B", "B-", "C+", "C", "C-", "D+", "D", "E"]
-    
-                if not graded_df.empty:
-                    grade_counts = graded_df[mark_col].apply(get_grade_bin).value_counts()
-                else:
-                    grade_counts = pd.Series(dtype=int)
-                
-                # Reindex to include missing grades as 0
-                grade_counts = grade_counts.reindex(all_grades, fill_value=0).reset_index()
-                grade_counts.columns = ["Grade Range", "Count"]
-    
-                # Fixed Y-Scale based on total students
-                y_max = total_students if total_students > 0 else 5
-                if y_max < 5: y_max = 5 # Ensure at least some height
-    
-                base_g = alt.Chart(grade_counts).encode(
-                    x=alt.X('Grade Range', sort=all_grades, axis=alt.Axis(labelAngle=0)),
-                    y=alt.Y('Count', 
-                            title='Students', 
-                            axis=alt.Axis(tickMinStep=1, format='d'),
-                            scale=alt.Scale(domain=[0, y_max])
-                           ), 
-                    tooltip=['Grade Range', 'Count']
-                )
-                bars_g = base_g.mark_bar(color='teal')
-                text_g = base_g.mark_text(align='center', dy=-5, fontSize=14).encode(
-                    text=alt.Text('Count', format='.0f')
-                )
-                
-                st.altair_chart((bars_g + text_g), use_container_width=True)
+                st.altair_chart(charts["grades"], use_container_width=True)
             st.divider()
 
-    def render_editor(df_view, subject_cols, spec_id):
+    def render_editor(df_view, matrices, subject_cols, spec_id, editor_key):
+        """
+        One page of a tab's editor. `matrices` are the Matrix_No of df_view's rows, so
+        edits (keyed by row position) map back to students across pages.
+        """
+        st.session_state.setdefault(f"_pages_{spec_id}", {})[editor_key] = matrices
+        source = load_matrix_index(roster_key, df)
+        editor_baseline(f"_baseline_{spec_id}", editor_key, source.loc[source.index.intersection(matrices)], db.EDITABLE_COLUMNS)
+
         # CLEANUP: Ensure mark columns are valid numbers for the editor (remove "-" placeholders)
         # We work on a copy to avoid SettingWithCopy warnings on the original filtered_df
         df_view = df_view.copy() 
@@ -857,13 +1023,17 @@ def show_dashboard():
                 df_view[mc] = df_view[mc].replace("-", None)
                 df_view[mc] = pd.to_numeric(df_view[mc], errors='coerce')
 
+        # Stored passwords are hashes: show a lock, typing a value sets a new password
+        if "Password" in df_view.columns:
+            df_view["Password"] = df_view["Password"].map(lambda v: "🔒" if is_hashed(v) else v)
+
         config = {
             "No.": st.column_config.Column(disabled=True, width="small"),
             "Status": st.column_config.Column(disabled=True, width="small"),
             "Student_Name": st.column_config.Column(disabled=True, width="medium"),
             "Matrix_No": st.column_config.Column(disabled=True, width="small"),
             "Email": st.column_config.Column(width="medium"),
-            "Password": st.column_config.Column(width="small"),
+            "Password": st.column_config.Column(width="small", help="🔒 = set. Type a new value to reset it."),
             "Program": st.column_config.Column(disabled=True, width="small"),
             "Cohort": st.column_config.Column(disabled=True, width="small"),
             "FYP_State": st.column_config.Column(disabled=True, width="small"),
@@ -885,44 +1055,168 @@ def show_dashboard():
         for col in subject_cols:
             config[col] = st.column_config.SelectboxColumn(col, options=staff_labels, width="medium")
 
-        edited_df = st.data_editor(df_view, column_config=config, hide_index=True, use_container_width=True, key=f"editor_{spec_id}")
+        for msg in st.session_state.pop(f"_conflicts_{spec_id}", []):
+            st.warning(f"⚠️ Not saved, {msg}")
 
-        if f"editor_{spec_id}" in st.session_state:
-            edits = st.session_state[f"editor_{spec_id}"].get("edited_rows", {})
-            if edits:
-                st.warning(f"💡 Unsaved changes in {spec_id.replace('_', ' ')}.")
-                if st.button(f"Save {spec_id.replace('_', ' ')} Updates"):
-                    success_count = 0
-                    for row_idx, changes in edits.items():
-                        # Use .loc with the original index to ensure we find the Matrix_No even if hidden from current view
-                        matrix_no = filtered_df.loc[df_view.index[int(row_idx)]]["Matrix_No"]
-                        for field, val in changes.items():
-                            val = None if val == "-" else val
-                            if field in ["FYP_Company", "LI_Company"]:
-                                cid = companies_map.get(val) if val else None
-                                # DEBUG: Show what we are trying to save
-                                st.toast(f"Saving: {matrix_no} -> {val} (ID: {cid})")
-                                
-                                success, err_msg = db.update_student_company(matrix_no, cid, field.split('_')[0].lower(), changed_by="Admin")
-                                if success: 
-                                    success_count += 1
-                                else:
-                                    st.error(f"Failed {matrix_no}: {err_msg}")
-                            else:
-                                # Handles Staff selection and generic text fields like Email
-                                val_to_save = staff_options_map.get(val) if (field in subject_cols and val != "-") else val
-                                success, _ = db.update_student_field(matrix_no, field, val_to_save, changed_by="Admin")
-                                if success: success_count += 1
+        # Archived rows live in the archive table: browse/select only, restore the cohort to edit
+        read_only = [c for c in df_view.columns if c != "Sync?"] if view_archived else False
+        edited_df = st.data_editor(df_view, column_config=config, hide_index=True, use_container_width=True, key=editor_key, disabled=read_only)
+
+        # Pending edits on every page of this tab (Sync? ticks are selection, not data)
+        pending = [
+            (page_matrices[int(row_idx)], {f: v for f, v in changes.items() if f != "Sync?"})
+            for page_matrices, state in editor_pages(spec_id)
+            for row_idx, changes in (state or {}).get("edited_rows", {}).items()
+            if int(row_idx) < len(page_matrices)
+        ]
+        pending = [(m, changes) for m, changes in pending if changes]
+        if pending:
+            st.warning(f"💡 Unsaved changes in {spec_id.replace('_', ' ')} ({len(pending)} student(s)).")
+            if st.button(f"Save {spec_id.replace('_', ' ')} Updates"):
+                success_count = 0
+                # Writes are conditional on the rows as shown when these edits were made
+                baseline = {m: b for page in st.session_state.get(f"_baseline_{spec_id}", {}).values() for m, b in page.items()}
+                for matrix_no, changes in pending:
+                    original = baseline_row(baseline, matrix_no)
+                    for field, val in changes.items():
+                        val = None if val == "-" else val
+                        if field in ["FYP_Company", "LI_Company"]:
+                            cid = companies_map.get(val) if val else None
+                            # DEBUG: Show what we are trying to save
+                            st.toast(f"Saving: {matrix_no} -> {val} (ID: {cid})")
+                            
+                            success, err_msg = db.update_student_company(matrix_no, cid, field.split('_')[0].lower(), changed_by="Admin", original=original)
+                        else:
+                            # Handles Staff selection and generic text fields like Email
+                            val_to_save = staff_options_map.get(val) if (field in subject_cols and val != "-") else val
+                            success, err_msg = db.update_student_field(matrix_no, field, val_to_save, changed_by="Admin", original=original)
+                        if success:
+                            success_count += 1
+                        elif err_msg.startswith("Conflict"):
+                            # Shown after the refresh below, next to the reloaded values
+                            st.session_state.setdefault(f"_conflicts_{spec_id}", []).append(f"{matrix_no} / {field}: {err_msg}")
+                        else:
+                            st.error(f"Failed {matrix_no}: {err_msg}")
+                if success_count > 0 or st.session_state.get(f"_conflicts_{spec_id}"):
                     if success_count > 0:
                         st.toast(f"✅ Updated {success_count} fields successfully!", icon="💾")
-                        
-                        # Fix: Clear the editing session state so it doesn't revert or hold stale data
-                        if f"editor_{spec_id}" in st.session_state:
-                            del st.session_state[f"editor_{spec_id}"]
-                        
-                        import time
-                        time.sleep(1.0) # Short pause to let user see toast before refresh
-                        st.rerun()
+                    
+                    # Fix: Clear the editing session state so it doesn't revert or hold stale data
+                    for key in st.session_state.pop(f"_pages_{spec_id}", {}):
+                        if key in st.session_state:
+                            del st.session_state[key]
+                    st.session_state.pop(f"_baseline_{spec_id}", None)
+                    
+                    import time
+                    time.sleep(1.0) # Short pause to let user see toast before refresh
+                    st.rerun()
+
+    def render_export(subject_type, visible_cols):
+        """Streams the tab's visible columns to a file, for the filtered view or whole cohorts (archived included)."""
+        with st.expander("📤 Export", expanded=False):
+            ec1, ec2 = st.columns(2)
+            scope = ec1.radio("Rows", ["Filtered view", "Full cohorts (incl. archived)"], key=f"exp_scope_{subject_type}")
+            fmt = ec2.selectbox("Format", list(EXPORT_FORMATS), key=f"exp_fmt_{subject_type}")
+            if scope == "Filtered view":
+                # Raw roster values (not the editor's icons / "-" placeholders)
+                rows = load_matrix_index(roster_key, df).loc[filtered_df["Matrix_No"]]
+            else:
+                everyone = roster_cache.get(include_archived=True).df
+                cohorts_all = sorted(everyone["Cohort"].dropna().unique().tolist())
+                picked = st.multiselect("Cohorts", cohorts_all, key=f"exp_cohorts_{subject_type}")
+                rows = everyone[everyone["Cohort"].isin(picked)]
+            st.caption(f"{len(rows)} student(s)")
+
+            if st.button("Prepare Export", key=f"exp_btn_{subject_type}", disabled=rows.empty):
+                try:
+                    with st.spinner("Writing export..."):
+                        path, _ = export_roster(rows, visible_cols, fmt, scales=grade_scales)
+                    previous = st.session_state.pop(f"_export_{subject_type}", None)
+                    if previous and os.path.exists(previous[0]):
+                        os.remove(previous[0])
+                    st.session_state[f"_export_{subject_type}"] = (path, fmt)
+                except Exception as e:
+                    st.error(f"Export failed: {e}")
+
+            prepared = st.session_state.get(f"_export_{subject_type}")
+            if prepared and os.path.exists(prepared[0]):
+                path, prepared_fmt = prepared
+                with open(path, "rb") as f:
+                    st.download_button(f"📥 Download {prepared_fmt}", f, file_name=f"roster_{subject_type.lower()}{EXPORT_FORMATS[prepared_fmt]}", key=f"exp_dl_{subject_type}")
+
+    @st.fragment
+    def render_tab_editor(subject_type, staff_cols):
+        """
+        Column config + editor for one tab. Runs as a fragment: toggling a column or
+        editing a cell reruns only this tab, against the same roster snapshot.
+        """
+        visible_cols = render_tab_config(subject_type)
+        # Safety filter to ensure columns exist in DF (Prevent KeyError)
+        tab_cols = [c for c in visible_cols if c in filtered_df.columns]
+        
+        if tab_cols:
+            # Pagination & sorting happen here; the browser only receives the current page
+            pc1, pc2, pc3, pc4 = st.columns([1, 2, 1, 1])
+            page_size = pc1.selectbox("Rows per page", EDITOR_PAGE_SIZES, index=1, key=f"ps_{subject_type}")
+            sort_by = pc2.selectbox("Sort by", ["(Default)"] + [c for c in tab_cols if c != "Sync?"], key=f"sort_{subject_type}")
+            descending = pc3.toggle("Descending", key=f"desc_{subject_type}")
+            page_size = None if page_size == "All" else page_size
+            n_pages = page_bounds(len(filtered_df), 1, page_size)[2]
+            page = pc4.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, value=1, key=f"pg_{subject_type}")
+
+            view = sort_for_editor(filtered_df, None if sort_by == "(Default)" else sort_by, descending)
+            start, stop, _ = page_bounds(len(view), page, page_size)
+            page_df = view.iloc[start:stop]
+            if page_size:
+                st.caption(f"Showing rows {start + 1}–{stop} of {len(view)}")
+
+            # One editor (and edit state) per view/page so positions in edited_rows stay valid;
+            # pages of another page size or sort order are dropped with their edits
+            view_key = f"editor_{subject_type}_{filters_id}_{editor_view_id(page_size, sort_by, descending)}_"
+            prune_editor_pages(subject_type, view_key)
+            editor_key = f"{view_key}{page}"
+            render_editor(page_df[tab_cols], page_df["Matrix_No"].tolist(), [c for c in staff_cols if c in tab_cols], subject_type, editor_key)
+            render_export(subject_type, visible_cols)
+        else:
+            st.warning("All columns hidden. Please enable some in 'Configure Table Columns'.")
+
+        # Sync? ticks feed the Sync buttons and Document Actions outside this fragment
+        if sync_ticks(subject_type) != st.session_state.get(f"_ticks_{subject_type}"):
+            st.rerun()
+
+    @st.fragment
+    def render_document_actions(rows):
+        """Download buttons for the ticked students (reruns on its own when a button is used)."""
+        st.markdown("---")
+        st.subheader("📂 Document Actions")
+        st.write(f"Selected {len(rows)} student(s).")
+        
+        for s in rows.to_dict("records"):
+            n = s['Student_Name']
+            m = s['Matrix_No']
+            # NULL documents come back as NaN from pandas; treat as "no file"
+            path_l = s['Lapor Diri'] if isinstance(s['Lapor Diri'], str) else ""
+            path_a = s['Aku Janji'] if isinstance(s['Aku Janji'], str) else ""
+            
+            c1, c2, c3 = st.columns([2, 1, 1])
+            c1.write(f"**{n}** ({m})")
+            
+            with c2:
+                if path_l and path_l != "":
+                    if os.path.exists(os.path.join("uploads", path_l)):
+                        with open(os.path.join("uploads", path_l), "rb") as f:
+                            st.download_button(f"📥 Lapor Diri", f, file_name=path_l, key=f"dl_l_{m}")
+                    else: st.error("File missing")
+                else: st.write("No Lapor Diri")
+                
+            with c3:
+                if path_a and path_a != "":
+                    if os.path.exists(os.path.join("uploads", path_a)):
+                        with open(os.path.join("uploads", path_a), "rb") as f:
+                            st.download_button(f"📥 Aku Janji", f, file_name=path_a, key=f"dl_a_{m}")
+                    else: st.error("File missing")
+                else: st.write("No Aku Janji")
+            st.divider()
 
     tab_f1, tab_f2, tab_li = st.tabs(["📘 FYP 1", "📗 FYP 2", "🏢 Industrial Training"])
 
@@ -962,74 +1256,23 @@ def show_dashboard():
                     st.warning("No students to sync.")
 
         # Analytics
-        render_subject_analytics(filtered_df, "FYP 1")
-
-        tab_cols = render_tab_config("FYP_1")
-        # Safety filter to ensure columns exist in DF (Prevent KeyError)
-        tab_cols = [c for c in tab_cols if c in filtered_df.columns]
-        
-        if tab_cols:
-            render_editor(filtered_df[tab_cols], [c for c in ["FYP 1 SV", "FYP 1 Panel"] if c in tab_cols], "FYP_1")
-        else:
-            st.warning("All columns hidden. Please enable some in 'Configure Table Columns'.")
+        render_subject_analytics("FYP 1")
+        render_tab_editor("FYP_1", ["FYP 1 SV", "FYP 1 Panel"])
         
     with tab_f2:
         # Analytics
-        render_subject_analytics(filtered_df, "FYP 2")
-
-        tab_cols = render_tab_config("FYP_2")
-        tab_cols = [c for c in tab_cols if c in filtered_df.columns]
-        
-        if tab_cols:
-            render_editor(filtered_df[tab_cols], [c for c in ["FYP 2 SV", "FYP 2 Panel"] if c in tab_cols], "FYP_2")
-        else:
-            st.warning("All columns hidden.")
+        render_subject_analytics("FYP 2")
+        render_tab_editor("FYP_2", ["FYP 2 SV", "FYP 2 Panel"])
         
     with tab_li:
         # Analytics
-        render_subject_analytics(filtered_df, "Li") # typo fix: LI
-
-        tab_cols = render_tab_config("LI")
-        tab_cols = [c for c in tab_cols if c in filtered_df.columns]
-        
-        if tab_cols:
-            render_editor(filtered_df[tab_cols], [c for c in ["LI Industry SV", "LI Uni SV"] if c in tab_cols], "LI")
-        else:
-            st.warning("All columns hidden.")
+        render_subject_analytics("LI")
+        render_tab_editor("LI", ["LI Industry SV", "LI Uni SV"])
 
 
     # Document Download Section
-    if rows_to_download:
-        st.markdown("---")
-        st.subheader("📂 Document Actions")
-        st.write(f"Selected {len(rows_to_download)} student(s).")
-        import os
-        
-        for s in rows_to_download:
-            n = s['Student_Name']
-            m = s['Matrix_No']
-            path_l = s['Lapor Diri']
-            path_a = s['Aku Janji']
-            
-            c1, c2, c3 = st.columns([2, 1, 1])
-            c1.write(f"**{n}** ({m})")
-            
-            with c2:
-                if path_l and path_l != "":
-                    if os.path.exists(os.path.join("uploads", path_l)):
-                        with open(os.path.join("uploads", path_l), "rb") as f:
-                            st.download_button(f"📥 Lapor Diri", f, file_name=path_l, key=f"dl_l_{m}")
-                    else: st.error("File missing")
-                else: st.write("No Lapor Diri")
-                
-            with c3:
-                if path_a and path_a != "":
-                    if os.path.exists(os.path.join("uploads", path_a)):
-                        with open(os.path.join("uploads", path_a), "rb") as f:
-                            st.download_button(f"📥 Aku Janji", f, file_name=path_a, key=f"dl_a_{m}")
-                    else: st.error("File missing")
-                else: st.write("No Aku Janji")
-            st.divider()
+    if not rows_to_download.empty:
+        render_document_actions(rows_to_download)
 
 def show_add_student():
     st.header("👨‍🎓 Add New Student")
@@ -1241,7 +1484,7 @@ def show_register_company():
 def show_manage_data():
     st.header("⚙️ Manage Data")
     
-    t1, t2, t3, t4, t5, t6 = st.tabs(["📋 Student List", "🗑️ Delete Student", "⚠️ Danger Zone", "📂 Archive Data", "📜 Audit Logs", "📝 Bulk Update Titles"])
+    t1, t2, t3, t4, t5, t6, t7, t8, t9 = st.tabs(["📋 Student List", "🗑️ Delete Student", "⚠️ Danger Zone", "📂 Archive Data", "📜 Audit Logs", "📝 Bulk Update Titles", "🎚️ Grade Scales", "📣 Reminders", "🗂️ Semester Reports"])
     
     with t1:
         st.subheader("All Students")
@@ -1308,21 +1551,17 @@ def show_manage_data():
 
         st.divider()
         st.subheader("Unarchive by Cohort")
-        # Fetch only archived students
-        all_s = db.get_all_students_data(include_archived=True)
-        if not all_s.empty:
-            archived_df = all_s[all_s['is_archived'] == 1]
-            if not archived_df.empty:
-                cohorts_arch = sorted(archived_df['Cohort'].dropna().unique().tolist())
-                c_unarch = st.selectbox("Select Cohort to Restore", ["-"] + cohorts_arch)
-                if c_unarch != "-":
-                    st.warning(f"⚠️ This will restore ALL students in cohort {c_unarch} to the active dashboard.")
-                    if st.button("Unarchive Cohort", type="primary"):
-                        success, msg = db.unarchive_students_by_cohort(c_unarch, changed_by="Admin")
-                        if success: st.success(msg); st.rerun()
-                        else: st.error(msg)
-            else: st.info("No archived data found.")
-        else: st.info("Database is empty.")
+        # Cohort column of the archive table only
+        cohorts_arch = db.get_archived_cohorts()
+        if cohorts_arch:
+            c_unarch = st.selectbox("Select Cohort to Restore", ["-"] + cohorts_arch)
+            if c_unarch != "-":
+                st.warning(f"⚠️ This will restore ALL students in cohort {c_unarch} to the active dashboard.")
+                if st.button("Unarchive Cohort", type="primary"):
+                    success, msg = db.unarchive_students_by_cohort(c_unarch, changed_by="Admin")
+                    if success: st.success(msg); st.rerun()
+                    else: st.error(msg)
+        else: st.info("No archived data found.")
 
     with t5:
         st.subheader("System Audit Logs")
@@ -1343,10 +1582,17 @@ def show_manage_data():
                 if 'Matrix Number' in df_titles.columns and 'FYP Title' in df_titles.columns:
                     st.write("### Preview Data")
                     st.dataframe(df_titles[['Matrix Number', 'FYP Title']].head(), use_container_width=True)
+                    # Titles as they were when this file was previewed; the update is checked against them
+                    roster = get_roster_cache().get().df
+                    matrices = df_titles['Matrix Number'].astype(str).str.strip()
+                    baseline = st.session_state.setdefault(f"_baseline_titles_{up_file.file_id}",
+                                                           edit_baseline(roster[roster["Matrix_No"].isin(matrices)], ["FYP_Title"]))
                     
                     if st.button("Confirm & Update Titles", type="primary"):
                         with st.spinner("Updating Titles..."):
-                            count, errs = db.bulk_update_titles(df_titles)
+                            originals = {m: baseline_row(baseline, m) for m in baseline}
+                            count, errs = db.bulk_update_titles(df_titles, originals, changed_by="Admin")
+                            st.session_state.pop(f"_baseline_titles_{up_file.file_id}", None)
                             if count > 0:
                                 st.success(f"✅ Successfully updated {count} titles!")
                             if errs:
@@ -1361,12 +1607,267 @@ def show_manage_data():
             except Exception as e:
                 st.error(f"Error processing file: {e}")
 
+    with t7:
+        st.subheader("Grade Scales")
+        st.info("Students without a scale for their Program/Cohort are graded with the default scale.")
+        st.caption("Default: " + ", ".join(f"{l} ≥ {b:g}" for l, b in zip(DEFAULT_SCALE.labels[1:][::-1], DEFAULT_SCALE.boundaries[::-1])) + f", otherwise {DEFAULT_SCALE.labels[0]}")
+
+        scales_df = db.get_grade_scales()
+        if not scales_df.empty:
+            for _, row in scales_df.iterrows():
+                c1, c2 = st.columns([5, 1])
+                c1.write(f"**{row.get('program') or 'All Programs'} / {row.get('cohort') or 'All Cohorts'}**: "
+                         f"{row['boundaries']} → {row['labels']}")
+                if c2.button("🗑️ Delete", key=f"del_scale_{row['scale_id']}"):
+                    db.delete_grade_scale(row['scale_id'])
+                    load_grade_scales.clear()
+                    st.rerun()
 
+        with st.form("grade_scale_form"):
+            c1, c2 = st.columns(2)
+            with c1: g_prog = st.text_input("Program (blank = all)")
+            with c2: g_cohort = st.text_input("Cohort (blank = all)")
+            g_bounds = st.text_input("Boundaries, lowest first", value=", ".join(f"{b:g}" for b in DEFAULT_SCALE.boundaries))
+            g_labels = st.text_input("Labels, lowest band first (one more than boundaries)", value=", ".join(DEFAULT_SCALE.labels))
+            if st.form_submit_button("Save Grade Scale", type="primary"):
+                try:
+                    scale = GradeScale(g_bounds.split(","), g_labels.split(","))
+                    ok, msg = db.save_grade_scale(g_prog.strip() or None, g_cohort.strip() or None, scale.boundaries.tolist(), scale.labels)
+                    if ok:
+                        load_grade_scales.clear()
+                        st.success(msg); st.rerun()
+                    else: st.error(msg)
+                except ValueError as e:
+                    st.error(f"Invalid scale: {e}")
+
+    with t8:
+        st.subheader("Reminder Campaigns")
+        mailer = get_mailer()
+        if mailer is None:
+            st.warning("⚠️ Email configuration missing. Please add `EMAIL_USER` and `EMAIL_PASSWORD` to `.streamlit/secrets.toml`.")
+
+        kind = st.selectbox("Campaign", list(campaigns.CAMPAIGNS), format_func=lambda k: campaigns.CAMPAIGNS[k]["label"])
+        spec = campaigns.CAMPAIGNS[kind]
+        roster = get_roster_cache().get().df
+        if kind == "missing_docs":
+            recipients = campaigns.missing_docs_recipients(roster)
+        else:
+            recipients = campaigns.staff_ungraded_recipients(roster, db.get_staff())
+
+        st.caption("Placeholders: " + ", ".join("{" + f + "}" for f in spec["fields"]))
+        subject = st.text_input("Subject", value=spec["subject"], key=f"camp_subject_{kind}")
+        body = st.text_area("Message", value=spec["body"], height=200, key=f"camp_body_{kind}")
+
+        st.metric("Recipients", len(recipients))
+        _, cap = mail_limits()
+        if mailer is not None and cap:
+            left = max(0, cap - mailer.sent_since(time.time() - CAP_WINDOW))
+            if len(recipients) > left:
+                st.warning(f"⚠️ Daily sending cap: {left} of {cap} left in the last 24 h. The rest stay queued and go out as the cap frees up.")
+        if not recipients.empty:
+            with st.expander("Recipients & preview"):
+                st.dataframe(recipients, hide_index=True, use_container_width=True)
+                try:
+                    campaigns.check_template(kind, subject, body)
+                    email, p_subject, p_body = campaigns.render_messages(recipients.head(1), subject, body)[0]
+                    st.markdown(f"**To:** {email}  \n**Subject:** {p_subject}")
+                    st.text(p_body)
+                except ValueError as e:
+                    st.error(str(e))
+
+        if st.button("📨 Send Reminders", type="primary", disabled=mailer is None or recipients.empty):
+            try:
+                campaign, n = campaigns.launch(mailer, kind, recipients, subject, body)
+                st.success(f"✅ {n} reminder(s) queued as `{campaign}`. They are sent in the background.")
+            except ValueError as e:
+                st.error(str(e))
+            except Exception as e:
+                st.error(f"Error queueing reminders: {e}")
+
+        if mailer is not None:
+            st.markdown("#### Delivery Status")
+            history = mailer.campaigns(exclude=(campaigns.RECOVERY_CAMPAIGN,))
+            if not history:
+                st.caption("No campaigns sent yet.")
+            else:
+                if st.button("🔄 Refresh Status"):
+                    st.rerun()
+                status_df = pd.DataFrame(history)
+                status_df["started"] = pd.to_datetime(status_df["started"], unit="s")
+                st.dataframe(status_df, hide_index=True, use_container_width=True)
+                failed = mailer.messages(status_df["campaign"].iloc[0])
+                failed = [m for m in failed if m["status"] == "failed"]
+                if failed:
+                    with st.expander(f"❌ {len(failed)} failed in latest campaign"):
+                        st.dataframe(pd.DataFrame(failed), hide_index=True, use_container_width=True)
+
+    with t9:
+        st.subheader("Semester Mark Sheets")
+        st.info("One Excel mark sheet (with grade distribution) per Program / Cohort / Subject, bundled in a single zip.")
+        roster = get_roster_cache().get(include_archived=st.checkbox("Include archived students", key="rep_archived")).df
+        rc1, rc2, rc3 = st.columns(3)
+        rep_programs = rc1.multiselect("Programs", sorted(roster["Program"].dropna().unique().tolist()), placeholder="All programs")
+        rep_cohorts = rc2.multiselect("Cohorts", sorted(roster["Cohort"].dropna().unique().tolist()), placeholder="All cohorts")
+        rep_subjects = rc3.multiselect("Subjects", list(REPORT_SUBJECTS), default=list(REPORT_SUBJECTS))
+
+        selected = roster
+        if rep_programs: selected = selected[selected["Program"].isin(rep_programs)]
+        if rep_cohorts: selected = selected[selected["Cohort"].isin(rep_cohorts)]
+        n_groups = len(selected[["Program", "Cohort"]].drop_duplicates())
+        st.caption(f"{len(selected)} student(s) in {n_groups} program/cohort group(s) → {n_groups * len(rep_subjects)} report(s)")
+
+        if st.button("🗂️ Generate Reports", type="primary", disabled=selected.empty or not rep_subjects):
+            bar = st.progress(0.0, text="Starting report workers...")
+            def on_report(done, total, name):
+                bar.progress(done / total, text=f"{done}/{total} · {name}")
+            try:
+                fd, path = tempfile.mkstemp(prefix="mark_sheets_", suffix=".zip")
+                os.close(fd)
+                n = generate_reports(selected, path, scales=scales_from_frame(load_grade_scales()), subjects=rep_subjects, progress=on_report)
+                previous = st.session_state.pop("_reports_zip", None)
+                if previous and os.path.exists(previous):
+                    os.remove(previous)
+                st.session_state["_reports_zip"] = path
+                st.success(f"✅ {n} report(s) generated.")
+            except Exception as e:
+                st.error(f"Report generation failed: {e}")
+
+        reports_zip = st.session_state.get("_reports_zip")
+        if reports_zip and os.path.exists(reports_zip):
+            with open(reports_zip, "rb") as f:
+                st.download_button("📥 Download Mark Sheets (.zip)", f, file_name="mark_sheets.zip", mime="application/zip")
+
+
+
+# ===========================
+# RUBRIC CATALOG
+# ===========================
+# The Rubric Manager lists rubrics per subject, one page at a time: the catalog
+# (counts per subject/cohort) drives the filters and group headers, and a page
+# is fetched, with its file links signed in one request, only for an open group.
+
+RUBRIC_SUBJECTS = ["FYP 1", "FYP 2", "LI"]
+RUBRIC_PAGE_SIZE = 10
+
+@st.cache_data(ttl=60, show_spinner=False)
+def storage_status():
+    """(connected, message); checked once a minute rather than on every rerun."""
+    return sb.test_connection()
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_rubric_catalog(version):
+    """{(subject, cohort): count} of all rubrics."""
+    return db.get_rubric_catalog()
+
+@st.cache_data(ttl=300, show_spinner=False, max_entries=64)
+def load_rubric_page(version, subject, cohort, page):
+    """(rows, {filename: url}) for one page of a subject's rubrics. Signed links outlive the ttl."""
+    rows = db.get_rubric_page(subject, cohort, (page - 1) * RUBRIC_PAGE_SIZE, RUBRIC_PAGE_SIZE)
+    if rows.empty:
+        return rows, {}
+    files = rows["filename"].tolist()
+    urls = sb.get_signed_urls("rubrics", files)
+    # Fallback to Public URL
+    urls.update({f: sb.get_public_url("rubrics", f) for f in files if f not in urls})
+    return rows, urls
+
+def render_rubric_group(subject, cohort, total, version):
+    """The current page of one subject's rubrics."""
+    n_pages = page_bounds(total, 1, RUBRIC_PAGE_SIZE)[2]
+    page = 1
+    if n_pages > 1:
+        page = st.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, value=1, key=f"rub_pg_{subject}_{cohort}")
+    rows, urls = load_rubric_page(version, subject, cohort, page)
+    start, stop, _ = page_bounds(total, page, RUBRIC_PAGE_SIZE)
+    if n_pages > 1:
+        st.caption(f"Showing rubrics {start + 1}–{stop} of {total}")
+    for _, row in rows.iterrows():
+        render_rubric_row(row, urls.get(row['filename']))
+
+def render_rubric_row(row, public_url):
+    """One rubric: details, link/view/edit/delete buttons, and its edit form or PDF viewer when open."""
+    with st.container():
+        c1, c2, c3, c4 = st.columns([3, 1.5, 1, 1])
+        with c1:
+            st.write(f"**{row['item_name']}** (Cohort: {row['cohort']})")
+            st.caption(f"File: {row['filename']}")
+
+        with c2:
+            if public_url:
+                st.link_button("📥 Open/Download", public_url)
+            else:
+                st.error("Link Error")
+
+        with c3:
+            if public_url:
+                if st.button("👁️ View", key=f"view_admin_{row['rubric_id']}"):
+                    if st.session_state.get("viewing_pdf") == row['rubric_id']:
+                        st.session_state["viewing_pdf"] = None # Toggle Close
+                    else:
+                        st.session_state["viewing_pdf"] = row['rubric_id']
+
+        with c4:
+            if st.button("✏️ Edit", key=f"edit_btn_{row['rubric_id']}"):
+                if st.session_state.get("edit_rubric_id") == row['rubric_id']:
+                    st.session_state["edit_rubric_id"] = None
+                else:
+                    st.session_state["edit_rubric_id"] = row['rubric_id']
+
+            if st.button("🗑️ Delete", key=f"del_admin_{row['rubric_id']}"):
+                sb.delete_from_bucket("rubrics", row['filename'])
+                db.delete_rubric(row['rubric_id'])
+                st.rerun()
+
+        # Edit Form Section
+        if st.session_state.get("edit_rubric_id") == row['rubric_id']:
+            with st.container():
+                st.info("📝 Editing Rubric Details")
+                ec1, ec2 = st.columns(2)
+                with ec1:
+                    n_subj = st.selectbox("Subject", ["FYP 1", "FYP 2", "LI"], index=["FYP 1", "FYP 2", "LI"].index(row['subject']), key=f"es_{row['rubric_id']}")
+                    n_item = st.text_input("Item Name", value=row['item_name'], key=f"ei_{row['rubric_id']}")
+                with ec2:
+                    n_cohort = st.text_input("Cohort", value=row['cohort'], key=f"ec_{row['rubric_id']}")
+                    n_file = st.file_uploader("Replace PDF (Optional)", type=["pdf"], key=f"ef_{row['rubric_id']}")
+
+                if st.button("💾 Save Changes", key=f"save_{row['rubric_id']}", type="primary"):
+                    final_fname = None
+                    if n_file:
+                        # Save new file
+                        save_dir = os.path.join("uploads", "rubrics")
+                        safe_item = "".join([c if c.isalnum() else "_" for c in n_item])
+                        safe_cohort = "".join([c if c.isalnum() else "_" for c in n_cohort])
+                        final_fname = f"{n_subj.replace(' ', '_')}_{safe_cohort}_{safe_item}.pdf"
+
+                        # Remove old file if name changed or just clean up? 
+                        # If we overwrite, ok. If name changes, we should clean old.
+                        # For simplicity, let's just save new.
+                        with st.spinner("Uploading new file..."):
+                            sb.upload_to_bucket("rubrics", final_fname, n_file.getvalue())
+
+                    with st.spinner("Updating..."):
+                        s, m = db.update_rubric(row['rubric_id'], n_subj, n_cohort, n_item, final_fname)
+                        if s: 
+                            st.success("Updated!"); st.session_state["edit_rubric_id"] = None; st.rerun()
+                        else: st.error(m)
+                st.divider()
+
+        # PDF Viewer Section
+        if st.session_state.get("viewing_pdf") == row['rubric_id'] and public_url:
+            st.markdown(f"**Viewing: {row['item_name']}**")
+            pdf_display = f'<iframe src="{public_url}" width="100%" height="800"></iframe>'
+            st.markdown(pdf_display, unsafe_allow_html=True)
+            if st.button("Close Viewer", key=f"close_{row['rubric_id']}"):
+                st.session_state["viewing_pdf"] = None
+                st.rerun()
+            st.divider()
+        elif st.session_state.get("edit_rubric_id") != row['rubric_id']:
+            st.divider()
 
 def show_rubric_manager():
     st.header("📑 Rubric Manager (Cloud Storage)")
     
-    conn, msg = sb.test_connection()
+    conn, msg = storage_status()
     if conn: st.caption(f"🟢 Storage: {msg}")
     else: st.error(f"🔴 Storage Error: {msg}")
     
@@ -1418,121 +1919,37 @@ def show_rubric_manager():
 
     with tab2:
         st.subheader("Existing Rubrics")
-        if not hasattr(db, "get_rubrics"):
-            st.error("⚠️ The `database.py` file on this server is outdated and missing Rubric functions. Please update `database.py`.")
-            df = pd.DataFrame() # Empty DF fallback
-        else:
-            df = db.get_rubrics()
+        version = db.change_version("rubrics")
+        catalog = load_rubric_catalog(version)
         
-        if not df.empty:
+        if catalog:
             # Filters
             fc1, fc2 = st.columns(2)
             with fc1:
-                sub_filter = st.selectbox("Filter by Subject", ["All", "FYP 1", "FYP 2", "LI"], key="rub_sub_filter")
+                sub_filter = st.selectbox("Filter by Subject", ["All"] + RUBRIC_SUBJECTS, key="rub_sub_filter")
             with fc2:
-                cohorts = ["All"] + sorted(df['cohort'].unique().tolist())
+                cohorts = ["All"] + sorted({c for _, c in catalog if c})
                 coh_filter = st.selectbox("Filter by Cohort", cohorts, key="rub_coh_filter")
             
-            # Apply Filters
-            df_display = df.copy()
-            if sub_filter != "All":
-                df_display = df_display[df_display['subject'] == sub_filter]
-            if coh_filter != "All":
-                df_display = df_display[df_display['cohort'] == coh_filter]
-
-            if df_display.empty:
+            subjects = RUBRIC_SUBJECTS if sub_filter == "All" else [sub_filter]
+            cohort = None if coh_filter == "All" else coh_filter
+            counts = {sub: sum(n for (s, c), n in catalog.items() if s == sub and cohort in (None, c)) for sub in subjects}
+
+            if not any(counts.values()):
                 st.info("No rubrics match the filters.")
             else:
-                # Group by Subject for cleaner view
-                subjects = ["FYP 1", "FYP 2", "LI"]
+                # One group per subject; a closed group runs no query and renders no widgets.
+                # Open groups are remembered, as a new count in the label resets the expander.
+                open_groups = st.session_state.setdefault("rub_open_groups", set())
                 for sub in subjects:
-                    sub_df = df_display[df_display['subject'] == sub]
-                    if not sub_df.empty:
-                        st.markdown(f"#### {sub}")
-                        for _, row in sub_df.iterrows():
-                            with st.container():
-                                c1, c2, c3, c4 = st.columns([3, 1.5, 1, 1])
-                                with c1:
-                                    st.write(f"**{row['item_name']}** (Cohort: {row['cohort']})")
-                                    st.caption(f"File: {row['filename']}")
-                                
-                                # Try Signed URL first (More reliable for View)
-                                public_url = sb.get_signed_url("rubrics", row['filename'])
-                                if not public_url:
-                                     # Fallback to Public URL
-                                     public_url = sb.get_public_url("rubrics", row['filename'])
-
-                                with c2:
-                                    if public_url:
-                                        st.link_button("📥 Open/Download", public_url)
-                                    else:
-                                        st.error("Link Error")
-
-                                with c3:
-                                    if public_url:
-                                        if st.button("👁️ View", key=f"view_admin_{row['rubric_id']}"):
-                                            if st.session_state.get("viewing_pdf") == row['rubric_id']:
-                                                st.session_state["viewing_pdf"] = None # Toggle Close
-                                            else:
-                                                st.session_state["viewing_pdf"] = row['rubric_id']
-                                                
-                                with c4:
-                                    if st.button("✏️ Edit", key=f"edit_btn_{row['rubric_id']}"):
-                                        if st.session_state.get("edit_rubric_id") == row['rubric_id']:
-                                            st.session_state["edit_rubric_id"] = None
-                                        else:
-                                            st.session_state["edit_rubric_id"] = row['rubric_id']
-                                            
-                                    if st.button("🗑️ Delete", key=f"del_admin_{row['rubric_id']}"):
-                                        sb.delete_from_bucket("rubrics", row['filename'])
-                                        db.delete_rubric(row['rubric_id'])
-                                        st.rerun()
-                                
-                                # Edit Form Section
-                                if st.session_state.get("edit_rubric_id") == row['rubric_id']:
-                                    with st.container():
-                                        st.info("📝 Editing Rubric Details")
-                                        ec1, ec2 = st.columns(2)
-                                        with ec1:
-                                            n_subj = st.selectbox("Subject", ["FYP 1", "FYP 2", "LI"], index=["FYP 1", "FYP 2", "LI"].index(row['subject']), key=f"es_{row['rubric_id']}")
-                                            n_item = st.text_input("Item Name", value=row['item_name'], key=f"ei_{row['rubric_id']}")
-                                        with ec2:
-                                            n_cohort = st.text_input("Cohort", value=row['cohort'], key=f"ec_{row['rubric_id']}")
-                                            n_file = st.file_uploader("Replace PDF (Optional)", type=["pdf"], key=f"ef_{row['rubric_id']}")
-                                        
-                                        if st.button("💾 Save Changes", key=f"save_{row['rubric_id']}", type="primary"):
-                                            final_fname = None
-                                            if n_file:
-                                                # Save new file
-                                                save_dir = os.path.join("uploads", "rubrics")
-                                                safe_item = "".join([c if c.isalnum() else "_" for c in n_item])
-                                                safe_cohort = "".join([c if c.isalnum() else "_" for c in n_cohort])
-                                                final_fname = f"{n_subj.replace(' ', '_')}_{safe_cohort}_{safe_item}.pdf"
-                                                
-                                                # Remove old file if name changed or just clean up? 
-                                                # If we overwrite, ok. If name changes, we should clean old.
-                                                # For simplicity, let's just save new.
-                                                with st.spinner("Uploading new file..."):
-                                                    sb.upload_to_bucket("rubrics", final_fname, n_file.getvalue())
-                                            
-                                            with st.spinner("Updating..."):
-                                                s, m = db.update_rubric(row['rubric_id'], n_subj, n_cohort, n_item, final_fname)
-                                                if s: 
-                                                    st.success("Updated!"); st.session_state["edit_rubric_id"] = None; st.rerun()
-                                                else: st.error(m)
-                                        st.divider()
-
-                                # PDF Viewer Section
-                                if st.session_state.get("viewing_pdf") == row['rubric_id'] and public_url:
-                                    st.markdown(f"**Viewing: {row['item_name']}**")
-                                    pdf_display = f'<iframe src="{public_url}" width="100%" height="800"></iframe>'
-                                    st.markdown(pdf_display, unsafe_allow_html=True)
-                                    if st.button("Close Viewer", key=f"close_{row['rubric_id']}"):
-                                        st.session_state["viewing_pdf"] = None
-                                        st.rerun()
-                                    st.divider()
-                                elif st.session_state.get("edit_rubric_id") != row['rubric_id']:
-                                    st.divider()
+                    if not counts[sub]:
+                        continue
+                    group = st.expander(f"{sub} ({counts[sub]})", expanded=sub in open_groups, key=f"rub_group_{sub}", on_change="rerun")
+                    if group.open: open_groups.add(sub)
+                    else: open_groups.discard(sub)
+                    with group:
+                        if group.open:
+                            render_rubric_group(sub, cohort, counts[sub], version)
         else:
             st.info("No rubrics uploaded.")
 
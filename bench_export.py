@@ -0,0 +1,40 @@
+import sys
+import os
+import time
+sys.path.append('.')
+import numpy as np
+import pandas as pd
+from roster_export import export_roster, FORMATS
+
+# Benchmark: exporting a 50k-row roster with the dashboard's FYP 1 columns
+N = 50000
+rng = np.random.default_rng(0)
+
+df = pd.DataFrame({
+    "Matrix_No": [f"B0{i:08d}" for i in range(N)],
+    "Student_Name": [f"Student {i}" for i in range(N)],
+    "Email": [f"s{i}@student.edu.my" for i in range(N)],
+    "Password": ["scrypt$14$8$1$salt$hash"] * N,
+    "Program": rng.choice(["BEB", "BEC", "BEE"], N),
+    "Cohort": rng.choice(["2022", "2023", "2024"], N),
+    "Lapor Diri": np.where(rng.random(N) < 0.8, "x_lapor_diri.pdf", None),
+    "Aku Janji": np.where(rng.random(N) < 0.7, "x_aku_janji.pdf", ""),
+    "FYP_Company": rng.choice(["Acme (Selangor)", "Globex (Johor)", "-"], N),
+    "FYP 1 Marks": np.where(rng.random(N) < 0.6, rng.uniform(30, 100, N).round(2), np.nan),
+    "FYP 1 SV": rng.choice(["Dr A", "Dr B", None], N),
+    "FYP_Title": [f"Project {i}" for i in range(N)],
+})
+visible = ["Sync?", "No.", "Status", "Student_Name", "Matrix_No", "Email", "Password", "Program", "Cohort",
+           "Lapor Diri", "Aku Janji", "FYP_Company", "FYP 1 Marks", "FYP 1 SV", "FYP Title"]
+
+for fmt in FORMATS:
+    t = time.perf_counter()
+    path, n = export_roster(df, visible, fmt)
+    elapsed = time.perf_counter() - t
+    print(f"{fmt:8s} {n} rows in {elapsed:.2f} s | {os.path.getsize(path) / 1e6:.1f} MB file")
+    os.remove(path)
+
+t = time.perf_counter()
+df.to_excel("/tmp/_bench_full.xlsx", index=False)
+print(f"df.to_excel (whole frame, regular workbook) {time.perf_counter() - t:.2f} s")
+os.remove("/tmp/_bench_full.xlsx")
@@ -0,0 +1,54 @@
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append('.')
+import credentials
+from credentials import hash_password, check_password
+
+# Benchmark: sustained logins/second through the bounded verification pool.
+# Peak = start of semester, ~1500 students logging in within an hour (0.42/s on
+# average); we want a wide margin for bursts, e.g. 10% of them in the same minute.
+# Usage: python bench_logins.py [costs...]   (log2 scrypt N, default 12 13 14 15)
+PEAK_PER_HOUR = 1500
+BURST_PER_MINUTE = PEAK_PER_HOUR * 0.10
+SESSIONS = 16 # concurrent Streamlit script threads submitting logins
+LOGINS = 64
+
+costs = [int(c) for c in sys.argv[1:]] or [12, 13, 14, 15]
+print(f"Verification workers: {credentials.VERIFY_WORKERS} | target: {PEAK_PER_HOUR}/h sustained, {BURST_PER_MINUTE:.0f}/min burst ({BURST_PER_MINUTE / 60:.1f}/s)")
+
+def bystander_p95(seconds=0.5):
+    """p95 of a small unit of script work, as seen by a session that isn't logging in."""
+    ticks, end = [], time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        t = time.perf_counter(); sum(range(20000)); ticks.append(time.perf_counter() - t)
+    return sorted(ticks)[int(len(ticks) * 0.95)] * 1000
+
+print(f"Idle: other session p95 {bystander_p95():.2f} ms")
+
+for cost in costs:
+    credentials.HASH_COST = cost # so matching logins don't count as needing a rehash
+    stored = hash_password("B032110001", cost=cost)
+
+    # Latency seen by another session's script thread while logins are queued
+    stop = threading.Event()
+    ticks = []
+    def other_session():
+        while not stop.is_set():
+            t = time.perf_counter(); sum(range(20000)); ticks.append(time.perf_counter() - t)
+    bystander = threading.Thread(target=other_session); bystander.start()
+
+    t = time.perf_counter()
+    with ThreadPoolExecutor(SESSIONS) as sessions:
+        results = list(sessions.map(lambda _: check_password("B032110001", stored), range(LOGINS)))
+    elapsed = time.perf_counter() - t
+    stop.set(); bystander.join()
+
+    assert all(ok and not rehash for ok, rehash in results)
+    rate = LOGINS / elapsed
+    ticks.sort()
+    p95 = ticks[int(len(ticks) * 0.95)] * 1000 if ticks else 0
+    verdict = "OK" if rate >= BURST_PER_MINUTE / 60 else "too slow for burst"
+    print(f"cost {cost:>2} (N=2^{cost}): {rate:6.1f} logins/s = {rate * 3600:>8.0f}/h | "
+          f"other session p95 {p95:.2f} ms | {verdict}")
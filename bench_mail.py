@@ -0,0 +1,48 @@
+import os
+import sys
+import tempfile
+import time
+sys.path.append('.')
+from mail_queue import MailQueue, MailWorker, SmtpSender, LocalSMTPServer, DEFAULT_RATE_PER_MINUTE, SENT
+
+# Benchmark: reminder campaign delivery time through MailQueue + MailWorker against
+# the in-process LocalSMTPServer (one reused connection, as in production).
+#  1. unthrottled: what the queue and one SMTP session sustain on their own
+#  2. throttled at DEFAULT_RATE_PER_MINUTE: the rate actually delivered
+# A campaign to CAMPAIGN_SIZE recipients should finish within TARGET_MINUTES.
+# Usage: python bench_mail.py [rate per minute]
+CAMPAIGN_SIZE = 1000
+TARGET_MINUTES = 10
+THROTTLED_SAMPLE = 30 # messages sent at the configured rate (keeps the run short)
+
+rate = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_RATE_PER_MINUTE
+
+
+def deliver(n, rate_per_minute):
+    """Seconds to send n queued messages at a rate (0 = unthrottled)."""
+    server = LocalSMTPServer().start()
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = MailQueue(os.path.join(tmp, "outbox.db"))
+        queue.enqueue_many([(f"s{i}@uni.my", "WBL Reminder", "Hello,\n\nPlease submit.\n") for i in range(n)], campaign="bench")
+        worker = MailWorker(queue, SmtpSender(*server.address, starttls=False, sender="wbl@uni.my"), rate_per_minute=rate_per_minute)
+        t = time.perf_counter()
+        while queue.status_counts("bench").get(SENT, 0) < n:
+            worker.run_once()
+        elapsed = time.perf_counter() - t
+        worker.sender.close()
+    server.stop()
+    return elapsed
+
+
+if __name__ == "__main__":
+    raw = deliver(CAMPAIGN_SIZE, 0)
+    capacity = CAMPAIGN_SIZE / raw * 60
+    print(f"Unthrottled: {CAMPAIGN_SIZE} messages in {raw:.2f} s ({capacity:,.0f}/min)")
+
+    sample = deliver(THROTTLED_SAMPLE, rate)
+    measured = (THROTTLED_SAMPLE - 1) / sample * 60 # the first message goes out immediately
+    campaign_min = CAMPAIGN_SIZE / min(measured, capacity)
+    print(f"Throttled at {rate}/min: measured {measured:.0f}/min -> {CAMPAIGN_SIZE} recipients in {campaign_min:.1f} min")
+
+    assert campaign_min < TARGET_MINUTES, f"{CAMPAIGN_SIZE} recipients take {campaign_min:.1f} min > {TARGET_MINUTES} min"
+    print("\nDelivery target met ✅")
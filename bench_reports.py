@@ -0,0 +1,42 @@
+import sys
+import os
+import time
+sys.path.append('.')
+import numpy as np
+import pandas as pd
+from reports import generate_reports
+
+# Benchmark: end-of-semester mark sheets for 50 (program, cohort) groups x 3 subjects
+GROUPS = 50
+PER_GROUP = 120
+N = GROUPS * PER_GROUP
+rng = np.random.default_rng(0)
+
+group = np.repeat(np.arange(GROUPS), PER_GROUP)
+df = pd.DataFrame({
+    "Matrix_No": [f"B0{i:08d}" for i in range(N)],
+    "Student_Name": [f"Student {i}" for i in range(N)],
+    "Program": np.array(["BEB", "BEC", "BEE", "BEL", "BEM"])[group % 5],
+    "Cohort": (2000 + group // 5).astype(str),
+    "FYP 1 Marks": np.where(rng.random(N) < 0.8, rng.uniform(30, 100, N).round(2), np.nan),
+    "FYP 2 Marks": np.where(rng.random(N) < 0.5, rng.uniform(30, 100, N).round(2), np.nan),
+    "LI Marks": np.where(rng.random(N) < 0.7, rng.uniform(30, 100, N).round(2), np.nan),
+    "FYP 1 SV": rng.choice(["Dr A", "Dr B", "-"], N),
+    "FYP 2 SV": rng.choice(["Dr A", "Dr B", "-"], N),
+    "FYP 1 Panel": rng.choice(["Dr C", "Dr D", "-"], N),
+    "FYP 2 Panel": rng.choice(["Dr C", "Dr D", "-"], N),
+    "LI Uni SV": rng.choice(["Dr A", "Dr E", "-"], N),
+    "LI Industry SV": "-",
+    "FYP_Company": rng.choice(["Acme", "Globex", "-"], N),
+    "LI_Company": rng.choice(["Acme", "Globex", "-"], N),
+    "FYP Title": [f"Project {i}" for i in range(N)],
+})
+
+if __name__ == "__main__":
+    path = "/tmp/_bench_reports.zip"
+    # Pool size vs. in-process rendering (worker processes are spawned, so the pool run includes their start-up)
+    for workers in [1, max(2, os.cpu_count())]:
+        t = time.perf_counter()
+        n = generate_reports(df, path, workers=workers)
+        print(f"{n} reports ({N} students), {workers} worker(s): {time.perf_counter() - t:.2f} s | {os.path.getsize(path) / 1e6:.1f} MB archive")
+    os.remove(path)
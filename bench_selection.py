@@ -0,0 +1,40 @@
+import sys
+import time
+sys.path.append('.')
+import pandas as pd
+from roster_index import resolve_selection, matrix_indexed
+
+# Benchmark: resolving 5k ticked rows ("Select All") for Sync / Document Actions
+N = 5000
+
+df = pd.DataFrame({
+    "Matrix_No": [f"B0{i:08d}" for i in range(N)],
+    "Student_Name": [f"Student {i}" for i in range(N)],
+    "Lapor Diri": [f"B0{i:08d}_lapor_diri.pdf" for i in range(N)],
+    "Aku Janji": [""] * N,
+})
+view = df.copy()
+editor_states = [{"edited_rows": {7: {"Sync?": False}}}, None, {"edited_rows": {"9": {"Email": "x@y"}}}]
+editor_pages = [(view["Matrix_No"].tolist(), state) for state in editor_states]
+
+def old_way():
+    ticked, rows = set(), []
+    for idx, row in view.iterrows():
+        is_ticked = True
+        for state in editor_states:
+            edits = (state or {}).get("edited_rows", {})
+            if idx in edits and "Sync?" in edits[idx]:
+                is_ticked = edits[idx]["Sync?"]
+        if is_ticked:
+            ticked.add(row["Matrix_No"])
+            rows.append(df[df['Matrix_No'] == row["Matrix_No"]].iloc[0])
+    return ticked, rows
+
+def new_way():
+    return resolve_selection(view, matrix_indexed(df), True, editor_pages)
+
+t = time.perf_counter(); old_ticked, old_rows = old_way(); t_old = time.perf_counter() - t
+t = time.perf_counter(); new_ticked, new_rows = new_way(); t_new = time.perf_counter() - t
+
+assert old_ticked == new_ticked and len(old_rows) == len(new_rows) == N - 1
+print(f"{N - 1} selected rows: iterrows + scan {t_old * 1000:.1f} ms | positional index {t_new * 1000:.2f} ms ({t_old / t_new:.0f}x)")
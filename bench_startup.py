@@ -0,0 +1,103 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+# Benchmark: cold start of app.py, each measurement in a fresh interpreter.
+#  1. import-time profile (python -X importtime), summed per top-level package
+#  2. time to first paint: the landing page (Student Portal) rendered by AppTest
+# Targets are checked at the end; the heavy modules must not be loaded for the landing page.
+# test_startup.py enforces the same targets under pytest.
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+FIRST_PAINT_TARGET_S = 1.2 # app.py's first script run, Streamlit itself already imported
+APP_IMPORTS_TARGET_S = 0.75 # imports app.py adds on top of Streamlit (pandas/numpy/pyarrow are most of it)
+LAZY_MODULES = ["supabase", "openpyxl", "altair", "realtime"] # loaded on first use only
+
+CHILD = r"""
+import sys, time, json
+t0 = time.perf_counter()
+import streamlit
+from streamlit.testing.v1 import AppTest
+t1 = time.perf_counter()
+before = set(sys.modules)
+at = AppTest.from_file("app.py", default_timeout=60)
+at.run()
+t2 = time.perf_counter()
+print(json.dumps({
+    "streamlit_s": t1 - t0,
+    "first_paint_s": t2 - t1,
+    "exceptions": [str(e.value) for e in at.exception],
+    "title": [t.value for t in at.title],
+    "loaded": sorted({m.split(".")[0] for m in set(sys.modules) - before}),
+}))
+"""
+
+
+def run_child(*flags):
+    t = time.perf_counter()
+    proc = subprocess.run([sys.executable, *flags, "-c", CHILD], cwd=ROOT, capture_output=True, text=True)
+    wall = time.perf_counter() - t
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr)
+    return proc, wall
+
+
+def child_result(proc):
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def import_profile(stderr):
+    """Top-level package -> (self seconds, number of modules) from -X importtime output."""
+    totals = defaultdict(lambda: [0.0, 0])
+    for line in stderr.splitlines():
+        m = re.match(r"import time:\s+(\d+) \|\s+\d+ \| (\s*)(\S+)", line)
+        if m:
+            pkg = m.group(3).split(".")[0]
+            totals[pkg][0] += int(m.group(1)) / 1e6
+            totals[pkg][1] += 1
+    return totals
+
+
+def app_imports():
+    """{package: [self seconds, modules]} imported by app.py on top of Streamlit."""
+    proc, _ = run_child("-X", "importtime")
+    profile = import_profile(proc.stderr)
+    loaded = set(child_result(proc)["loaded"])
+    # streamlit's own submodules load lazily during the first run; the server has them already
+    return {pkg: v for pkg, v in profile.items() if pkg in loaded and pkg != "streamlit"}
+
+
+def first_paint(runs=3):
+    """(child result, process wall time) of the fastest of `runs` cold processes (no -X importtime overhead)."""
+    results = []
+    for _ in range(runs):
+        proc, wall = run_child()
+        results.append((child_result(proc), wall))
+    return min(results, key=lambda r: r[0]["first_paint_s"])
+
+
+if __name__ == "__main__":
+    # 1. Import profile
+    app_side = app_imports()
+    print("Imports added by app.py (on top of Streamlit), self time per package:")
+    for pkg, (secs, n) in sorted(app_side.items(), key=lambda kv: -kv[1][0])[:15]:
+        print(f"  {pkg:24s} {secs * 1000:7.1f} ms  ({n} modules)")
+    app_imports = sum(secs for secs, _ in app_side.values())
+    print(f"  {'total':24s} {app_imports * 1000:7.1f} ms")
+
+    # 2. Time to first paint; best of 3 cold processes
+    result, wall = first_paint()
+    print(f"\nStreamlit import     {result['streamlit_s']:.2f} s")
+    print(f"First paint (app.py) {result['first_paint_s']:.2f} s   title: {result['title']}")
+    print(f"Process wall time    {wall:.2f} s")
+
+    assert not result["exceptions"], result["exceptions"]
+    eager = [m for m in LAZY_MODULES if m in result["loaded"]]
+    assert not eager, f"loaded at startup, should be lazy: {eager}"
+    assert result["first_paint_s"] < FIRST_PAINT_TARGET_S, f"first paint {result['first_paint_s']:.2f} s > {FIRST_PAINT_TARGET_S} s"
+    assert app_imports < APP_IMPORTS_TARGET_S, f"app imports {app_imports:.2f} s > {APP_IMPORTS_TARGET_S} s"
+    print("\nStartup targets met ✅")
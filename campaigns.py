@@ -0,0 +1,126 @@
+import string
+import time
+
+import numpy as np
+import pandas as pd
+
+from analytics import DOC_COLS, status_masks, numeric_marks
+
+# ===========================
+# REMINDER CAMPAIGNS
+# ===========================
+# Bulk reminders built from the same vectorized masks as the dashboard metrics:
+# recipients are selected with boolean masks, messages rendered from a template in
+# one pass, and the batch handed to the mail queue under a campaign id so its
+# delivery status can be tracked (mail_queue.MailQueue.status_counts).
+
+# Transactional mail (password recovery) also goes through the outbox under this
+# campaign id; it is not a reminder campaign and is left out of the history.
+RECOVERY_CAMPAIGN = "recovery"
+
+# Staff id column -> mark column they are responsible for
+STAFF_MARK_DUTIES = {
+    "fyp_sv_id": ["FYP 1 Marks", "FYP 2 Marks"],
+    "fyp1_panel_id": ["FYP 1 Marks"],
+    "fyp2_panel_id": ["FYP 2 Marks"],
+    "li_sv_id": ["LI Marks"],
+}
+
+CAMPAIGNS = {
+    "missing_docs": {
+        "label": "Students missing Lapor Diri / Aku Janji",
+        "fields": ["name", "matrix", "missing_docs"],
+        "subject": "WBL Reminder: documents pending",
+        "body": "Hello {name} ({matrix}),\n\nOur records show the following document(s) have not been submitted yet: {missing_docs}.\n\n"
+                "Please upload them in the Student Portal as soon as possible.\n\nThank you.",
+    },
+    "staff_ungraded": {
+        "label": "Staff with ungraded students",
+        "fields": ["name", "count", "students"],
+        "subject": "WBL Reminder: {count} student(s) awaiting marks",
+        "body": "Dear {name},\n\nThe following {count} student(s) assigned to you have no marks yet:\n{students}\n\n"
+                "Please enter them in the Staff Marking Portal.\n\nThank you.",
+    },
+}
+
+
+def template_fields(template):
+    return {f for _, f, _, _ in string.Formatter().parse(template) if f}
+
+
+def check_template(kind, subject, body):
+    """Raise ValueError for placeholders the campaign can't fill."""
+    unknown = (template_fields(subject) | template_fields(body)) - set(CAMPAIGNS[kind]["fields"])
+    if unknown:
+        raise ValueError(f"Unknown placeholder(s): {', '.join('{' + f + '}' for f in sorted(unknown))}. "
+                         f"Available: {', '.join('{' + f + '}' for f in CAMPAIGNS[kind]['fields'])}")
+
+
+def _has_email(col):
+    text = col.fillna("").astype(str).str.strip()
+    return text.str.contains("@", regex=False).to_numpy()
+
+
+def missing_docs_recipients(roster):
+    """Students with any document missing: [email, name, matrix, missing_docs]."""
+    masks = status_masks(roster)
+    pick = masks["docs_missing"] & _has_email(roster.get("Email", pd.Series("", index=roster.index)))
+    rows = roster[pick]
+    missing = pd.Series("", index=rows.index)
+    for c in DOC_COLS:
+        m = masks[f"{c}_missing"][pick]
+        missing = missing.mask(m, np.where(missing == "", c, missing + ", " + c))
+    return pd.DataFrame({
+        "email": rows["Email"].astype(str).str.strip(),
+        "name": rows["Student_Name"],
+        "matrix": rows["Matrix_No"],
+        "missing_docs": missing,
+    }).reset_index(drop=True)
+
+
+def staff_ungraded_recipients(roster, staff):
+    """
+    Staff with assigned students missing a mark they are responsible for:
+    [email, name, count, students]. staff: db.get_staff() (staff_id, staff_name, staff_email).
+    """
+    marks = numeric_marks(roster)
+    ungraded = marks.isna() | (marks == 0)
+    pairs = []
+    for id_col, mark_cols in STAFF_MARK_DUTIES.items():
+        if id_col not in roster.columns:
+            continue
+        pending = ungraded[mark_cols].any(axis=1) & roster[id_col].notna()
+        pairs.append(pd.DataFrame({
+            "staff_id": roster.loc[pending, id_col].astype(str).str.split(".").str[0],
+            "student": roster.loc[pending, "Student_Name"].astype(str) + " (" + roster.loc[pending, "Matrix_No"].astype(str) + ")",
+        }))
+    if not pairs or staff is None or staff.empty:
+        return pd.DataFrame(columns=["email", "name", "count", "students"])
+
+    per_staff = pd.concat(pairs).drop_duplicates().groupby("staff_id")["student"].agg(
+        count="size", students=lambda s: "\n".join(f"- {x}" for x in sorted(s)))
+    directory = staff.assign(staff_id=staff["staff_id"].astype(str)).set_index("staff_id")
+    out = per_staff.join(directory[["staff_name", "staff_email"]], how="inner")
+    out = out[_has_email(out["staff_email"])]
+    return pd.DataFrame({
+        "email": out["staff_email"].astype(str).str.strip(),
+        "name": out["staff_name"],
+        "count": out["count"],
+        "students": out["students"],
+    }).reset_index(drop=True)
+
+
+def render_messages(recipients, subject, body):
+    """[(email, subject, body)] with each recipient's fields filled in."""
+    fields = [c for c in recipients.columns if c != "email"]
+    records = recipients[fields].to_dict("records")
+    return [(email, subject.format_map(r), body.format_map(r)) for email, r in zip(recipients["email"], records)]
+
+
+def launch(mailer, kind, recipients, subject, body):
+    """Render and enqueue a campaign; returns (campaign id, message count)."""
+    check_template(kind, subject, body)
+    messages = render_messages(recipients, subject, body)
+    campaign = f"{kind}-{time.strftime('%Y%m%d-%H%M%S')}"
+    mailer.enqueue_many(messages, campaign=campaign)
+    return campaign, len(messages)
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+
+import pandas as pd
+
+# ===========================
+# REALTIME CHANGE FEED
+# ===========================
+# Row changes pushed by the database are applied to the shared RosterCache in a
+# background thread, so open dashboards pick up other users' edits on their next
+# rerun without polling or refetching the roster.
+#
+# Sources put raw events {'table', 'type', 'record', 'old_record'} on a ChangeFeed:
+# - SupabaseRealtimeSource: postgres_changes over Supabase Realtime (migrations/007_realtime.sql)
+# - LocalChangeSource: in-process stand-in for tests and offline development
+
+FEED_TABLES = ["students", "companies", "staff"]
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeFeed:
+    """
+    Applies change events to a RosterCache. Events are drained in short batches so a
+    burst (e.g. a bulk save) costs one resolve and one version bump.
+    resolver(list of raw student rows) -> resolved roster rows (database.resolve_student_rows)
+    """
+
+    def __init__(self, cache, resolver, batch_window=0.5):
+        self._cache = cache
+        self._resolver = resolver
+        self._window = batch_window
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def put(self, event):
+        self._queue.put(event)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="roster-change-feed", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _drain(self):
+        try:
+            events = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.time() + self._window
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                events.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return events
+
+    def _run(self):
+        while not self._stop.is_set():
+            events = self._drain()
+            if not events:
+                continue
+            try:
+                self.apply(events)
+            except Exception:
+                logger.exception("Change feed batch failed; dropping cached roster")
+                self._cache.invalidate()
+
+    def apply(self, events):
+        """Patch the cache with one batch of events (also callable directly)."""
+        if any(e.get("table") != "students" for e in events):
+            # Company/staff changes alter resolved names and dropdowns: reload
+            self._cache.invalidate()
+            return
+
+        upserts, deleted = {}, set()
+        for e in events:
+            if e.get("type") == "DELETE":
+                matrix = (e.get("old_record") or {}).get("matrix_number")
+                if matrix is None: # No replica identity: let the cache resync
+                    self._cache.invalidate("students")
+                    return
+                deleted.add(matrix)
+                upserts.pop(matrix, None)
+            else:
+                record = e.get("record") or {}
+                matrix = record.get("matrix_number")
+                if matrix is not None:
+                    upserts[matrix] = record # Latest event per student wins
+                    deleted.discard(matrix)
+
+        changed = self._resolver(list(upserts.values())) if upserts else pd.DataFrame()
+        self._cache.apply_changes(changed, deleted)
+
+
+def _event(payload):
+    data = payload.get("data", payload)
+    return {
+        "table": data.get("table"),
+        "type": str(getattr(data.get("type"), "value", data.get("type"))),
+        "record": data.get("record"),
+        "old_record": data.get("old_record"),
+    }
+
+
+class SupabaseRealtimeSource:
+    """Supabase Realtime postgres_changes for FEED_TABLES, on its own event-loop thread."""
+
+    def __init__(self, url, key, tables=None, schema="public"):
+        self.url = url.rstrip("/").replace("https://", "wss://").replace("http://", "ws://") + "/realtime/v1"
+        self.key = key
+        self.tables = tables or FEED_TABLES
+        self.schema = schema
+        self._stop = threading.Event()
+
+    def subscribe(self, feed):
+        thread = threading.Thread(target=lambda: asyncio.run(self._listen(feed)), name="supabase-realtime", daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        self._stop.set()
+
+    async def _listen(self, feed):
+        from realtime import AsyncRealtimeClient
+
+        client = AsyncRealtimeClient(self.url, self.key)
+        try:
+            await client.connect()
+            channel = client.channel("roster-changes")
+            for table in self.tables:
+                channel.on_postgres_changes("*", table=table, schema=self.schema, callback=lambda p: feed.put(_event(p)))
+            await channel.subscribe()
+            while not self._stop.is_set():
+                await asyncio.sleep(1)
+        except Exception:
+            logger.exception("Realtime change feed stopped; roster falls back to TTL/delta refresh")
+        finally:
+            try: await client.close()
+            except Exception: pass
+
+
+class LocalChangeSource:
+    """In-process stand-in for Realtime: publish() delivers straight to subscribed feeds."""
+
+    def __init__(self):
+        self._feeds = []
+
+    def subscribe(self, feed):
+        self._feeds.append(feed)
+
+    def publish(self, table, type_, record=None, old_record=None):
+        for feed in self._feeds:
+            feed.put({"table": table, "type": type_, "record": record, "old_record": old_record})
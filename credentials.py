@@ -0,0 +1,94 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+
+# ===========================
+# PASSWORD HASHING
+# ===========================
+# Passwords are stored as salted scrypt hashes:
+#   scrypt$<log2 N>$<r>$<p>$<salt b64>$<hash b64>
+# Rows still holding a plaintext password (older data) verify against the plaintext
+# once and are rehashed by database.verify_*_login; hashes made with an older cost
+# are upgraded the same way.
+#
+# Hashing is deliberately slow, so it runs on a small bounded pool: a burst of
+# logins or password writes queues here instead of taking CPU from every other
+# session's script thread. Bulk imports go through in chunks so logins submitted
+# meanwhile are not stuck behind the whole file.
+# Tune HASH_COST (env WBL_HASH_COST) with bench_logins.py.
+
+HASH_COST = int(os.environ.get("WBL_HASH_COST", 14)) # log2 of scrypt N (14 -> 16 MiB, ~65 ms)
+HASH_R = 8
+HASH_P = 1
+VERIFY_WORKERS = int(os.environ.get("WBL_VERIFY_WORKERS", 2))
+HASH_CHUNK = VERIFY_WORKERS * 4 # bulk hashes per pool round
+
+_PREFIX = "scrypt$"
+
+_verify_pool = ThreadPoolExecutor(max_workers=VERIFY_WORKERS, thread_name_prefix="password-verify")
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode("ascii")
+
+
+def _scrypt(password, salt, cost, r, p):
+    n = 2 ** cost
+    return hashlib.scrypt(str(password).encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * r * n + (1 << 20), dklen=32)
+
+
+def is_hashed(stored):
+    return isinstance(stored, str) and stored.startswith(_PREFIX)
+
+
+def hash_password(password, cost=None):
+    cost = HASH_COST if cost is None else cost
+    salt = os.urandom(16)
+    return f"scrypt${cost}${HASH_R}${HASH_P}${_b64(salt)}${_b64(_scrypt(password, salt, cost, HASH_R, HASH_P))}"
+
+
+def verify_password(password, stored):
+    """
+    (matches, needs_rehash). needs_rehash is True for a matching plaintext or
+    older-cost hash, so the caller can store a fresh hash.
+    """
+    if password is None or stored is None:
+        return False, False
+    if not is_hashed(stored):
+        ok = hmac.compare_digest(str(password).encode("utf-8"), str(stored).encode("utf-8"))
+        return ok, ok
+    try:
+        _, cost, r, p, salt, expected = stored.split("$")
+        digest = _scrypt(password, base64.b64decode(salt), int(cost), int(r), int(p))
+    except (ValueError, TypeError):
+        return False, False
+    ok = hmac.compare_digest(digest, base64.b64decode(expected))
+    return ok, ok and int(cost) != HASH_COST
+
+
+def check_password(password, stored, timeout=30):
+    """verify_password on the bounded verification pool."""
+    return _verify_pool.submit(verify_password, password, stored).result(timeout)
+
+
+def make_hash(password, timeout=30):
+    """hash_password on the bounded verification pool."""
+    return _verify_pool.submit(hash_password, password).result(timeout)
+
+
+def hash_passwords(passwords, chunk=HASH_CHUNK):
+    """Hashes for many passwords (bulk imports), a chunk at a time on the same pool."""
+    passwords = list(passwords)
+    hashes = []
+    for i in range(0, len(passwords), chunk):
+        hashes.extend(_verify_pool.map(hash_password, passwords[i:i + chunk]))
+    return hashes
+
+
+def temporary_password():
+    """Random password for account recovery (mailed once, then changed by the user)."""
+    return secrets.token_urlsafe(9)
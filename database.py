@@ -1,188 +1,481 @@
+import functools
+import threading
+import time
 import streamlit as st
 import pandas as pd
-from datetime import datetime
-from supabase_handler import get_supabase_client
+from datetime import datetime, timedelta, timezone
+from supabase_handler import LazyClient
+from credentials import make_hash, hash_passwords, check_password, temporary_password
 
-# Initialize Supabase Client
-sb = get_supabase_client()
+# Supabase client, created on first query (not at import, so app startup doesn't wait on it)
+sb = LazyClient()
 
 def init_db():
     """Reserved for future use. Tables are now created via SQL Editor."""
     pass
 
+# ===========================
+# CHANGE NOTIFICATION
+# ===========================
+# Listeners (e.g. the shared roster cache in app.py) are called after any write
+# so cached snapshots never outlive the data they were built from.
+
+_change_listeners = []
+_change_counts = {} # table -> number of writes seen by this process
+
+def change_version(table="students"):
+    """Per-table write counter; cached reads compare it to know they are stale."""
+    return _change_counts.get(table, 0)
+
+def on_change(listener):
+    """Register listener(table) to be called after writes."""
+    if listener not in _change_listeners:
+        _change_listeners.append(listener)
+
+def notify_change(table="students"):
+    _change_counts[table] = _change_counts.get(table, 0) + 1
+    for listener in list(_change_listeners):
+        try: listener(table)
+        except Exception: pass
+
+def _writes(table):
+    """Decorator for write functions: notify listeners once the call returns."""
+    def wrap(func):
+        @functools.wraps(func)
+        def inner(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                notify_change(table)
+        return inner
+    return wrap
+
+# ===========================
+# ERROR REPORTING
+# ===========================
+# st.error only renders on the script thread. Loaders that run on background pools
+# (session_cache) wrap the fetcher in collect_errors and the page shows the messages.
+
+_error_sink = threading.local()
+
+def _report_error(msg):
+    errors = getattr(_error_sink, "errors", None)
+    if errors is None: st.error(msg)
+    else: errors.append(msg)
+
+def collect_errors(fn):
+    """Run fn() with its error messages collected instead of rendered: (result, [messages])."""
+    outer = getattr(_error_sink, "errors", None)
+    _error_sink.errors = []
+    try:
+        return fn(), _error_sink.errors
+    finally:
+        _error_sink.errors = outer
+
 # ===========================
 # STUDENT FUNCTIONS
 # ===========================
 
+# Archived students are moved to 'students_archive' (migrations/008_students_archive.sql),
+# so 'students' holds only the active roster.
+ARCHIVE_TABLE = "students_archive"
+
+# Columns roster reads leave on the server: the search index (migrations/001; the
+# tsvector text is about as large as the row) and pending password resets (011).
+UNFETCHED_COLUMNS = ["search_text", "search_tsv", "reset_password", "reset_expires_at"]
+_roster_columns = {} # table -> explicit select list, learned once per process
+
+def _roster_select(table):
+    """Select list for roster reads: every column of the table except UNFETCHED_COLUMNS."""
+    cols = _roster_columns.get(table)
+    if cols is None:
+        res = sb.table(table).select("*").limit(1).execute()
+        if not res.data: return "*" # empty table: nothing to learn from (or to save)
+        cols = _roster_columns[table] = ",".join(c for c in res.data[0] if c not in UNFETCHED_COLUMNS)
+    return cols
+
+def _fetch_student_rows(table):
+    res = sb.table(table).select(_roster_select(table)).order("matrix_number").execute()
+    return res.data or []
+
 def get_students(include_archived=False):
-    """Fetch students from Supabase."""
-    global sb
-    if sb is None:
-        sb = get_supabase_client()
-        if sb is None:
-             st.error("🚨 Critical Error: Database connection failed. Please check Secrets.")
-             return pd.DataFrame()
-
-    try:
-        # Fetch ALL data first to handle None/Null values safely in Python
-        query = sb.table("students").select("*").order("matrix_number")
-        # Removed .eq("is_archived", 0) from here to handle it in Pandas
-        
-        response = query.execute()
-        data = response.data
+    """Fetch students from Supabase (active table, plus the archive table if asked)."""
+    if not sb:
+        _report_error(f"🚨 Critical Error: Database connection failed. Please check Secrets. ({sb.error})")
+        return pd.DataFrame()
+
+    try:
+        data = _fetch_student_rows("students")
+        if include_archived:
+            data += _fetch_student_rows(ARCHIVE_TABLE)
         
         if not data:
             return pd.DataFrame()
             
-        df = pd.DataFrame(data)
-        
-        # 1. Fetch Companies & Staff for Mapping
-        companies_df = get_companies()
-        staff_df = get_staff()
-        
-        # Prepare Lookups
-        comp_map = {} # ID -> Name
-        comp_states = {} # ID -> State
-        staff_map = {} # ID -> Name
-        
-        # Prepare Lookups (Normalized to STRINGS for safety)
-        comp_map = {} # ID (str) -> Name
-        comp_states = {} # ID (str) -> State
-        comp_addresses = {} # ID (str) -> Address
-        staff_map = {} # ID (str) -> Name
-        
-        if not companies_df.empty:
-            cid_col = "id" if "id" in companies_df.columns else "company_id"
-            cname_col = "Company Name" if "Company Name" in companies_df.columns else "name"
-            cstate_col = "State" if "State" in companies_df.columns else "state"
-            caddress_col = "Address" if "Address" in companies_df.columns else "address"
-            
-            if cid_col in companies_df.columns:
-                if cname_col in companies_df.columns:
-                    # Force Keys to String
-                    comp_map = {str(k): v for k, v in zip(companies_df[cid_col], companies_df[cname_col])}
-                if cstate_col in companies_df.columns:
-                    comp_states = {str(k): v for k, v in zip(companies_df[cid_col], companies_df[cstate_col])}
-                if caddress_col in companies_df.columns:
-                    comp_addresses = {str(k): v for k, v in zip(companies_df[cid_col], companies_df[caddress_col])}
-
-        if not staff_df.empty:
-            sid_col = "staff_id" if "staff_id" in staff_df.columns else "id"
-            # FIX: Check for staff_name as well
-            sname_col = "staff_name" if "staff_name" in staff_df.columns else ("name" if "name" in staff_df.columns else "Name")
-            
-            if sid_col in staff_df.columns and sname_col in staff_df.columns:
-                staff_map = {str(k): v for k, v in zip(staff_df[sid_col], staff_df[sname_col])}
-
-        # Helper to safely map IDs (Everything to String)
-        def safe_map(val, lookup):
-            if pd.isna(val) or val == "" or val is None: return "-"
-            # Try exact string match
-            val_str = str(val).split('.')[0] # Handle "22.0" -> "22" string
-            return lookup.get(val_str, "-")
-
-        # Map Company Names
-        # Fallback logic: If fyp_company_id missing, use company_id -> But prefer specific
-        fyp_source = "fyp_company_id" if "fyp_company_id" in df.columns else "company_id"
+        df = _resolve_students(pd.DataFrame(data))
+        if include_archived:
+            df = df.sort_values("Matrix_No", kind="stable").reset_index(drop=True)
+        return df
+    except Exception as e:
+        _report_error(f"Error fetching students: {e}")
+        return pd.DataFrame()
+
+def get_archived_students():
+    """Archived roster only (the dashboard's archived view reads this on demand)."""
+    try:
+        data = _fetch_student_rows(ARCHIVE_TABLE)
+        return _resolve_students(pd.DataFrame(data)) if data else pd.DataFrame()
+    except Exception as e:
+        _report_error(f"Error fetching archived students: {e}")
+        return pd.DataFrame()
+
+def get_archived_cohorts():
+    try:
+        res = sb.table(ARCHIVE_TABLE).select("cohort").execute()
+        return sorted({r["cohort"] for r in res.data or [] if r.get("cohort")})
+    except Exception:
+        return []
+
+# Supabase 'students' columns -> App frame columns
+STUDENT_COLUMNS = {
+    "matrix_number": "Matrix_No",
+    "name": "Student_Name",
+    "program": "Program",
+    "cohort": "Cohort",
+    "email": "Email",
+    "password": "Password",
+    "fyp_title": "FYP_Title",
+    "is_archived": "is_archived",
+    "form_lapor_diri": "Lapor Diri",
+    "form_aku_janji": "Aku Janji",
+    "fyp1_marks": "FYP 1 Marks",
+    "fyp2_marks": "FYP 2 Marks",
+    "li_marks": "LI Marks"
+}
+
+# Company/staff maps used to resolve student rows. Full loads fetch them fresh;
+# deltas and change-feed batches reuse the last set for up to RESOLVE_MAPS_TTL
+# seconds (company/staff writes in this process drop it at once), instead of
+# refetching both tables for every few changed rows.
+RESOLVE_MAPS_TTL = 300
+_resolve_maps = (None, 0, None) # (companies/staff write counters, fetched_at, maps)
+
+def _fetch_resolve_maps():
+    """(company names, company states, company addresses, staff names), keyed by id string."""
+    global _resolve_maps
+    # 1. Fetch Companies & Staff for Mapping
+    companies_df = get_companies()
+    staff_df = get_staff()
+    
+    # Prepare Lookups
+    comp_map = {} # ID -> Name
+    comp_states = {} # ID -> State
+    staff_map = {} # ID -> Name
+    
+    # Prepare Lookups (Normalized to STRINGS for safety)
+    comp_map = {} # ID (str) -> Name
+    comp_states = {} # ID (str) -> State
+    comp_addresses = {} # ID (str) -> Address
+    staff_map = {} # ID (str) -> Name
+    
+    if not companies_df.empty:
+        cid_col = "id" if "id" in companies_df.columns else "company_id"
+        cname_col = "Company Name" if "Company Name" in companies_df.columns else "name"
+        cstate_col = "State" if "State" in companies_df.columns else "state"
+        caddress_col = "Address" if "Address" in companies_df.columns else "address"
         
-        df["FYP_Company"] = df[fyp_source].apply(lambda x: safe_map(x, comp_map)) if fyp_source in df.columns else "-"
-        df["LI_Company"] = df["li_company_id"].apply(lambda x: safe_map(x, comp_map)) if "li_company_id" in df.columns else "-"
+        if cid_col in companies_df.columns:
+            if cname_col in companies_df.columns:
+                # Force Keys to String
+                comp_map = {str(k): v for k, v in zip(companies_df[cid_col], companies_df[cname_col])}
+            if cstate_col in companies_df.columns:
+                comp_states = {str(k): v for k, v in zip(companies_df[cid_col], companies_df[cstate_col])}
+            if caddress_col in companies_df.columns:
+                comp_addresses = {str(k): v for k, v in zip(companies_df[cid_col], companies_df[caddress_col])}
+
+    if not staff_df.empty:
+        sid_col = "staff_id" if "staff_id" in staff_df.columns else "id"
+        # FIX: Check for staff_name as well
+        sname_col = "staff_name" if "staff_name" in staff_df.columns else ("name" if "name" in staff_df.columns else "Name")
         
-        # Map Company States
-        df["FYP_State"] = df[fyp_source].apply(lambda x: safe_map(x, comp_states)) if fyp_source in df.columns else "-"
-        df["LI_State"] = df["li_company_id"].apply(lambda x: safe_map(x, comp_states)) if "li_company_id" in df.columns else "-"
-
-        # Map Company Addresses
-        df["FYP_Address"] = df[fyp_source].apply(lambda x: safe_map(x, comp_addresses)) if fyp_source in df.columns else "-"
-        df["LI_Address"] = df["li_company_id"].apply(lambda x: safe_map(x, comp_addresses)) if "li_company_id" in df.columns else "-"
-
-        # Map Supervisors
-        df["FYP_SV_Name"] = df["fyp_sv_id"].apply(lambda x: safe_map(x, staff_map)) if "fyp_sv_id" in df.columns else "-"
-        df["LI_SV_Name"] = df["li_sv_id"].apply(lambda x: safe_map(x, staff_map)) if "li_sv_id" in df.columns else "-"
-
-        # ALIASES FOR APP.PY COMPATIBILITY
-        df["FYP 1 SV"] = df["FYP_SV_Name"]
-        df["FYP 2 SV"] = df["FYP_SV_Name"]
-        df["LI Uni SV"] = df["LI_SV_Name"]
+        if sid_col in staff_df.columns and sname_col in staff_df.columns:
+            staff_map = {str(k): v for k, v in zip(staff_df[sid_col], staff_df[sname_col])}
+
+    maps = (comp_map, comp_states, comp_addresses, staff_map)
+    if not companies_df.empty and not staff_df.empty: # an empty table may be a failed fetch: don't keep it
+        _resolve_maps = ((change_version("companies"), change_version("staff")), time.time(), maps)
+    return maps
+
+def _cached_resolve_maps():
+    version, fetched_at, maps = _resolve_maps
+    if maps is None or version != (change_version("companies"), change_version("staff")) or time.time() - fetched_at > RESOLVE_MAPS_TTL:
+        return _fetch_resolve_maps()
+    return maps
+
+def _resolve_students(df, cached_maps=False):
+    """
+    Maps raw 'students' rows to the App frame: company/staff names, states,
+    addresses and App column names. Shared by get_students and search_students.
+    cached_maps: resolve against the last company/staff maps (deltas, change feed).
+    """
+    comp_map, comp_states, comp_addresses, staff_map = _cached_resolve_maps() if cached_maps else _fetch_resolve_maps()
+
+    # Helper to safely map IDs (Everything to String)
+    def safe_map(val, lookup):
+        if pd.isna(val) or val == "" or val is None: return "-"
+        # Try exact string match
+        val_str = str(val).split('.')[0] # Handle "22.0" -> "22" string
+        return lookup.get(val_str, "-")
+
+    # Map Company Names
+    # Fallback logic: If fyp_company_id missing, use company_id -> But prefer specific
+    fyp_source = "fyp_company_id" if "fyp_company_id" in df.columns else "company_id"
+    
+    df["FYP_Company"] = df[fyp_source].apply(lambda x: safe_map(x, comp_map)) if fyp_source in df.columns else "-"
+    df["LI_Company"] = df["li_company_id"].apply(lambda x: safe_map(x, comp_map)) if "li_company_id" in df.columns else "-"
+    
+    # Map Company States
+    df["FYP_State"] = df[fyp_source].apply(lambda x: safe_map(x, comp_states)) if fyp_source in df.columns else "-"
+    df["LI_State"] = df["li_company_id"].apply(lambda x: safe_map(x, comp_states)) if "li_company_id" in df.columns else "-"
+
+    # Map Company Addresses
+    df["FYP_Address"] = df[fyp_source].apply(lambda x: safe_map(x, comp_addresses)) if fyp_source in df.columns else "-"
+    df["LI_Address"] = df["li_company_id"].apply(lambda x: safe_map(x, comp_addresses)) if "li_company_id" in df.columns else "-"
+
+    # Map Supervisors
+    df["FYP_SV_Name"] = df["fyp_sv_id"].apply(lambda x: safe_map(x, staff_map)) if "fyp_sv_id" in df.columns else "-"
+    df["LI_SV_Name"] = df["li_sv_id"].apply(lambda x: safe_map(x, staff_map)) if "li_sv_id" in df.columns else "-"
+
+    # ALIASES FOR APP.PY COMPATIBILITY
+    df["FYP 1 SV"] = df["FYP_SV_Name"]
+    df["FYP 2 SV"] = df["FYP_SV_Name"]
+    df["LI Uni SV"] = df["LI_SV_Name"]
+    
+    # Map Panelists (Assuming fyp1_panel_id / fyp2_panel_id exist)
+    # If they don't exist yet, we default to "-"
+    if "fyp1_panel_id" in df.columns:
+        df["FYP 1 Panel"] = df["fyp1_panel_id"].apply(lambda x: safe_map(x, staff_map))
+    else:
+        df["FYP 1 Panel"] = "-"
         
-        # Map Panelists (Assuming fyp1_panel_id / fyp2_panel_id exist)
-        # If they don't exist yet, we default to "-"
-        if "fyp1_panel_id" in df.columns:
-            df["FYP 1 Panel"] = df["fyp1_panel_id"].apply(lambda x: safe_map(x, staff_map))
-        else:
-            df["FYP 1 Panel"] = "-"
-            
-        if "fyp2_panel_id" in df.columns:
-            df["FYP 2 Panel"] = df["fyp2_panel_id"].apply(lambda x: safe_map(x, staff_map)) 
-        else:
-            df["FYP 2 Panel"] = "-"
+    if "fyp2_panel_id" in df.columns:
+        df["FYP 2 Panel"] = df["fyp2_panel_id"].apply(lambda x: safe_map(x, staff_map)) 
+    else:
+        df["FYP 2 Panel"] = "-"
+
+    # FYP Title Alias (Space vs Underscore)
+    df["FYP Title"] = df["FYP_Title"] if "FYP_Title" in df.columns else "-"
+    
+    # Address Stubs
+    df["LI Industry SV"] = "-" 
+
 
-        # FYP Title Alias (Space vs Underscore)
-        df["FYP Title"] = df["FYP_Title"] if "FYP_Title" in df.columns else "-"
+
+
+    # Map Supabase columns to App expected columns (search index and pending resets never leave this module)
+    df = df.drop(columns=UNFETCHED_COLUMNS, errors="ignore").rename(columns=STUDENT_COLUMNS)
+    
+    # Handle Missing Columns (Supabase might not return them if they are null)
+    if "Lapor Diri" not in df.columns: df["Lapor Diri"] = "-"
+    if "Aku Janji" not in df.columns: df["Aku Janji"] = "-"
+    
+    # Handle is_archived being None/NaN -> Treat as 0 (Active)
+    if "is_archived" not in df.columns:
+        df["is_archived"] = 0
+    else:
+        df["is_archived"] = df["is_archived"].fillna(0).astype(int)
+
+    # Ensure status exists for display
+    if "Status" not in df.columns:
+        df["Status"] = "Active" 
         
-        # Address Stubs
-        df["LI Industry SV"] = "-" 
+    return df
 
+# Aliases for compatibility
+get_all_students_data = get_students
 
+def resolve_student_rows(rows):
+    """Raw 'students' rows (dicts, e.g. from the change feed) -> App roster rows."""
+    if not rows: return pd.DataFrame()
+    return _resolve_students(pd.DataFrame(rows), cached_maps=True)
 
+# ===========================
+# DELTA SYNC
+# ===========================
+# students.updated_at is stamped by a trigger (migrations/006_updated_at.sql), so the
+# roster cache can ask "has anything changed?" with one tiny query and then fetch only
+# the rows changed since its watermark.
 
-        # Map Supabase columns to App expected columns
-        rename_map = {
-            "matrix_number": "Matrix_No",
-            "name": "Student_Name",
-            "program": "Program",
-            "cohort": "Cohort",
-            "email": "Email",
-            "password": "Password",
-            "fyp_title": "FYP_Title",
-            "is_archived": "is_archived",
-            "form_lapor_diri": "Lapor Diri",
-            "form_aku_janji": "Aku Janji",
-            "fyp1_marks": "FYP 1 Marks",
-            "fyp2_marks": "FYP 2 Marks",
-            "li_marks": "LI Marks"
+# Re-read this much before the watermark: now() is the transaction start, so a slow
+# writer can commit a row stamped slightly earlier than one already seen.
+DELTA_OVERLAP_SECONDS = 60
+
+def _table_watermark(table):
+    res = sb.table(table).select("updated_at", count="exact").order("updated_at", desc=True).limit(1).execute()
+    latest = pd.to_datetime(res.data[0]["updated_at"], utc=True) if res.data else None
+    return latest, int(res.count or 0)
+
+def get_students_watermark(include_archived=False):
+    """(latest updated_at as a UTC Timestamp or None, row count) in one HEAD-sized query per table."""
+    latest, count = _table_watermark("students")
+    if include_archived:
+        archived_latest, archived_count = _table_watermark(ARCHIVE_TABLE)
+        latest = max([t for t in (latest, archived_latest) if t is not None], default=None)
+        count += archived_count
+    return latest, count
+
+def get_students_changed_since(since):
+    """
+    Resolved rows changed since the watermark `since`, from both tables: a student
+    just moved to the archive comes back with is_archived=1, so the active snapshot
+    drops it without a full reload. None if the fetch fails.
+    """
+    try:
+        start = pd.Timestamp(since) - pd.Timedelta(seconds=DELTA_OVERLAP_SECONDS)
+        data = []
+        for table in ("students", ARCHIVE_TABLE):
+            res = sb.table(table).select(_roster_select(table)).gte("updated_at", start.isoformat()).order("matrix_number").execute()
+            data += res.data or []
+        if not data:
+            return pd.DataFrame()
+        return _resolve_students(pd.DataFrame(data), cached_maps=True)
+    except Exception:
+        return None
+
+# Above this many rows the dashboard searches server-side instead of downloading the roster
+SERVER_SEARCH_THRESHOLD = 5000
+# Most rows a server-side search returns (the dashboard says when a search hits it)
+SERVER_SEARCH_LIMIT = 5000
+
+def count_students(include_archived=False):
+    """Cheap row count (HEAD request, no rows transferred); None if the count failed."""
+    try:
+        count = sb.table("students").select("matrix_number", count="exact", head=True).execute().count or 0
+        if include_archived:
+            count += sb.table(ARCHIVE_TABLE).select("matrix_number", count="exact", head=True).execute().count or 0
+        return count
+    except Exception as e:
+        _report_error(f"Error counting students: {e}")
+        return None
+
+def search_students(query, filters=None, limit=200):
+    """
+    Server-side search via the 'search_students' RPC (migrations/001_student_search.sql).
+    filters: optional {'program': ..., 'cohort': ..., 'is_archived': 0 | 1 | None}
+    Returns the same frame as get_students, for matching rows only (best match first).
+    """
+    filters = filters or {}
+    try:
+        params = {
+            "q": query,
+            "p_program": filters.get("program"),
+            "p_cohort": filters.get("cohort"),
+            "p_archived": filters.get("is_archived", 0),
+            "p_limit": limit
         }
-        df = df.rename(columns=rename_map)
-        
-        # Handle Missing Columns (Supabase might not return them if they are null)
-        if "Lapor Diri" not in df.columns: df["Lapor Diri"] = "-"
-        if "Aku Janji" not in df.columns: df["Aku Janji"] = "-"
-        
-        # Handle is_archived being None/NaN -> Treat as 0 (Active)
-        if "is_archived" not in df.columns:
-            df["is_archived"] = 0
-        else:
-            df["is_archived"] = df["is_archived"].fillna(0).astype(int)
-        
-        # Filter now
-        if not include_archived:
-            df = df[df["is_archived"] == 0]
+        res = sb.rpc("search_students", params).execute()
+        if not res.data:
+            return pd.DataFrame()
+        df = pd.DataFrame(res.data).drop(columns=["search_text", "search_tsv"], errors="ignore")
+        return _resolve_students(df)
+    except Exception as e:
+        _report_error(f"Error searching students: {e}")
+        return pd.DataFrame()
 
-        # Ensure status exists for display
-        if "Status" not in df.columns:
-            df["Status"] = "Active" 
-            
-        return df
+# ===========================
+# FILTER PUSHDOWN
+# ===========================
+# The dashboard's sidebar filters as PostgREST predicates: a cold dashboard scoped to
+# one program / cohort / state / staff member fetches and resolves only that slice.
+# Option lists come from a distinct query (migrations/009_filter_options.sql).
+
+# Staff id columns on 'students' (roster_index.STAFF_ROLE_COLUMNS may name columns not in the table)
+STAFF_ID_COLUMNS = ["fyp_sv_id", "li_sv_id", "fyp1_panel_id", "fyp2_panel_id"]
+
+def _company_ids_in_state(state):
+    res = sb.table("companies").select("company_id").eq("state", state).execute()
+    return [r["company_id"] for r in res.data or []]
+
+def student_filter_predicates(filters):
+    """
+    filters: {'program', 'cohort', 'state', 'staff_id', 'staff_columns'} (None = no filter)
+    -> ({column: value} equality predicates, [or-groups of 'column.op.value']),
+    or None when the slice is empty (no company in that state).
+    """
+    eqs, groups = {}, []
+    for key in ("program", "cohort"):
+        if filters.get(key) is not None:
+            eqs[key] = filters[key]
+    if filters.get("state") is not None:
+        ids = _company_ids_in_state(filters["state"])
+        if not ids:
+            return None
+        id_list = ",".join(str(i) for i in ids)
+        groups.append([f"fyp_company_id.in.({id_list})", f"li_company_id.in.({id_list})"])
+    if filters.get("staff_id") is not None:
+        cols = [c for c in filters.get("staff_columns") or STAFF_ID_COLUMNS if c in STAFF_ID_COLUMNS]
+        if not cols:
+            return None
+        groups.append([f"{c}.eq.{filters['staff_id']}" for c in cols])
+    return eqs, groups
+
+def apply_student_filters(query, predicates):
+    eqs, groups = predicates
+    for col, val in eqs.items():
+        query = query.eq(col, val)
+    if len(groups) == 1:
+        query = query.or_(",".join(groups[0]))
+    elif groups:
+        # Several OR groups must all hold: or=(and(or(..),or(..)))
+        query = query.or_("and(" + ",".join(f"or({','.join(g)})" for g in groups) + ")")
+    return query
+
+def get_students_slice(filters):
+    """Active students matching the sidebar filters, resolved like get_students."""
+    try:
+        predicates = student_filter_predicates(filters)
+        if predicates is None:
+            return pd.DataFrame()
+        res = apply_student_filters(sb.table("students").select(_roster_select("students")), predicates).order("matrix_number").execute()
+        return _resolve_students(pd.DataFrame(res.data)) if res.data else pd.DataFrame()
     except Exception as e:
-        st.error(f"Error fetching students: {e}")
+        _report_error(f"Error fetching students: {e}")
         return pd.DataFrame()
 
-# Aliases for compatibility
-get_all_students_data = get_students
+def get_filter_options():
+    """{'programs', 'cohorts', 'states'} for the sidebar, without fetching the roster."""
+    try:
+        try:
+            pairs = pd.DataFrame(sb.rpc("student_filter_options", {}).execute().data or [])
+        except Exception:
+            # Pre-migration: two narrow columns instead of whole rows
+            pairs = pd.DataFrame(sb.table("students").select("program,cohort").execute().data or [])
+        states = sb.table("companies").select("state").execute().data or []
+        return {
+            "programs": sorted(pairs["program"].dropna().unique().tolist()) if "program" in pairs else [],
+            "cohorts": sorted(pairs["cohort"].dropna().unique().tolist()) if "cohort" in pairs else [],
+            "states": sorted({r["state"] for r in states if r.get("state") and r["state"] != "-"}),
+        }
+    except Exception:
+        return {"programs": [], "cohorts": [], "states": []}
 
-def get_students_for_marking(staff_db_id):
+# Role flag columns returned for the staff marking portal
+MARKING_ROLE_FLAGS = ["is_fyp1_sv", "is_fyp1_panel", "is_fyp2_sv", "is_fyp2_panel", "is_li_sv"]
+
+def get_students_for_marking(staff_db_id, program=None):
     """
-    Fetches students where this staff is assigned as SV or Panel.
+    Fetches students where this staff is assigned as SV or Panel, with one boolean
+    flag per subject/role (MARKING_ROLE_FLAGS). Optionally limited to a program.
+    Uses the 'students_for_marking' RPC (migrations/003_staff_marking.sql) and
+    falls back to a plain OR query if the RPC is not installed yet.
     """
     try:
-        # Construct OR query
-        # fyp_sv_id.eq.ID, li_sv_id.eq.ID, fyp1_panel_id.eq.ID, fyp2_panel_id.eq.ID
-        # Supabase syntax: column.operator.value
-        or_filter = f"fyp_sv_id.eq.{staff_db_id},li_sv_id.eq.{staff_db_id},fyp1_panel_id.eq.{staff_db_id},fyp2_panel_id.eq.{staff_db_id}"
-        
-        response = sb.table("students").select("*").or_(or_filter).execute()
-        
-        df = pd.DataFrame(response.data) if response.data else pd.DataFrame()
+        sid = int(staff_db_id) if str(staff_db_id).isdigit() else staff_db_id
+        try:
+            response = sb.rpc("students_for_marking", {"p_staff_id": sid, "p_program": program}).execute()
+            df = pd.DataFrame(response.data) if response.data else pd.DataFrame()
+        except Exception:
+            df = _students_for_marking_fallback(staff_db_id, program)
         
         if df.empty: return df
         
@@ -196,37 +489,45 @@ def get_students_for_marking(staff_db_id):
             "fyp_title": "FYP_Title",
             "fyp1_marks": "FYP 1 Marks",
             "fyp2_marks": "FYP 2 Marks",
-            "li_marks": "LI Marks",
-            "company_id": "company_id",
-            "fyp_company_id": "fyp_company_id",
-            "li_company_id": "li_company_id",
-            "fyp_sv_id": "fyp_sv_id",
-            "li_sv_id": "li_sv_id",
-            "fyp1_panel_id": "fyp1_panel_id",
-            "fyp2_panel_id": "fyp2_panel_id"
+            "li_marks": "LI Marks"
         }
         df = df.rename(columns=rename_map)
         
-        # SYNTHETIC COLUMNS for App Logic Compatibility
-        # App expects 'fyp1_sv_id', 'fyp2_sv_id' etc. but DB has 'fyp_sv_id'
-        if "fyp_sv_id" in df.columns:
-            df["fyp1_sv_id"] = df["fyp_sv_id"]
-            df["fyp2_sv_id"] = df["fyp_sv_id"]
-            
-        if "li_sv_id" in df.columns:
-            df["li_uni_sv_id"] = df["li_sv_id"]
-            df["li_industry_sv_id"] = None # Not tracked for Staff Marking usually, or mapped elsewhere
-            
         # Fill missing likely for display
         cols = ["FYP 1 Marks", "FYP 2 Marks", "LI Marks"]
         for c in cols:
             if c not in df.columns: df[c] = None
+        for c in MARKING_ROLE_FLAGS:
+            df[c] = df[c].fillna(False).astype(bool) if c in df.columns else False
             
         return df
     except Exception as e:
-        st.error(f"Error fetching students for marking: {e}")
+        _report_error(f"Error fetching students for marking: {e}")
         return pd.DataFrame()
 
+def _students_for_marking_fallback(staff_db_id, program=None):
+    """Pre-migration path: OR'd select, role flags computed here."""
+    # Supabase syntax: column.operator.value
+    or_filter = f"fyp_sv_id.eq.{staff_db_id},li_sv_id.eq.{staff_db_id},fyp1_panel_id.eq.{staff_db_id},fyp2_panel_id.eq.{staff_db_id}"
+    query = sb.table("students").select(_roster_select("students")).or_(or_filter)
+    if program:
+        query = query.eq("program", program)
+    response = query.execute()
+    df = pd.DataFrame(response.data) if response.data else pd.DataFrame()
+    if df.empty: return df
+
+    def is_staff(col):
+        if col not in df.columns: return False
+        return df[col].astype(str).str.split(".").str[0] == str(staff_db_id)
+
+    df["is_fyp1_sv"] = is_staff("fyp_sv_id")
+    df["is_fyp1_panel"] = is_staff("fyp1_panel_id")
+    df["is_fyp2_sv"] = df["is_fyp1_sv"] # One FYP SV covers FYP 1 and FYP 2
+    df["is_fyp2_panel"] = is_staff("fyp2_panel_id")
+    df["is_li_sv"] = is_staff("li_sv_id")
+    return df
+
+@_writes("students")
 def add_student(name, matrix, email, program, cohort, 
                 fyp_cid=None, li_cid=None, 
                 f1s_id=None, f1p_id=None, 
@@ -250,7 +551,7 @@ def add_student(name, matrix, email, program, cohort,
             # If industry SV is a staff member, store it, but usually its external string.
             # Assuming DB column matches the key name if provided.
             "fyp_title": fyp_title,
-            "password": password if password else matrix,
+            "password": make_hash(password if password else matrix), # Default: matrix number
             "is_archived": 0
         }
         sb.table("students").insert(data).execute()
@@ -258,6 +559,7 @@ def add_student(name, matrix, email, program, cohort,
     except Exception as e:
         return False, str(e)
 
+@_writes("students")
 def bulk_add_students(df):
     """
     Adds students in bulk from a DataFrame.
@@ -305,6 +607,10 @@ def bulk_add_students(df):
             
         if not records:
             return 0, ["No valid student entries found in the file."]
+
+        # Default password = matrix number, hashed in parallel
+        for rec, hashed in zip(records, hash_passwords([r["password"] for r in records])):
+            rec["password"] = hashed
             
         sb.table("students").insert(records).execute()
         count = len(records)
@@ -312,20 +618,99 @@ def bulk_add_students(df):
     except Exception as e:
         return 0, [str(e)]
 
+# ===========================
+# PASSWORD RECOVERY
+# ===========================
+# Recovery never replaces a working password. The temporary password is stored hashed
+# next to it (reset_password, valid for RESET_TTL_HOURS; migrations/011_password_reset.sql)
+# and only becomes the password the first time it is used to log in. Logging in with
+# the current password cancels a pending reset.
+
+RESET_TTL_HOURS = 24
+RESET_COLUMNS = ["reset_password", "reset_expires_at"]
+
+def _pending_reset(row):
+    """Hash of the temporary password if a reset is pending and unexpired, else None."""
+    stored, expires = row.get("reset_password"), row.get("reset_expires_at")
+    if not stored or not expires: return None
+    try:
+        expires = datetime.fromisoformat(str(expires).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if expires.tzinfo is None:
+        expires = expires.replace(tzinfo=timezone.utc)
+    return stored if expires > datetime.now(timezone.utc) else None
+
+def _start_reset(table, key_col, key, email_col, email):
+    """If key + email match, store a pending temporary password. Returns it, or None on mismatch."""
+    res = sb.table(table).select(email_col).eq(key_col, key).execute()
+    if not res.data or str(res.data[0].get(email_col) or "").strip().lower() != str(email).strip().lower():
+        return None
+    temp = temporary_password()
+    expires = datetime.now(timezone.utc) + timedelta(hours=RESET_TTL_HOURS)
+    sb.table(table).update({"reset_password": make_hash(temp), "reset_expires_at": expires.isoformat()}).eq(key_col, key).execute()
+    return temp
+
+def _verify_login(table, key_col, key, password_col, password):
+    """
+    Fetch the account by key, check the password off-thread and upgrade a plaintext
+    or old-cost password to a fresh hash on success. A pending temporary password
+    is accepted once and becomes the password. Returns the row without its
+    password, reset or search columns (it is kept in session state), or None.
+    """
+    res = sb.table(table).select("*").eq(key_col, key).execute()
+    if not res.data: return None
+    row = res.data[0]
+    ok, needs_rehash = check_password(password, row.get(password_col))
+    pending = _pending_reset(row)
+    updates = {}
+    if ok:
+        if needs_rehash: updates[password_col] = make_hash(password)
+        if row.get("reset_password"): updates.update(dict.fromkeys(RESET_COLUMNS)) # still knows it: cancel the reset
+    elif pending and check_password(password, pending)[0]:
+        updates = {password_col: pending, **dict.fromkeys(RESET_COLUMNS)}
+    else:
+        return None
+    if updates:
+        try: sb.table(table).update(updates).eq(key_col, key).execute()
+        except Exception: pass # Login still succeeds; retried next time
+    return {k: v for k, v in row.items() if k != password_col and k not in UNFETCHED_COLUMNS}
+
 def verify_student_login(matrix, password):
     """
     Verifies student credentials.
     Returns student dict if success, else None.
     """
     try:
-        res = sb.table("students").select("*").eq("matrix_number", matrix).eq("password", password).execute()
-        if res.data and len(res.data) > 0:
-            return res.data[0]
-        else:
-            return None
+        return _verify_login("students", "matrix_number", matrix, "password", password)
     except Exception as e:
         return None
 
+@_writes("students")
+def update_student_password(matrix, new_password):
+    try:
+        data = {"password": make_hash(new_password), **dict.fromkeys(RESET_COLUMNS)}
+        sb.table("students").update(data).eq("matrix_number", matrix).execute()
+        return True, "Password updated."
+    except Exception as e:
+        return False, str(e)
+
+@_writes("students")
+def reset_student_password(matrix, email):
+    """
+    Recovery: if matrix + email match, store a pending temporary password (see
+    PASSWORD RECOVERY; the current password keeps working).
+    Returns (True, temporary password) or (False, message).
+    """
+    try:
+        temp = _start_reset("students", "matrix_number", matrix, "email", email)
+        if temp is None:
+            return False, "Matrix Number and Email do not match our records."
+        return True, temp
+    except Exception as e:
+        return False, str(e)
+
+@_writes("students")
 def update_student(matrix, updates):
     """Update student details."""
     try:
@@ -342,39 +727,119 @@ def update_student(matrix, updates):
         }
         for k, v in updates.items():
             db_key = key_map.get(k, k) # Use map or original
-            db_updates[db_key] = v
+            db_updates[db_key] = make_hash(v) if db_key == "password" and v else v
             
         sb.table("students").update(db_updates).eq("matrix_number", matrix).execute()
         return True, "Updated successfully."
     except Exception as e:
         return False, str(e)
 
+@_writes("students")
 def delete_student(matrix, changed_by="System"):
-    """Soft Delete / Archive."""
+    """Soft Delete / Archive (moves the row to the archive table)."""
     try:
-        sb.table("students").update({"is_archived": 1}).eq("matrix_number", matrix).execute()
+        moved = sb.rpc("archive_students", {"p_matrix": matrix}).execute().data
+        if not moved:
+            return False, "Student not found."
         return True, "Student deactivated/archived."
     except Exception as e:
         return False, str(e)
 
+@_writes("students")
 def archive_students_by_cohort(cohort, changed_by="System"):
     try:
-        sb.table("students").update({"is_archived": 1}).eq("cohort", cohort).execute()
-        return True, f"Cohort {cohort} archived."
+        moved = sb.rpc("archive_students", {"p_cohort": cohort}).execute().data or 0
+        return True, f"Cohort {cohort} archived ({moved} students)."
     except Exception as e: return False, str(e)
 
+@_writes("students")
 def unarchive_students_by_cohort(cohort, changed_by="System"):
     try:
-        sb.table("students").update({"is_archived": 0}).eq("cohort", cohort).execute()
-        return True, f"Cohort {cohort} restored."
+        res = sb.rpc("unarchive_students", {"p_cohort": cohort}).execute().data
+        counts = (res[0] if isinstance(res, list) and res else res) or {}
+        msg = f"Cohort {cohort} restored ({counts.get('restored', 0)} students)."
+        if counts.get("skipped"):
+            msg += f" {counts['skipped']} stayed archived: their matrix numbers are registered as active students."
+        return True, msg
     except Exception as e: return False, str(e)
 
 
+# ===========================
+# OPTIMISTIC CONCURRENCY
+# ===========================
+# Writers pass the row the edit was based on (`original`: the editor's edit baseline,
+# marking.edit_baseline, not the live roster). A write applies if the row's
+# row_version is unchanged, or else if every written column still holds the loaded
+# value, so concurrent edits to unrelated columns never conflict (migrations/005_row_version.sql).
+
+RLS_BLOCKED = "Database blocked the update! (Row-Level Security policy error)."
+
+# Roster columns the dashboard and staff portal can write, under the names _loaded_value
+# looks up: what an editor's edit baseline (marking.edit_baseline) keeps per row
+EDITABLE_COLUMNS = ["Email", "FYP_Title", "Lapor Diri", "Aku Janji", "FYP 1 Marks", "FYP 2 Marks", "LI Marks",
+                    "fyp_company_id", "li_company_id", "fyp_sv_id", "fyp1_panel_id", "fyp2_panel_id", "li_sv_id"]
+
+def _blank(val):
+    return val is None or (not isinstance(val, str) and pd.isna(val)) or val == "" or val == "-"
+
+def _loaded_value(original, db_col):
+    """Value of a DB column in a loaded roster row (raw or App column name)."""
+    col = db_col if db_col in original else STUDENT_COLUMNS.get(db_col, db_col)
+    val = original.get(col)
+    return None if _blank(val) else val
+
+def _coerce(db_col, value):
+    """DB types for students columns: marks -> float(2dp), *_id -> int (UUIDs kept), else as is."""
+    if "marks" in db_col:
+        return round(float(value), 2) if not _blank(value) else None
+    if "_id" in db_col:
+        if _blank(value): return None
+        text = str(value).split(".")[0] if isinstance(value, float) else str(value)
+        return int(text) if text.isdigit() else text
+    return value
+
+def _conditional_update(matrix, data, original=None):
+    """
+    UPDATE students SET data for one student; optimistic when `original` is given.
+    Returns (success, message, current_row_or_None).
+    """
+    def _update():
+        return sb.table("students").update(data).eq("matrix_number", matrix)
+
+    if original is None:
+        res = _update().execute()
+        return (True, "Updated", res.data[0]) if res.data else (False, RLS_BLOCKED, None)
+
+    # 1. Row untouched since it was loaded
+    version = original.get("row_version")
+    if not _blank(version):
+        try:
+            res = _update().eq("row_version", int(version)).execute()
+            if res.data: return True, "Updated", res.data[0]
+        except Exception:
+            pass # row_version column not migrated yet
+
+    # 2. Row moved on: write only if these columns still hold what was loaded
+    query = _update()
+    for col in data:
+        loaded = _coerce(col, _loaded_value(original, col))
+        query = query.is_(col, "null") if loaded is None else query.eq(col, loaded)
+    res = query.execute()
+    if res.data: return True, "Updated", res.data[0]
+
+    # 3. Conflict (or the row is gone / blocked)
+    cur = sb.table("students").select("*").eq("matrix_number", matrix).execute()
+    if not cur.data: return False, RLS_BLOCKED, None
+    now = ", ".join(f"{c} is now {cur.data[0].get(c) if cur.data[0].get(c) is not None else 'blank'}" for c in data)
+    return False, f"Conflict: changed by someone else ({now})", cur.data[0]
+
 # Wrapper for Dashboard "Save" action on Company/SV changes
-def update_student_company(matrix, company_id, type_="fyp", changed_by="System"):
+@_writes("students")
+def update_student_company(matrix, company_id, type_="fyp", changed_by="System", original=None):
     """
     Updates student's company/SV assignment.
     type_: 'fyp' or 'li'
+    original: roster row the edit was based on (optimistic concurrency, see _conditional_update)
     """
     try:
         # STRICT MAPPING for Separation
@@ -394,22 +859,25 @@ def update_student_company(matrix, company_id, type_="fyp", changed_by="System")
         else:
             val = None
         
-        res = sb.table("students").update({col_name: val}).eq("matrix_number", matrix).execute()
+        success, msg, _ = _conditional_update(matrix, {col_name: val}, original)
         
-        # Detect silent RLS failure (0 rows actually updated)
-        if hasattr(res, 'data') and len(res.data) == 0:
-            return False, "Database blocked the update! (Row-Level Security policy error). Check your Supabase key."
+        # Detect silent RLS failure (0 rows actually updated) or a concurrent change
+        if not success:
+            return False, msg + (" Check your Supabase key." if msg == RLS_BLOCKED else "")
         
         # Log it
-        log_audit(matrix, f"{type_.upper()} Company", "Old", str(val), changed_by)
+        old = _loaded_value(original, col_name) if original is not None else "Old"
+        log_audit(matrix, f"{type_.upper()} Company", old, str(val), changed_by)
         return True, "Updated successfully"
     except Exception as e:
         return False, str(e)
         
-def update_student_field(matrix, field, value, changed_by="Admin"):
+@_writes("students")
+def update_student_field(matrix, field, value, changed_by="Admin", original=None):
     """
     Generic updater for single field from Dashboard.
     Maps App-Friendly Names -> DB Columns.
+    original: roster row the edit was based on (optimistic concurrency, see _conditional_update)
     """
     try:
         # 1. Map Field Name -> DB Column
@@ -443,41 +911,67 @@ def update_student_field(matrix, field, value, changed_by="Admin"):
                  val = int(value)
              else:
                  val = None # ID must be int usually
+        elif db_col == "password":
+            if value is None or str(value).strip() in ("", "-"):
+                return False, "Password cannot be empty."
+            val = make_hash(str(value).strip())
+            original = None # Set, not merged
         else:
             val = value
             
-        res = sb.table("students").update({db_col: val}).eq("matrix_number", matrix).execute()
+        success, msg, _ = _conditional_update(matrix, {db_col: val}, original)
         
-        # Detect silent RLS failure
-        if hasattr(res, 'data') and len(res.data) == 0:
-            return False, "Database blocked the update! (Row-Level Security policy error)."
+        # Detect silent RLS failure or a concurrent change
+        if not success:
+            return False, msg
             
-        log_audit(matrix, field, "Old", str(val), changed_by)
+        old = _loaded_value(original, db_col) if original is not None else "Old"
+        log_audit(matrix, field, old, "(changed)" if db_col == "password" else str(val), changed_by)
         return True, "Updated"
     except Exception as e:
         return False, str(e)
 
-def update_student_marks(matrix, fyp1, fyp2, li, changed_by="Staff"):
+@_writes("students")
+def save_marks_batch(patches, changed_by="Staff"):
     """
-    Updates all 3 mark fields at once.
+    Writes only the given mark columns for each student in one round trip and logs
+    one audit row per changed column (RPC 'save_marks_batch', migrations/004_batch_marks.sql).
+    patches: [{'matrix_number': ..., 'row_version': 7, 'expected': {'fyp1_marks': 60.0}, 'fyp1_marks': 71.5}]
+    (see marking.mark_patches). Columns changed by someone else since they were loaded
+    are skipped and reported as a conflict (migrations/005_row_version.sql).
+    Returns {matrix: (success, message)}.
     """
+    if not patches: return {}
     try:
-        def _parse_mark(m):
-            return round(float(m), 2) if m is not None and m != "-" and str(m).strip() != "" else None
+        res = sb.rpc("save_marks_batch", {"p_rows": patches, "p_changed_by": changed_by}).execute()
+        return {r["matrix_number"]: (bool(r["ok"]), r["message"]) for r in (res.data or [])}
+    except Exception:
+        return _save_marks_fallback(patches, changed_by)
 
-        data = {
-            "fyp1_marks": _parse_mark(fyp1),
-            "fyp2_marks": _parse_mark(fyp2),
-            "li_marks": _parse_mark(li)
-        }
-        sb.table("students").update(data).eq("matrix_number", matrix).execute()
-        
-        # Log it (just summary)
-        log_audit(matrix, "Marks Update", "Detailed", f"{fyp1}|{fyp2}|{li}", changed_by)
-        return True, "Marks updated successfully."
-    except Exception as e:
-        return False, str(e)
+def _save_marks_fallback(patches, changed_by):
+    """Pre-migration path: one (conditional) UPDATE per changed student, audit rows in a single insert."""
+    results = {}
+    audit_rows = []
+    now = datetime.now().isoformat()
+    for patch in patches:
+        matrix = patch["matrix_number"]
+        data = {k: v for k, v in patch.items() if k not in ("matrix_number", "row_version", "expected")}
+        expected = patch.get("expected") or {}
+        original = {**expected, "row_version": patch.get("row_version")} if expected else None
+        try:
+            success, msg, _ = _conditional_update(matrix, data, original)
+            results[matrix] = (success, "Saved" if success else msg)
+            if not success: continue
+            audit_rows += [{"matrix_no": matrix, "field_changed": k, "old_value": "" if expected.get(k) is None else str(expected[k]),
+                            "new_value": "" if v is None else str(v), "changed_by": changed_by, "timestamp": now} for k, v in data.items()]
+        except Exception as e:
+            results[matrix] = (False, str(e))
+    try:
+        if audit_rows: sb.table("audit_logs").insert(audit_rows).execute()
+    except: pass
+    return results
 
+@_writes("students")
 def sync_student_data(matrix):
     """
     Syncs FYP 1 data to FYP 2 (Company, Title) and LI columns.
@@ -517,18 +1011,31 @@ def sync_student_data(matrix):
     except Exception as e:
         return False, str(e)
         
-def bulk_update_titles(df):
-    """Updates FYP Titles from DataFrame."""
+@_writes("students")
+def bulk_update_titles(df, originals=None, changed_by="Admin"):
+    """
+    Updates FYP Titles from DataFrame (columns 'Matrix Number', 'FYP Title').
+    originals: {matrix: row as loaded} (marking.baseline_row of the upload's baseline);
+    a title changed by someone else since then is reported as a conflict, not overwritten.
+    Titles equal to the loaded one are skipped. Returns (updated count, [errors]).
+    """
+    originals = originals or {}
     count = 0
     errors = []
-    # Expects columns: 'Matrix Number', 'FYP Title'
     try:
         for _, row in df.iterrows():
             mat = str(row['Matrix Number']).strip()
             title = str(row['FYP Title']).strip()
-            
+            original = originals.get(mat)
+            old = _loaded_value(original, "fyp_title") if original else None
+            if original and old == title:
+                continue
             try:
-                sb.table("students").update({"fyp_title": title}).eq("matrix_number", mat).execute()
+                success, msg, _ = _conditional_update(mat, {"fyp_title": title}, original)
+                if not success:
+                    errors.append(f"{mat}: {msg}")
+                    continue
+                log_audit(mat, "FYP_Title", "" if old is None else old, title, changed_by)
                 count += 1
             except Exception as e:
                 errors.append(f"{mat}: {e}")
@@ -543,21 +1050,23 @@ def bulk_update_titles(df):
 def get_staff():
     try:
         response = sb.table("staff").select("*").execute()
-        return pd.DataFrame(response.data) if response.data else pd.DataFrame()
+        return pd.DataFrame(response.data).drop(columns=RESET_COLUMNS, errors="ignore") if response.data else pd.DataFrame()
     except Exception as e:
         return pd.DataFrame()
 
 # Alias for compatibility
 get_all_staff = get_staff
 
+@_writes("staff")
 def add_staff(name, staff_id, email, password):
     try:
-        data = {"staff_name": name, "staff_id_number": staff_id, "staff_email": email, "staff_password": password}
+        data = {"staff_name": name, "staff_id_number": staff_id, "staff_email": email, "staff_password": make_hash(password)}
         sb.table("staff").insert(data).execute()
         return True, "Staff added."
     except Exception as e:
         return False, str(e)
 
+@_writes("staff")
 def delete_staff(staff_id):
     try:
         sb.table("staff").delete().eq("staff_id", staff_id).execute()
@@ -578,16 +1087,35 @@ def verify_staff_login(staff_id_num, password):
     """
     try:
         # Match against 'staff_id_number' and 'staff_password' columns
-        res = sb.table("staff").select("*").eq("staff_id_number", staff_id_num).eq("staff_password", password).execute()
-        
-        if res.data and len(res.data) > 0:
-            return res.data[0] # Return the first matching staff record
-        else:
-            return None
+        return _verify_login("staff", "staff_id_number", staff_id_num, "staff_password", password)
     except Exception as e:
         print(f"Login Error: {e}")
         return None
 
+@_writes("staff")
+def update_staff_password(staff_id_num, new_password):
+    try:
+        data = {"staff_password": make_hash(new_password), **dict.fromkeys(RESET_COLUMNS)}
+        sb.table("staff").update(data).eq("staff_id_number", staff_id_num).execute()
+        return True, "Password updated."
+    except Exception as e:
+        return False, str(e)
+
+@_writes("staff")
+def reset_staff_password(staff_id_num, email):
+    """
+    Recovery: if staff ID + email match, store a pending temporary password (see
+    PASSWORD RECOVERY; the current password keeps working).
+    Returns (True, temporary password) or (False, message).
+    """
+    try:
+        temp = _start_reset("staff", "staff_id_number", staff_id_num, "staff_email", email)
+        if temp is None:
+            return False, "ID and Email do not match our records."
+        return True, temp
+    except Exception as e:
+        return False, str(e)
+
 # ===========================
 # COMPANY FUNCTIONS
 # ===========================
@@ -609,6 +1137,7 @@ def get_companies():
 
 get_all_companies_full = get_companies
 
+@_writes("companies")
 def add_company(name, address=None, state=None):
     try:
         data = {"company_name": name, "address": address, "state": state}
@@ -617,6 +1146,7 @@ def add_company(name, address=None, state=None):
     except Exception as e:
         return False, str(e)
 
+@_writes("companies")
 def bulk_add_companies(df):
     count = 0
     errors = []
@@ -683,6 +1213,33 @@ def get_rubrics():
         return pd.DataFrame(response.data) if response.data else pd.DataFrame()
     except: return pd.DataFrame()
 
+def get_rubric_catalog():
+    """{(subject, cohort): rubric count}, without fetching the rubric rows."""
+    try:
+        try:
+            rows = sb.rpc("rubric_catalog", {}).execute().data or []
+        except Exception:
+            # Pre-migration: two narrow columns, counted here
+            rows = sb.table("rubrics").select("subject,cohort").execute().data or []
+        catalog = {}
+        for r in rows:
+            key = (r.get("subject"), str(r.get("cohort") or ""))
+            catalog[key] = catalog.get(key, 0) + int(r.get("n", 1))
+        return catalog
+    except: return {}
+
+def get_rubric_page(subject, cohort=None, offset=0, limit=20):
+    """Rubrics of one subject (and cohort, if given) in listing order, filtered and paged by the server."""
+    try:
+        query = sb.table("rubrics").select("*").eq("subject", subject)
+        if cohort:
+            query = query.eq("cohort", cohort)
+        res = (query.order("cohort", desc=True).order("item_name").order("rubric_id")
+               .range(offset, offset + limit - 1).execute())
+        return pd.DataFrame(res.data) if res.data else pd.DataFrame()
+    except: return pd.DataFrame()
+
+@_writes("rubrics")
 def add_rubric(subject, cohort, item_name, filename):
     try:
         data = {"subject": subject, "cohort": cohort, "item_name": item_name, "filename": filename}
@@ -691,6 +1248,7 @@ def add_rubric(subject, cohort, item_name, filename):
     except Exception as e:
         return False, str(e)
 
+@_writes("rubrics")
 def update_rubric(rubric_id, subject, cohort, item_name, filename=None):
     try:
         data = {"subject": subject, "cohort": cohort, "item_name": item_name}
@@ -701,12 +1259,45 @@ def update_rubric(rubric_id, subject, cohort, item_name, filename=None):
     except Exception as e:
         return False, str(e)
 
+@_writes("rubrics")
 def delete_rubric(rubric_id):
     try:
         sb.table("rubrics").delete().eq("rubric_id", rubric_id).execute()
         return True
     except: return False
 
+# ===========================
+# GRADE SCALE FUNCTIONS
+# ===========================
+
+def get_grade_scales():
+    """Stored grade scales (see grading.scales_from_frame)."""
+    try:
+        res = sb.table("grade_scales").select("*").execute()
+        return pd.DataFrame(res.data) if res.data else pd.DataFrame()
+    except: return pd.DataFrame()
+
+@_writes("grade_scales")
+def save_grade_scale(program, cohort, boundaries, labels):
+    """Insert or replace the scale for (program, cohort). None means 'all'."""
+    try:
+        q = sb.table("grade_scales").delete()
+        q = q.eq("program", program) if program else q.is_("program", "null")
+        q = q.eq("cohort", cohort) if cohort else q.is_("cohort", "null")
+        q.execute()
+        data = {"program": program, "cohort": cohort, "boundaries": list(boundaries), "labels": list(labels)}
+        sb.table("grade_scales").insert(data).execute()
+        return True, "Grade scale saved."
+    except Exception as e:
+        return False, str(e)
+
+@_writes("grade_scales")
+def delete_grade_scale(scale_id):
+    try:
+        sb.table("grade_scales").delete().eq("scale_id", scale_id).execute()
+        return True
+    except: return False
+
 # ===========================
 # AUDIT & LOG FUNCTIONS
 # ===========================
@@ -730,14 +1321,19 @@ def log_audit(matrix, field, old_val, new_val, changed_by):
         sb.table("audit_logs").insert(data).execute()
     except: pass
 
+@_writes("students")
+@_writes("companies")
+@_writes("staff")
+@_writes("rubrics")
 def clear_all_data():
-    """Danger Zone: Clear all data."""
+    """Danger Zone: Clear all data (notifies every table it wipes, so cached catalogs and maps drop)."""
     try:
         # Delete dependent first
         # sb.table("students").delete().neq("matrix_number", "00000").execute() # delete all
         # Supabase-py doesn't allow delete without WHERE usually to prevent accidents.
         # But we can try: 
         sb.table("students").delete().neq("matrix_number", "xyz_safety").execute()
+        sb.table(ARCHIVE_TABLE).delete().neq("matrix_number", "xyz_safety").execute()
         sb.table("companies").delete().neq("company_id", -1).execute()
         sb.table("staff").delete().neq("staff_id", -1).execute()
         sb.table("rubrics").delete().neq("rubric_id", -1).execute()
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+# ===========================
+# GRADE SCALES
+# ===========================
+# A scale is a list of ascending lower boundaries plus one label per band
+# (lowest band first). Faculties can store their own scale per program
+# and/or cohort in the 'grade_scales' table (migrations/002_grade_scales.sql);
+# anything without a stored scale uses DEFAULT_SCALE.
+
+
+class GradeScale:
+    def __init__(self, boundaries, labels, name="Default"):
+        boundaries = [float(b) for b in boundaries]
+        labels = [str(l).strip() for l in labels]
+        if len(labels) != len(boundaries) + 1:
+            raise ValueError(f"Need {len(boundaries) + 1} labels for {len(boundaries)} boundaries, got {len(labels)}.")
+        if any(b2 <= b1 for b1, b2 in zip(boundaries, boundaries[1:])):
+            raise ValueError("Boundaries must be strictly increasing.")
+        self.name = name
+        self.boundaries = np.array(boundaries)
+        self.labels = labels
+
+    @property
+    def order(self):
+        """Labels best grade first (chart/display order)."""
+        return self.labels[::-1]
+
+    def key(self):
+        return (tuple(self.boundaries.tolist()), tuple(self.labels))
+
+    def bin(self, marks):
+        """Grade labels for an array-like of marks; NaN marks get None."""
+        vals = pd.to_numeric(pd.Series(marks), errors="coerce").to_numpy(dtype=float)
+        idx = np.searchsorted(self.boundaries, vals, side="right")
+        out = np.array(self.labels, dtype=object)[idx]
+        out[np.isnan(vals)] = None
+        return out
+
+    def __repr__(self):
+        return f"GradeScale({self.name!r}, {self.boundaries.tolist()}, {self.labels})"
+
+
+# UTeM-style scale (the old get_grade_bin ladder): >=80 A, >=75 A-, ... <40 E
+DEFAULT_SCALE = GradeScale(
+    [40, 44, 47, 50, 55, 60, 65, 70, 75, 80],
+    ["E", "D", "D+", "C-", "C", "C+", "B-", "B", "B+", "A-", "A"],
+)
+
+
+def _blank(val):
+    return val is None or (not isinstance(val, str) and pd.isna(val)) or str(val).strip() in ("", "-")
+
+
+def _as_list(val):
+    """DB arrays come back as lists; free-text entries as '40, 44, 47'."""
+    if isinstance(val, str):
+        return [v for v in val.replace(";", ",").split(",") if v.strip()]
+    return list(val)
+
+
+def scales_from_frame(df):
+    """
+    Rows of db.get_grade_scales() -> {(program, cohort): GradeScale}.
+    program/cohort may be None (applies to every program/cohort). Invalid rows are skipped.
+    """
+    scales = {}
+    if df is None or df.empty:
+        return scales
+    for row in df.to_dict("records"):
+        try:
+            program = None if _blank(row.get("program")) else str(row["program"])
+            cohort = None if _blank(row.get("cohort")) else str(row["cohort"])
+            name = " / ".join(p for p in [program, cohort] if p) or "All"
+            scales[(program, cohort)] = GradeScale(_as_list(row["boundaries"]), _as_list(row["labels"]), name=name)
+        except (KeyError, TypeError, ValueError):
+            continue
+    return scales
+
+
+def scale_for(program=None, cohort=None, scales=None):
+    """Most specific scale: (program, cohort) > (program, *) > (*, cohort) > (*, *) > default."""
+    scales = scales or {}
+    for key in [(program, cohort), (program, None), (None, cohort), (None, None)]:
+        if key in scales:
+            return scales[key]
+    return DEFAULT_SCALE
+
+
+def scales_key(scales):
+    """Hashable fingerprint of a scale set (for cache keys)."""
+    return tuple(sorted((str(k), s.key()) for k, s in (scales or {}).items()))
+
+
+def assign_grades(marks, programs=None, cohorts=None, scales=None):
+    """
+    Vectorized grading of a whole column. With stored scales, rows are grouped by
+    (program, cohort) and each group is binned with its own scale in one call.
+    Returns an object array of labels (None where the mark is missing).
+    """
+    marks = pd.to_numeric(pd.Series(marks), errors="coerce").reset_index(drop=True)
+    if not scales:
+        return DEFAULT_SCALE.bin(marks)
+
+    vals = marks.to_numpy()
+    n = len(vals)
+    programs = pd.Series([None] * n if programs is None else list(programs), dtype=object)
+    cohorts = pd.Series([None] * n if cohorts is None else list(cohorts), dtype=object)
+    out = np.empty(n, dtype=object)
+    groups = pd.DataFrame({"p": programs, "c": cohorts}).fillna("\0").groupby(["p", "c"], sort=False).indices
+    for (program, cohort), pos in groups.items():
+        scale = scale_for(None if program == "\0" else program, None if cohort == "\0" else cohort, scales)
+        out[pos] = scale.bin(vals[pos])
+    return out
+
+
+def grade_order(scales=None):
+    """Display order for histograms: default labels, then any extra labels from stored scales."""
+    order = list(DEFAULT_SCALE.order)
+    for scale in (scales or {}).values():
+        order += [l for l in scale.order if l not in order]
+    return order
@@ -0,0 +1,402 @@
+import logging
+import smtplib
+import socketserver
+import sqlite3
+import threading
+import time
+from email.mime.text import MIMEText
+
+# ===========================
+# OUTBOUND MAIL QUEUE
+# ===========================
+# Pages enqueue mail and return immediately; a background MailWorker sends it over
+# one reused, authenticated SMTP connection, throttled to the provider's rate, with
+# retries and exponential backoff. The outbox is a small SQLite file so queued mail
+# survives restarts and every message keeps its delivery status. Bodies can carry
+# secrets (recovery mail holds a temporary password), so a body is only kept while
+# the message may still be sent: it is blanked once the message is sent or failed.
+#
+# LocalSMTPServer is an in-process SMTP stand-in for tests and offline development.
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_PATH = "outbox.db"
+
+QUEUED, SENDING, SENT, FAILED = "queued", "sending", "sent", "failed"
+
+# Sending limits belong to the mail account, so they are settings (app.py reads
+# EMAIL_RATE_PER_MINUTE and EMAIL_DAILY_CAP from secrets); these defaults apply when
+# they are not set. At the daily cap the worker stops claiming mail: the rest stays
+# queued, untouched, until messages sent in the last 24 h drop below the cap.
+# bench_mail.py measures delivery time at a given rate.
+DEFAULT_RATE_PER_MINUTE = 200
+DEFAULT_DAILY_CAP = 500
+CAP_WINDOW = 24 * 3600
+
+
+class MailQueue:
+    """Persistent outbox (SQLite). Safe to share between threads."""
+
+    def __init__(self, path=OUTBOX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                create table if not exists outbox (
+                    id integer primary key autoincrement,
+                    to_addr text not null,
+                    subject text not null,
+                    body text not null,
+                    campaign text,
+                    status text not null default 'queued',
+                    attempts integer not null default 0,
+                    next_attempt real not null default 0,
+                    last_error text,
+                    created_at real not null,
+                    sent_at real
+                )""")
+            self._conn.execute("create index if not exists idx_outbox_due on outbox (status, next_attempt)")
+            self._conn.execute("create index if not exists idx_outbox_campaign on outbox (campaign)")
+            # Messages claimed by a worker that died mid-send go back to the queue
+            self._conn.execute("update outbox set status = ? where status = ?", (QUEUED, SENDING))
+            # Outboxes written before bodies were redacted
+            self._conn.execute("update outbox set body = '' where status in (?, ?) and body != ''", (SENT, FAILED))
+
+    def enqueue(self, to_addr, subject, body, campaign=None):
+        return self.enqueue_many([(to_addr, subject, body)], campaign)[0]
+
+    def enqueue_many(self, messages, campaign=None):
+        """messages: [(to, subject, body)] -> ids. One transaction for the whole batch."""
+        now = time.time()
+        ids = []
+        with self._lock:
+            self._conn.execute("begin")
+            for to_addr, subject, body in messages:
+                cur = self._conn.execute(
+                    "insert into outbox (to_addr, subject, body, campaign, created_at) values (?, ?, ?, ?, ?)",
+                    (to_addr, subject, body, campaign, now))
+                ids.append(cur.lastrowid)
+            self._conn.execute("commit")
+        self._wakeup.set()
+        return ids
+
+    def claim(self, limit=50):
+        """Due queued messages, marked 'sending': [(id, to, subject, body, attempts)]."""
+        with self._lock:
+            rows = self._conn.execute(
+                "select id, to_addr, subject, body, attempts from outbox where status = ? and next_attempt <= ? order by id limit ?",
+                (QUEUED, time.time(), limit)).fetchall()
+            if rows:
+                self._conn.executemany("update outbox set status = ? where id = ?", [(SENDING, r[0]) for r in rows])
+        return rows
+
+    def mark_sent(self, msg_id):
+        with self._lock:
+            self._conn.execute("update outbox set status = ?, attempts = attempts + 1, sent_at = ?, last_error = null, body = '' where id = ?",
+                               (SENT, time.time(), msg_id))
+
+    def mark_retry(self, msg_id, error, delay):
+        with self._lock:
+            self._conn.execute("update outbox set status = ?, attempts = attempts + 1, next_attempt = ?, last_error = ? where id = ?",
+                               (QUEUED, time.time() + delay, str(error), msg_id))
+
+    def mark_failed(self, msg_id, error):
+        with self._lock:
+            self._conn.execute("update outbox set status = ?, attempts = attempts + 1, last_error = ?, body = '' where id = ?",
+                               (FAILED, str(error), msg_id))
+
+    def next_due_in(self):
+        """Seconds until the next queued message is due (None if the queue is empty)."""
+        with self._lock:
+            row = self._conn.execute("select min(next_attempt) from outbox where status = ?", (QUEUED,)).fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def sent_since(self, since):
+        with self._lock:
+            return self._conn.execute("select count(*) from outbox where status = ? and sent_at >= ?", (SENT, since)).fetchone()[0]
+
+    def cap_resets_in(self, cap, window=CAP_WINDOW):
+        """Seconds until fewer than `cap` messages were sent in the last `window` (0 if already)."""
+        now = time.time()
+        with self._lock:
+            times = [r[0] for r in self._conn.execute(
+                "select sent_at from outbox where status = ? and sent_at >= ? order by sent_at", (SENT, now - window))]
+        if len(times) < cap:
+            return 0.0
+        return max(0.0, times[len(times) - cap] + window - now)
+
+    def status_counts(self, campaign=None):
+        """{status: count}, for one campaign or the whole outbox."""
+        query = "select status, count(*) from outbox"
+        args = ()
+        if campaign is not None:
+            query += " where campaign = ?"
+            args = (campaign,)
+        with self._lock:
+            return dict(self._conn.execute(query + " group by status", args).fetchall())
+
+    def campaigns(self, limit=20, exclude=()):
+        """Latest campaigns with per-status counts: [{campaign, started, queued, sending, sent, failed}]."""
+        skip = " and campaign not in (%s)" % ",".join("?" * len(exclude)) if exclude else ""
+        with self._lock:
+            rows = self._conn.execute(
+                "select campaign, min(created_at), status, count(*) from outbox where campaign is not null" + skip +
+                " group by campaign, status order by min(created_at) desc", tuple(exclude)).fetchall()
+        out = {}
+        for campaign, started, status, count in rows:
+            entry = out.setdefault(campaign, {"campaign": campaign, "started": started, QUEUED: 0, SENDING: 0, SENT: 0, FAILED: 0})
+            entry["started"] = min(entry["started"], started)
+            entry[status] = count
+        return sorted(out.values(), key=lambda e: e["started"], reverse=True)[:limit]
+
+    def messages(self, campaign=None, limit=1000):
+        """Recent messages as dicts (delivery log)."""
+        query = "select id, to_addr, subject, campaign, status, attempts, last_error, created_at, sent_at from outbox"
+        args = []
+        if campaign is not None:
+            query += " where campaign = ?"
+            args.append(campaign)
+        query += " order by id desc limit ?"
+        args.append(limit)
+        with self._lock:
+            cur = self._conn.execute(query, args)
+            cols = [c[0] for c in cur.description]
+            return [dict(zip(cols, row)) for row in cur.fetchall()]
+
+    def wait(self, timeout):
+        """Block until something is enqueued or timeout passes; True if woken by an enqueue."""
+        woken = self._wakeup.wait(timeout)
+        self._wakeup.clear()
+        return woken
+
+
+class SmtpSender:
+    """One authenticated SMTP connection, opened lazily and reused for many messages."""
+
+    def __init__(self, host, port, user=None, password=None, starttls=True, sender=None, timeout=30):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.sender = sender or user
+        self.timeout = timeout
+        self._smtp = None
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            smtp.starttls()
+        if self.user:
+            smtp.login(self.user, self.password)
+        self._smtp = smtp
+
+    def send(self, to_addr, subject, body):
+        msg = MIMEText(body)
+        msg['Subject'] = subject
+        msg['From'] = self.sender
+        msg['To'] = to_addr
+        if self._smtp is None:
+            self._connect()
+        try:
+            self._smtp.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # Server closed an idle connection: reconnect once
+            self._connect()
+            self._smtp.send_message(msg)
+
+    def close(self):
+        if self._smtp is not None:
+            try: self._smtp.quit()
+            except Exception: pass
+            self._smtp = None
+
+
+def _is_permanent(error):
+    """5xx replies and refused recipients won't succeed on retry."""
+    if isinstance(error, (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused)):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException) and not isinstance(error, smtplib.SMTPServerDisconnected):
+        return 500 <= error.smtp_code < 600 and error.smtp_code != 535 # 535 = auth, may be fixed by config
+    return False
+
+
+class MailWorker:
+    """
+    Background sender for a MailQueue.
+    rate_per_minute: provider throttle (DEFAULT_RATE_PER_MINUTE; 0 = unthrottled)
+    daily_cap: most messages sent per CAP_WINDOW (DEFAULT_DAILY_CAP; None = no cap)
+    Retries wait backoff * 2**attempts (capped at max_backoff) up to max_attempts.
+    """
+
+    def __init__(self, queue, sender, rate_per_minute=DEFAULT_RATE_PER_MINUTE, daily_cap=DEFAULT_DAILY_CAP,
+                 max_attempts=5, backoff=30, max_backoff=3600, idle_close=60):
+        self.queue = queue
+        self.sender = sender
+        self.interval = 60.0 / rate_per_minute if rate_per_minute else 0
+        self.daily_cap = daily_cap
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.idle_close = idle_close
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_send = 0.0
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="mail-worker", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self.queue._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.sender.close()
+
+    def _throttle(self):
+        wait = self._last_send + self.interval - time.time()
+        if wait > 0:
+            self._stop.wait(wait)
+        self._last_send = time.time()
+
+    def _deliver(self, msg_id, to_addr, subject, body, attempts):
+        try:
+            self.sender.send(to_addr, subject, body)
+            self.queue.mark_sent(msg_id)
+        except Exception as e:
+            self.sender.close() # Don't reuse a connection in an unknown state
+            if _is_permanent(e) or attempts + 1 >= self.max_attempts:
+                self.queue.mark_failed(msg_id, e)
+            else:
+                self.queue.mark_retry(msg_id, e, min(self.backoff * 2 ** attempts, self.max_backoff))
+
+    def quota(self):
+        """Messages that may still be sent in the current window (None = no cap)."""
+        if not self.daily_cap:
+            return None
+        return max(0, self.daily_cap - self.queue.sent_since(time.time() - CAP_WINDOW))
+
+    def run_once(self, limit=50):
+        """Send every due message (respecting the rate and daily cap); returns how many were attempted."""
+        quota = self.quota()
+        if quota is not None:
+            limit = min(limit, quota)
+            if limit == 0:
+                return 0 # at the cap: leave the queue alone, no attempts counted
+        batch = self.queue.claim(limit)
+        for i, (msg_id, to_addr, subject, body, attempts) in enumerate(batch):
+            if self._stop.is_set():
+                # Unsent claims go back to the queue
+                for rest in batch[i:]:
+                    self.queue.mark_retry(rest[0], "worker stopped", 0)
+                break
+            self._throttle()
+            self._deliver(msg_id, to_addr, subject, body, attempts)
+        return len(batch)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.run_once():
+                    continue
+            except Exception:
+                logger.exception("Mail worker batch failed")
+            due = self.queue.next_due_in()
+            if due is not None and self.quota() == 0:
+                due = max(due, self.queue.cap_resets_in(self.daily_cap))
+            timeout = self.idle_close if due is None else min(due, self.idle_close)
+            if not self.queue.wait(timeout) and due is None:
+                self.sender.close() # Idle: don't hold the SMTP session open
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        server = self.server
+        self._reply("220 localhost stand-in ESMTP")
+        mail_from, rcpt = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            cmd = line.decode(errors="replace").strip()
+            verb = cmd[:4].upper()
+            if verb in ("HELO", "EHLO"):
+                self._reply("250-localhost" if verb == "EHLO" else "250 localhost")
+                if verb == "EHLO":
+                    self._reply("250 AUTH PLAIN LOGIN")
+            elif verb == "AUTH":
+                self._reply("235 Authentication successful")
+            elif verb == "MAIL":
+                mail_from, rcpt = cmd[10:].strip("<> "), []
+                self._reply("250 OK")
+            elif verb == "RCPT":
+                addr = cmd[8:].strip("<> ")
+                if addr in server.reject:
+                    self._reply("550 No such user")
+                else:
+                    rcpt.append(addr)
+                    self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                while True:
+                    chunk = self.rfile.readline()
+                    if not chunk or chunk in (b".\r\n", b".\n"):
+                        break
+                    data.append(chunk.decode(errors="replace"))
+                with server.lock:
+                    server.messages.append({"from": mail_from, "to": rcpt, "data": "".join(data)})
+                self._reply("250 OK queued")
+            elif verb == "RSET":
+                mail_from, rcpt = None, []
+                self._reply("250 OK")
+            elif verb == "NOOP":
+                self._reply("250 OK")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """
+    Minimal in-process SMTP server (no TLS) that keeps received messages in memory.
+    Use with SmtpSender(host, port, starttls=False). `reject`: addresses answered with 550.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0, reject=()):
+        super().__init__((host, port), _SMTPHandler)
+        self.messages = []
+        self.reject = set(reject)
+        self.lock = threading.Lock()
+        self.connections = 0
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        super().process_request(request, client_address)
+
+    @property
+    def address(self):
+        return self.server_address
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="local-smtp", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+# ===========================
+# MARK CHANGE DETECTION
+# ===========================
+# The staff portal saves only what the grader actually changed: the editor output
+# is compared with the marks the editor was showing (its edit baseline), validated
+# in one pass, and written with a single db.save_marks_batch call.
+
+# Portal column -> students table column
+MARK_FIELDS = {"FYP 1 Marks": "fyp1_marks", "FYP 2 Marks": "fyp2_marks", "LI Marks": "li_marks"}
+
+CHANGE_COLUMNS = ["Matrix_No", "column", "field", "old", "new", "row_version"]
+
+
+def _as_marks(df, cols):
+    return df.reindex(columns=cols).apply(pd.to_numeric, errors="coerce").round(2)
+
+
+def edit_baseline(rows, columns):
+    """
+    {Matrix_No: (row_version, {column: loaded value})} for rows as an editor shows them.
+    Taken when the editor renders and kept while it has unsaved edits, so a save is
+    checked against what the user saw rather than the live, delta-synced roster.
+    Columns missing from rows are skipped; NaN is stored as None.
+    """
+    cols = [c for c in columns if c in rows.columns]
+    values = rows[cols].astype(object).where(rows[cols].notna(), None).to_dict("records")
+    versions = rows["row_version"].tolist() if "row_version" in rows.columns else [None] * len(rows)
+    baseline = {}
+    for matrix, version, vals in zip(rows["Matrix_No"].tolist(), versions, values):
+        baseline.setdefault(matrix, (None if pd.isna(version) else int(version), vals))
+    return baseline
+
+
+def baseline_row(baseline, matrix):
+    """A baseline entry as the `original` row for database writes (None if it wasn't shown)."""
+    entry = baseline.get(matrix)
+    if entry is None:
+        return None
+    version, values = entry
+    return {**values, "row_version": version}
+
+
+def mark_changes(baseline, edited, cells=None):
+    """
+    Long frame [Matrix_No, column, field, old, new, row_version] of marks that differ
+    between the editor output and the edit baseline (see edit_baseline; blank == NaN).
+    Only mark columns shown in `edited` are compared, so hidden subjects are never
+    written; cells: optional {(Matrix_No, column)} the user edited, others are ignored.
+    old/row_version are what the grader saw (optimistic concurrency).
+    """
+    cols = [c for c in MARK_FIELDS if c in edited.columns]
+    if not cols or edited.empty:
+        return pd.DataFrame(columns=CHANGE_COLUMNS)
+
+    matrices = edited["Matrix_No"].to_numpy()
+    entries = [baseline.get(m) for m in matrices]
+    loaded = pd.DataFrame([e[1] if e else {} for e in entries], columns=cols)
+    old = _as_marks(loaded, cols).to_numpy(dtype=float)
+    new = _as_marks(edited, cols).to_numpy(dtype=float)
+
+    changed = ~((old == new) | (np.isnan(old) & np.isnan(new)))
+    if cells is not None:
+        changed &= np.array([[(m, c) in cells for c in cols] for m in matrices], dtype=bool).reshape(changed.shape)
+    r, c = np.nonzero(changed)
+    col_names = np.array(cols, dtype=object)[c]
+    versions = np.array([e[0] if e else None for e in entries], dtype=object)
+    return pd.DataFrame({
+        "Matrix_No": matrices[r],
+        "column": col_names,
+        "field": [MARK_FIELDS[n] for n in col_names],
+        "old": old[r, c],
+        "new": new[r, c],
+        "row_version": versions[r],
+    }, columns=CHANGE_COLUMNS)
+
+
+def invalid_marks(changes):
+    """Mask over changes whose new mark is outside 0-100 (blank clears the mark and is allowed)."""
+    new = changes["new"].to_numpy(dtype=float)
+    return ~np.isnan(new) & ((new < 0) | (new > 100))
+
+
+def _mark(val):
+    return None if pd.isna(val) else float(val)
+
+
+def mark_patches(changes):
+    """
+    Changes -> one patch per student for db.save_marks_batch:
+    {'matrix_number', 'row_version', 'expected': {field: loaded mark}, field: new mark or None}
+    """
+    patches = {}
+    for matrix, field, old, new, version in zip(changes["Matrix_No"], changes["field"], changes["old"], changes["new"], changes["row_version"]):
+        patch = patches.get(matrix)
+        if patch is None:
+            patch = patches[matrix] = {"matrix_number": matrix, "expected": {}}
+            if not pd.isna(version): patch["row_version"] = int(version)
+        patch["expected"][field] = _mark(old)
+        patch[field] = _mark(new)
+    return list(patches.values())
@@ -0,0 +1,86 @@
+-- Server-side student search (used by database.search_students)
+-- Run in the Supabase SQL Editor.
+
+create extension if not exists pg_trgm;
+create extension if not exists unaccent;
+
+alter table students add column if not exists search_text text;
+alter table students add column if not exists search_tsv tsvector;
+
+-- Denormalised search fields: name, matrix, email, FYP title + FYP/LI company names
+create or replace function students_search_refresh() returns trigger
+language plpgsql as $$
+declare
+    comp text;
+begin
+    select string_agg(c.company_name, ' ') into comp
+    from companies c
+    where c.company_id in (new.fyp_company_id, new.li_company_id);
+
+    new.search_text := lower(unaccent(concat_ws(' ', new.name, new.matrix_number, new.email, new.fyp_title, comp)));
+    new.search_tsv :=
+        setweight(to_tsvector('simple', unaccent(coalesce(new.matrix_number, ''))), 'A') ||
+        setweight(to_tsvector('simple', unaccent(coalesce(new.name, ''))), 'A') ||
+        setweight(to_tsvector('simple', unaccent(coalesce(new.email, ''))), 'B') ||
+        setweight(to_tsvector('simple', unaccent(coalesce(new.fyp_title, ''))), 'C') ||
+        setweight(to_tsvector('simple', unaccent(coalesce(comp, ''))), 'D');
+    return new;
+end $$;
+
+drop trigger if exists trg_students_search on students;
+create trigger trg_students_search
+    before insert or update of name, matrix_number, email, fyp_title, fyp_company_id, li_company_id
+    on students for each row execute function students_search_refresh();
+
+-- Renaming a company refreshes the students attached to it
+create or replace function companies_search_touch() returns trigger
+language plpgsql as $$
+begin
+    update students set name = name
+    where fyp_company_id = new.company_id or li_company_id = new.company_id;
+    return null;
+end $$;
+
+drop trigger if exists trg_companies_search on companies;
+create trigger trg_companies_search
+    after update of company_name on companies
+    for each row execute function companies_search_touch();
+
+-- Backfill existing rows
+update students set name = name;
+
+create index if not exists idx_students_search_tsv on students using gin (search_tsv);
+create index if not exists idx_students_search_trgm on students using gin (search_text gin_trgm_ops);
+
+-- Prefix full-text match OR trigram substring match, best first.
+-- p_archived: 0 = active, 1 = archived, null = both.
+create or replace function search_students(
+    q text,
+    p_program text default null,
+    p_cohort text default null,
+    p_archived int default 0,
+    p_limit int default 200
+) returns setof students
+language sql stable as $$
+    with t as (
+        select
+            lower(unaccent(q)) as needle,
+            (select string_agg(quote_literal(w) || ':*', ' & ')
+             from regexp_split_to_table(lower(unaccent(q)), '[^[:alnum:]]+') w
+             where w <> '') as tsq
+    )
+    select s.*
+    from students s, t
+    where (
+            (t.tsq is not null and s.search_tsv @@ to_tsquery('simple', t.tsq))
+            or s.search_text like '%' || replace(replace(t.needle, '%', '\%'), '_', '\_') || '%'
+          )
+      and (p_program is null or s.program = p_program)
+      and (p_cohort is null or s.cohort = p_cohort)
+      and (p_archived is null or coalesce(s.is_archived, 0) = p_archived)
+    order by
+        ts_rank(s.search_tsv, to_tsquery('simple', coalesce(t.tsq, ''))) desc,
+        similarity(s.search_text, t.needle) desc,
+        s.matrix_number
+    limit p_limit
+$$;
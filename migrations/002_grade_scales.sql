@@ -0,0 +1,15 @@
+-- Per program/cohort grade scales (used by grading.py via database.get_grade_scales)
+-- program/cohort NULL = applies to every program/cohort. Run in the Supabase SQL Editor.
+
+create table if not exists grade_scales (
+    scale_id bigint generated always as identity primary key,
+    program text,
+    cohort text,
+    boundaries numeric[] not null,  -- ascending lower bounds, e.g. {40,44,47,50,55,60,65,70,75,80}
+    labels text[] not null,         -- lowest band first, one more than boundaries
+    updated_at timestamptz not null default now(),
+    constraint grade_scales_shape check (cardinality(labels) = cardinality(boundaries) + 1)
+);
+
+create unique index if not exists idx_grade_scales_scope
+    on grade_scales (coalesce(program, ''), coalesce(cohort, ''));
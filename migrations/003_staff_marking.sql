@@ -0,0 +1,42 @@
+-- Staff marking portal: only this staff member's students, with role flags per subject
+-- (used by database.get_students_for_marking). Run in the Supabase SQL Editor.
+
+create index if not exists idx_students_fyp_sv_id on students (fyp_sv_id);
+create index if not exists idx_students_li_sv_id on students (li_sv_id);
+create index if not exists idx_students_fyp1_panel_id on students (fyp1_panel_id);
+create index if not exists idx_students_fyp2_panel_id on students (fyp2_panel_id);
+
+create or replace function students_for_marking(p_staff_id bigint, p_program text default null)
+returns table (
+    matrix_number text,
+    name text,
+    program text,
+    cohort text,
+    email text,
+    fyp_title text,
+    fyp1_marks numeric,
+    fyp2_marks numeric,
+    li_marks numeric,
+    is_fyp1_sv boolean,
+    is_fyp1_panel boolean,
+    is_fyp2_sv boolean,
+    is_fyp2_panel boolean,
+    is_li_sv boolean
+)
+language sql stable as $$
+    select
+        s.matrix_number::text, s.name::text, s.program::text, s.cohort::text, s.email::text, s.fyp_title::text,
+        s.fyp1_marks::numeric, s.fyp2_marks::numeric, s.li_marks::numeric,
+        coalesce(s.fyp_sv_id = p_staff_id, false),      -- one FYP SV covers FYP 1 and FYP 2
+        coalesce(s.fyp1_panel_id = p_staff_id, false),
+        coalesce(s.fyp_sv_id = p_staff_id, false),
+        coalesce(s.fyp2_panel_id = p_staff_id, false),
+        coalesce(s.li_sv_id = p_staff_id, false)
+    from students s
+    where (s.fyp_sv_id = p_staff_id
+           or s.li_sv_id = p_staff_id
+           or s.fyp1_panel_id = p_staff_id
+           or s.fyp2_panel_id = p_staff_id)
+      and (p_program is null or s.program = p_program)
+    order by s.matrix_number
+$$;
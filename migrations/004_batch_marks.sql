@@ -0,0 +1,36 @@
+-- Batched mark saving for the staff marking portal (database.save_marks_batch).
+-- p_rows: [{"matrix_number": "...", "fyp1_marks": 71.5, "li_marks": null}, ...]
+-- Only the mark keys present in each object are written; every written column gets
+-- one audit_logs row (old value read from the same snapshot). Run in the Supabase SQL Editor.
+
+create or replace function save_marks_batch(p_rows jsonb, p_changed_by text default 'Staff')
+returns table (matrix_number text, ok boolean, message text)
+language sql as $$
+    with input as (
+        select distinct on (r->>'matrix_number') r->>'matrix_number' as matrix, r - 'matrix_number' as patch
+        from jsonb_array_elements(p_rows) r
+    ),
+    before as (
+        select s.matrix_number, s.fyp1_marks, s.fyp2_marks, s.li_marks
+        from students s join input i on s.matrix_number = i.matrix
+    ),
+    updated as (
+        update students s set
+            fyp1_marks = case when i.patch ? 'fyp1_marks' then round((i.patch->>'fyp1_marks')::numeric, 2) else s.fyp1_marks end,
+            fyp2_marks = case when i.patch ? 'fyp2_marks' then round((i.patch->>'fyp2_marks')::numeric, 2) else s.fyp2_marks end,
+            li_marks = case when i.patch ? 'li_marks' then round((i.patch->>'li_marks')::numeric, 2) else s.li_marks end
+        from input i
+        where s.matrix_number = i.matrix
+        returning s.matrix_number::text as matrix
+    ),
+    logged as (
+        insert into audit_logs (matrix_no, field_changed, old_value, new_value, changed_by, "timestamp")
+        select i.matrix, f.key, coalesce(to_jsonb(b) ->> f.key, ''), coalesce(f.value #>> '{}', ''), p_changed_by, now()
+        from input i
+        join before b on b.matrix_number = i.matrix
+        cross join lateral jsonb_each(i.patch) f
+        where f.key in ('fyp1_marks', 'fyp2_marks', 'li_marks')
+    )
+    select i.matrix, u.matrix is not null, case when u.matrix is null then 'Student not found' else 'Saved' end
+    from input i left join updated u on u.matrix = i.matrix
+$$;
@@ -0,0 +1,125 @@
+-- Optimistic concurrency for students (database._conditional_update / save_marks_batch).
+-- Every UPDATE that changes a row bumps row_version. Writers send the version they
+-- loaded: if it still matches the write applies as is; otherwise each column is applied
+-- only if its current value is still the one they loaded, so edits to unrelated
+-- columns never conflict. Run in the Supabase SQL Editor after 003/004.
+
+alter table students add column if not exists row_version bigint not null default 1;
+
+create or replace function students_bump_version() returns trigger
+language plpgsql as $$
+begin
+    if row(new.*) is distinct from row(old.*) then
+        new.row_version := old.row_version + 1;
+    end if;
+    return new;
+end $$;
+
+drop trigger if exists students_bump_version on students;
+create trigger students_bump_version before update on students
+for each row execute function students_bump_version();
+
+-- Marking roster now carries row_version (return type changes, so drop first)
+drop function if exists students_for_marking(bigint, text);
+create function students_for_marking(p_staff_id bigint, p_program text default null)
+returns table (
+    matrix_number text,
+    name text,
+    program text,
+    cohort text,
+    email text,
+    fyp_title text,
+    fyp1_marks numeric,
+    fyp2_marks numeric,
+    li_marks numeric,
+    row_version bigint,
+    is_fyp1_sv boolean,
+    is_fyp1_panel boolean,
+    is_fyp2_sv boolean,
+    is_fyp2_panel boolean,
+    is_li_sv boolean
+)
+language sql stable as $$
+    select
+        s.matrix_number::text, s.name::text, s.program::text, s.cohort::text, s.email::text, s.fyp_title::text,
+        s.fyp1_marks::numeric, s.fyp2_marks::numeric, s.li_marks::numeric, s.row_version,
+        coalesce(s.fyp_sv_id = p_staff_id, false),      -- one FYP SV covers FYP 1 and FYP 2
+        coalesce(s.fyp1_panel_id = p_staff_id, false),
+        coalesce(s.fyp_sv_id = p_staff_id, false),
+        coalesce(s.fyp2_panel_id = p_staff_id, false),
+        coalesce(s.li_sv_id = p_staff_id, false)
+    from students s
+    where (s.fyp_sv_id = p_staff_id
+           or s.li_sv_id = p_staff_id
+           or s.fyp1_panel_id = p_staff_id
+           or s.fyp2_panel_id = p_staff_id)
+      and (p_program is null or s.program = p_program)
+    order by s.matrix_number
+$$;
+
+-- Conditional batched mark saving.
+-- p_rows: [{"matrix_number": "...", "row_version": 7, "expected": {"fyp1_marks": 60}, "fyp1_marks": 71.5}, ...]
+-- A column conflicts when the row moved past row_version AND that column no longer holds
+-- its expected value; conflicting columns are skipped and reported, the rest are saved.
+drop function if exists save_marks_batch(jsonb, text);
+create function save_marks_batch(p_rows jsonb, p_changed_by text default 'Staff')
+returns table (matrix_number text, ok boolean, message text, row_version bigint)
+language plpgsql as $$
+begin
+    -- Lock first so the checks below and the update see the same row versions
+    perform 1 from students s
+    where s.matrix_number in (select r->>'matrix_number' from jsonb_array_elements(p_rows) r)
+    order by s.matrix_number
+    for update;
+
+    return query
+    with input as (
+        select distinct on (r->>'matrix_number')
+            r->>'matrix_number' as matrix,
+            (r->>'row_version')::bigint as base_version,
+            coalesce(r->'expected', '{}'::jsonb) as expected,
+            r - 'matrix_number' - 'row_version' - 'expected' as patch
+        from jsonb_array_elements(p_rows) r
+    ),
+    cols as (
+        select i.matrix, f.key as col, f.value as new_value, to_jsonb(s) ->> f.key as current,
+            coalesce(i.base_version = s.row_version
+                     or not (i.expected ? f.key)
+                     or (to_jsonb(s) ->> f.key)::numeric is not distinct from (i.expected ->> f.key)::numeric, false) as applies
+        from input i
+        join students s on s.matrix_number = i.matrix
+        cross join lateral jsonb_each(i.patch) f
+        where f.key in ('fyp1_marks', 'fyp2_marks', 'li_marks')
+    ),
+    applied as (
+        select c.matrix, jsonb_object_agg(c.col, c.new_value) as patch from cols c where c.applies group by c.matrix
+    ),
+    updated as (
+        update students s set
+            fyp1_marks = case when a.patch ? 'fyp1_marks' then round((a.patch->>'fyp1_marks')::numeric, 2) else s.fyp1_marks end,
+            fyp2_marks = case when a.patch ? 'fyp2_marks' then round((a.patch->>'fyp2_marks')::numeric, 2) else s.fyp2_marks end,
+            li_marks = case when a.patch ? 'li_marks' then round((a.patch->>'li_marks')::numeric, 2) else s.li_marks end
+        from applied a
+        where s.matrix_number = a.matrix
+        returning s.matrix_number::text as matrix, s.row_version as version
+    ),
+    logged as (
+        insert into audit_logs (matrix_no, field_changed, old_value, new_value, changed_by, "timestamp")
+        select c.matrix, c.col, coalesce(c.current, ''), coalesce(c.new_value #>> '{}', ''), p_changed_by, now()
+        from cols c where c.applies
+    )
+    select
+        i.matrix,
+        s.matrix_number is not null and k.conflicts is null,
+        case when s.matrix_number is null then 'Student not found'
+             when k.conflicts is not null then 'Conflict: changed by someone else (' || k.conflicts || ')'
+             else 'Saved' end,
+        coalesce(u.version, s.row_version)
+    from input i
+    left join students s on s.matrix_number = i.matrix
+    left join updated u on u.matrix = i.matrix
+    left join lateral (
+        select string_agg(c.col || ' is now ' || coalesce(c.current, 'blank'), ', ') as conflicts
+        from cols c where c.matrix = i.matrix and not c.applies
+    ) k on true;
+end $$;
@@ -0,0 +1,21 @@
+-- Delta sync watermark for the roster cache (database.get_students_watermark /
+-- get_students_changed_since). Every change to a student row stamps updated_at.
+-- Run in the Supabase SQL Editor.
+
+alter table students add column if not exists updated_at timestamptz not null default now();
+
+create or replace function students_touch_updated_at() returns trigger
+language plpgsql as $$
+begin
+    if row(new.*) is distinct from row(old.*) then
+        new.updated_at := now();
+    end if;
+    return new;
+end $$;
+
+drop trigger if exists students_touch_updated_at on students;
+create trigger students_touch_updated_at before update on students
+for each row execute function students_touch_updated_at();
+
+-- "Anything newer than X?" and "latest change" are both index scans
+create index if not exists idx_students_updated_at on students (updated_at);
@@ -0,0 +1,8 @@
+-- Realtime change feed for the shared roster cache (change_feed.SupabaseRealtimeSource).
+-- Run in the Supabase SQL Editor. The key used by the app needs SELECT on these tables
+-- (RLS) to receive their changes.
+
+alter publication supabase_realtime add table students, companies, staff;
+
+-- DELETE events carry the old matrix_number (default replica identity only sends the PK)
+alter table students replica identity full;
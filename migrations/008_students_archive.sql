@@ -0,0 +1,114 @@
+-- Archived students live in their own table, so active-roster reads (dashboard,
+-- delta sync, marking, search) only ever touch active rows.
+-- Used by database.archive_students_by_cohort / unarchive_students_by_cohort /
+-- delete_student / get_archived_students. Run in the Supabase SQL Editor after 001-007.
+
+-- Same columns, in the same order, as students: rows move with "insert ... select *" and
+-- search_students returns both as setof students. Columns added to students later must be
+-- added here too. Give the app's key the same access (RLS policies) as on students.
+create table if not exists students_archive (like students including defaults including constraints including indexes);
+
+-- (updated_at and search indexes come along with "including indexes")
+create index if not exists idx_students_archive_cohort on students_archive (cohort);
+create index if not exists idx_students_cohort on students (cohort);
+-- Rows flagged mid-move (archive_students), or by clients that still only set the flag
+create index if not exists idx_students_archived on students (is_archived) where coalesce(is_archived, 0) <> 0;
+
+-- Move rows between the tables. The flag is flipped while the row is still in
+-- students, so the updated_at trigger (006) stamps the move and the roster cache's
+-- delta sync (both tables, see get_students_changed_since) picks it up.
+create or replace function archive_students(p_cohort text default null, p_matrix text default null)
+returns int
+language plpgsql as $$
+declare
+    moved int;
+begin
+    if p_cohort is null and p_matrix is null then
+        raise exception 'archive_students needs a cohort or a matrix number';
+    end if;
+
+    update students set is_archived = 1
+    where (p_cohort is null or cohort = p_cohort)
+      and (p_matrix is null or matrix_number = p_matrix);
+
+    -- An older archived copy of a re-registered student is replaced by the newer row
+    delete from students_archive a
+    using students s
+    where a.matrix_number = s.matrix_number and s.is_archived = 1
+      and (p_cohort is null or s.cohort = p_cohort)
+      and (p_matrix is null or s.matrix_number = p_matrix);
+
+    with gone as (
+        delete from students
+        where is_archived = 1
+          and (p_cohort is null or cohort = p_cohort)
+          and (p_matrix is null or matrix_number = p_matrix)
+        returning *
+    )
+    insert into students_archive select * from gone;
+    get diagnostics moved = row_count;
+    return moved;
+end $$;
+
+-- Matrix numbers re-registered as active since archiving stay in the archive
+-- (returned as skipped) instead of overwriting the active row.
+create or replace function unarchive_students(p_cohort text)
+returns table (restored int, skipped int)
+language plpgsql as $$
+begin
+    with back as (
+        delete from students_archive a
+        where a.cohort = p_cohort
+          and not exists (select 1 from students s where s.matrix_number = a.matrix_number)
+        returning *
+    )
+    insert into students select * from back;
+    get diagnostics restored = row_count;
+
+    update students set is_archived = 0 where cohort = p_cohort and is_archived = 1;
+
+    select count(*)::int into skipped from students_archive where cohort = p_cohort;
+    return next;
+end $$;
+
+-- Move everything already flagged as archived
+with gone as (
+    delete from students where coalesce(is_archived, 0) <> 0 returning *
+)
+insert into students_archive select * from gone;
+
+-- p_archived: 0 = active (students), 1 = archived (students_archive), null = both.
+create or replace function search_students(
+    q text,
+    p_program text default null,
+    p_cohort text default null,
+    p_archived int default 0,
+    p_limit int default 200
+) returns setof students
+language sql stable as $$
+    with t as (
+        select
+            lower(unaccent(q)) as needle,
+            (select string_agg(quote_literal(w) || ':*', ' & ')
+             from regexp_split_to_table(lower(unaccent(q)), '[^[:alnum:]]+') w
+             where w <> '') as tsq
+    ),
+    pool as (
+        select * from students where p_archived is null or p_archived = 0
+        union all
+        select * from students_archive where p_archived is null or p_archived = 1
+    )
+    select s.*
+    from pool s, t
+    where (
+            (t.tsq is not null and s.search_tsv @@ to_tsquery('simple', t.tsq))
+            or s.search_text like '%' || replace(replace(t.needle, '%', '\%'), '_', '\_') || '%'
+          )
+      and (p_program is null or s.program = p_program)
+      and (p_cohort is null or s.cohort = p_cohort)
+    order by
+        ts_rank(s.search_tsv, to_tsquery('simple', coalesce(t.tsq, ''))) desc,
+        similarity(s.search_text, t.needle) desc,
+        s.matrix_number
+    limit p_limit
+$$;
@@ -0,0 +1,14 @@
+-- Dashboard sidebar option lists without downloading the roster
+-- (database.get_filter_options). Run in the Supabase SQL Editor.
+
+create index if not exists idx_students_program_cohort on students (program, cohort);
+create index if not exists idx_students_fyp_company on students (fyp_company_id);
+create index if not exists idx_students_li_company on students (li_company_id);
+create index if not exists idx_companies_state on companies (state);
+
+-- Distinct (program, cohort) pairs of the active roster: an index-only scan
+create or replace function student_filter_options()
+returns table (program text, cohort text)
+language sql stable as $$
+    select distinct s.program::text, s.cohort::text from students s
+$$;
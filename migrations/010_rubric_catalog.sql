@@ -0,0 +1,12 @@
+-- Rubric Manager listing without downloading every rubric row
+-- (database.get_rubric_catalog / get_rubric_page). Run in the Supabase SQL Editor.
+
+-- One page of a subject (optionally one cohort), in listing order: an index range scan
+create index if not exists idx_rubrics_listing on rubrics (subject, cohort desc, item_name, rubric_id);
+
+-- Rubric count per (subject, cohort)
+create or replace function rubric_catalog()
+returns table (subject text, cohort text, n int)
+language sql stable as $$
+    select r.subject::text, r.cohort::text, count(*)::int from rubrics r group by 1, 2
+$$;
@@ -0,0 +1,13 @@
+-- Password recovery without lockout (database._start_reset / _verify_login).
+-- A reset stores a hashed temporary password and its expiry next to the current
+-- password; it becomes the password only when it is first used to log in, and a
+-- login with the current password clears it. Run in the Supabase SQL Editor after 008.
+
+alter table staff add column if not exists reset_password text;
+alter table staff add column if not exists reset_expires_at timestamptz;
+
+-- students_archive mirrors students column for column (008 moves rows with "select *")
+alter table students add column if not exists reset_password text;
+alter table students add column if not exists reset_expires_at timestamptz;
+alter table students_archive add column if not exists reset_password text;
+alter table students_archive add column if not exists reset_expires_at timestamptz;
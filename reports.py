@@ -0,0 +1,138 @@
+import io
+import multiprocessing
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from grading import assign_grades, grade_order
+
+# ===========================
+# SEMESTER REPORTS
+# ===========================
+# End-of-semester mark sheets, one workbook per (program, cohort, subject).
+# The roster is partitioned in the parent; each partition is rendered to XLSX
+# bytes in a worker process and written into one zip as results come back, so
+# the archive grows while other workbooks are still being rendered.
+
+# Subject -> columns of its mark sheet (roster column, sheet header)
+REPORT_SUBJECTS = {
+    "FYP 1": {"mark": "FYP 1 Marks", "columns": [("FYP 1 SV", "Supervisor"), ("FYP 1 Panel", "Panel"), ("FYP_Company", "Company"), ("FYP Title", "FYP Title")]},
+    "FYP 2": {"mark": "FYP 2 Marks", "columns": [("FYP 2 SV", "Supervisor"), ("FYP 2 Panel", "Panel"), ("FYP_Company", "Company"), ("FYP Title", "FYP Title")]},
+    "LI": {"mark": "LI Marks", "columns": [("LI Uni SV", "Uni Supervisor"), ("LI Industry SV", "Industry Supervisor"), ("LI_Company", "Company")]},
+}
+
+REPORT_WORKERS = int(os.environ.get("WBL_REPORT_WORKERS", 0)) or None # None = one per CPU
+
+
+def _slug(val):
+    return re.sub(r"[^\w.-]+", "_", str(val)).strip("_") or "NA"
+
+
+def report_name(program, cohort, subject):
+    """Archive member for one report, e.g. 'BEB/2024/BEB_2024_FYP_1.xlsx'."""
+    p, c, s = _slug(program), _slug(cohort), _slug(subject)
+    return f"{p}/{c}/{p}_{c}_{s}.xlsx"
+
+
+def partition_roster(roster, subjects=None):
+    """
+    One job per (program, cohort, subject): (program, cohort, subject, rows), where
+    rows holds only the columns that subject's sheet needs (keeps worker payloads small).
+    """
+    subjects = subjects or list(REPORT_SUBJECTS)
+    keys = roster[["Program", "Cohort"]].fillna("-").astype(str)
+    groups = keys.groupby(["Program", "Cohort"], sort=True).indices
+    jobs = []
+    for (program, cohort), pos in groups.items():
+        part = roster.iloc[pos]
+        for subject in subjects:
+            spec = REPORT_SUBJECTS[subject]
+            cols = ["Matrix_No", "Student_Name", spec["mark"]] + [c for c, _ in spec["columns"]]
+            rows = pd.DataFrame({c: part[c].to_numpy() if c in part.columns else None for c in cols})
+            jobs.append((program, cohort, subject, rows))
+    return jobs
+
+
+def render_report(program, cohort, subject, rows, scales=None):
+    """One mark sheet workbook as bytes: 'Marks' (per student) + 'Summary' (grade distribution chart)."""
+    from openpyxl import Workbook # imported on use, not at app startup
+    from openpyxl.chart import BarChart, Reference
+    spec = REPORT_SUBJECTS[subject]
+    marks = pd.to_numeric(rows[spec["mark"]], errors="coerce")
+    grades = assign_grades(marks, [program] * len(rows), [cohort] * len(rows), scales)
+    order = np.argsort(rows["Matrix_No"].astype(str).to_numpy(), kind="stable")
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Marks")
+    ws.append([f"{subject} Mark Sheet — {program} / {cohort}"])
+    ws.append(["No.", "Matrix Number", "Student Name"] + [h for _, h in spec["columns"]] + ["Marks", "Grade"])
+    extra = [rows[c].to_numpy() for c, _ in spec["columns"]]
+    mark_vals = marks.to_numpy()
+    for n, i in enumerate(order, start=1):
+        mark = None if np.isnan(mark_vals[i]) else float(mark_vals[i])
+        ws.append([n, rows["Matrix_No"].iat[i], rows["Student_Name"].iat[i]]
+                  + [None if pd.isna(col[i]) or col[i] == "-" else col[i] for col in extra]
+                  + [mark, grades[i]])
+
+    graded = mark_vals[mark_vals > 0]
+    labels = grade_order(scales)
+    counts = pd.Series(grades[mark_vals > 0]).value_counts()
+    summary_rows = [
+        ["Students", len(rows)],
+        ["Graded", len(graded)],
+        ["Grading Progress (%)", round(len(graded) / len(rows) * 100, 1) if len(rows) else 0.0],
+        ["Average Marks", round(float(graded.mean()), 2) if len(graded) else 0.0],
+        [],
+        ["Grade Range", "Count"],
+    ]
+    header = len(summary_rows) # sheet row of the grade table header (write-only sheets have no max_row)
+    summary_rows += [[label, int(counts.get(label, 0))] for label in labels]
+    summary = wb.create_sheet("Summary")
+    for row in summary_rows:
+        summary.append(row)
+
+    chart = BarChart()
+    chart.title = f"Grade Distribution — {subject}"
+    chart.y_axis.title = "Students"
+    chart.legend = None
+    chart.add_data(Reference(summary, min_col=2, min_row=header, max_row=header + len(labels)), titles_from_data=True)
+    chart.set_categories(Reference(summary, min_col=1, min_row=header + 1, max_row=header + len(labels)))
+    summary.add_chart(chart, "D2")
+
+    buf = io.BytesIO()
+    wb.save(buf)
+    return report_name(program, cohort, subject), buf.getvalue()
+
+
+def _render_job(job, scales):
+    return render_report(*job, scales=scales)
+
+
+def generate_reports(roster, path, scales=None, subjects=None, workers=REPORT_WORKERS, progress=None):
+    """
+    Render every (program, cohort, subject) mark sheet into one zip at path.
+    workers: process count (1 = render in this process). progress(done, total, name)
+    is called in this process as each report is written. Returns the report count.
+    """
+    jobs = partition_roster(roster, subjects)
+    total = len(jobs)
+    # XLSX is already deflated; store members as-is
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED) as archive:
+        if workers == 1 or total <= 1:
+            results = (_render_job(job, scales) for job in jobs)
+            for done, (name, data) in enumerate(results, start=1):
+                archive.writestr(name, data)
+                if progress: progress(done, total, name)
+        else:
+            # spawn: the Streamlit server runs threads (mail worker, change feed), which fork doesn't copy safely
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                futures = [pool.submit(_render_job, job, scales) for job in jobs]
+                for done, future in enumerate(as_completed(futures), start=1):
+                    name, data = future.result()
+                    archive.writestr(name, data)
+                    if progress: progress(done, total, name)
+    return total
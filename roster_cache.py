@@ -0,0 +1,269 @@
+import queue
+import threading
+import time
+
+import pandas as pd
+
+# ===========================
+# SHARED ROSTER SNAPSHOT
+# ===========================
+# One process-wide copy of the resolved roster (and the dropdown lookups) shared
+# by every session, instead of each rerun refetching students/companies/staff.
+# Each refresh bumps `version`, which the dashboard uses as its cache key for
+# indexes and analytics. database.py write functions invalidate it.
+#
+# With a probe/delta_loader (students.updated_at watermark), a stale snapshot is
+# first checked with one tiny query and, if rows changed, patched with only those
+# rows; a full reload is the fallback (first load, deletions, lookup changes).
+# A change feed (change_feed.py) can also push row patches via apply_changes().
+# With a store (roster_store.py), a new process starts from the last saved snapshot
+# and reconciles it in the background. Writes to the store go through one writer
+# thread, in the order the snapshots were installed, so an older snapshot never
+# lands on disk after a newer one.
+
+
+def roster_watermark(df):
+    """Latest updated_at in a roster frame (UTC Timestamp), None if not tracked."""
+    if df is None or df.empty or "updated_at" not in df.columns:
+        return None
+    latest = pd.to_datetime(df["updated_at"], utc=True, errors="coerce").max()
+    return None if pd.isna(latest) else latest
+
+
+def merge_rows(df, changed, include_archived=False, key="Matrix_No"):
+    """Replace/add `changed` rows in df by key, drop newly archived ones, keep key order."""
+    if changed is None or changed.empty:
+        return df
+    merged = pd.concat([df[~df[key].isin(changed[key])], changed], ignore_index=True)
+    if not include_archived and "is_archived" in merged.columns:
+        merged = merged[merged["is_archived"] == 0]
+    return merged.sort_values(key, kind="stable").reset_index(drop=True)
+
+
+class RosterSnapshot:
+    def __init__(self, df, version, fetched_at, watermark=None, saved_at=None):
+        self.df = df
+        self.version = version
+        self.fetched_at = fetched_at
+        self.watermark = watermark
+        self.saved_at = saved_at # set while serving the on-disk copy, until reconciled
+
+    @property
+    def age(self):
+        return time.time() - self.fetched_at
+
+    @property
+    def from_disk(self):
+        return self.saved_at is not None
+
+
+class RosterCache:
+    def __init__(self, loader, lookups_loader, ttl=300, probe=None, delta_loader=None, store=None):
+        """
+        loader(include_archived) -> roster DataFrame
+        lookups_loader() -> {'companies': {label: id}, 'staff': {label: id}}
+        probe(include_archived) -> (latest updated_at, row count)   [optional]
+        delta_loader(since) -> rows changed since the watermark, None on failure   [optional]
+        store: roster_store.SnapshotStore; the first get() of a scope is served from it
+               and reconciled in the background, and every sync is written back   [optional]
+        """
+        self._loader = loader
+        self._lookups_loader = lookups_loader
+        self._probe = probe
+        self._delta_loader = delta_loader
+        self._store = store
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._snapshots = {} # include_archived -> RosterSnapshot
+        self._disk_checked = set() # scopes already offered the on-disk snapshot
+        self._lookups = None
+        self._lookups_at = 0
+        self._version = 0
+        self._writes = queue.Queue() # (include_archived, snap, lookups) for the persist thread
+        if store is not None:
+            threading.Thread(target=self._writer, daemon=True, name="roster-persist").start()
+
+    @property
+    def version(self):
+        return self._version
+
+    def is_warm(self, include_archived=False):
+        """A snapshot is held or saved on disk (get() answers without a full fetch)."""
+        if include_archived in self._snapshots:
+            return True
+        return (self._store is not None and include_archived not in self._disk_checked
+                and self._store.exists(include_archived))
+
+    def get(self, include_archived=False):
+        """Current snapshot; refreshed when missing or older than ttl (one refresh at a time)."""
+        with self._lock:
+            snap = self._snapshots.get(include_archived)
+            if snap is None and include_archived not in self._disk_checked:
+                snap = self._from_disk(include_archived)
+            if snap is not None and (snap.from_disk or snap.age <= self._ttl):
+                return snap
+            if snap is not None:
+                refreshed = self._refresh(snap, include_archived)
+                if refreshed is not None:
+                    self._snapshots[include_archived] = refreshed
+                    if refreshed is not snap:
+                        self._persist(include_archived, refreshed)
+                    return refreshed
+
+            df = self._loader(include_archived)
+            self._version += 1
+            snap = RosterSnapshot(df, self._version, time.time(), roster_watermark(df))
+            if not df.empty: # Don't pin an empty result (e.g. a failed fetch)
+                self._snapshots[include_archived] = snap
+                self._persist(include_archived, snap)
+            return snap
+
+    def _synced_frame(self, snap, include_archived):
+        """
+        Probe + delta merge without touching the cache: (df, latest) where df is
+        snap.df itself when nothing changed; None means 'do a full reload'.
+        """
+        if self._probe is None or snap.watermark is None:
+            return None
+        try:
+            latest, count = self._probe(include_archived)
+        except Exception:
+            return None
+
+        if latest == snap.watermark and count == len(snap.df):
+            return snap.df, latest
+
+        if self._delta_loader is None:
+            return None
+        changed = self._delta_loader(snap.watermark)
+        if changed is None:
+            return None
+        df = merge_rows(snap.df, changed, include_archived)
+        if len(df) != count: # Rows were deleted (or the view moved in a way a delta can't show)
+            return None
+        return df, latest
+
+    def _refresh(self, snap, include_archived):
+        """Probe + delta merge; None means 'do a full reload'."""
+        synced = self._synced_frame(snap, include_archived)
+        if synced is None:
+            return None
+        df, latest = synced
+        # Nothing changed: keep the snapshot (and its version, so downstream caches stay warm)
+        if df is snap.df:
+            snap.fetched_at = time.time()
+            return snap
+
+        self._version += 1
+        return RosterSnapshot(df, self._version, time.time(), roster_watermark(df) or latest)
+
+    # ----- on-disk snapshot -----
+
+    def _from_disk(self, include_archived):
+        """Install the persisted snapshot for a scope (once per process) and start reconciling it."""
+        self._disk_checked.add(include_archived)
+        if self._store is None:
+            return None
+        stored = self._store.load(include_archived)
+        if stored is None:
+            return None
+        df, watermark, saved_at = stored
+        self._version += 1
+        snap = RosterSnapshot(df, self._version, 0, watermark or roster_watermark(df), saved_at=saved_at or 0)
+        self._snapshots[include_archived] = snap
+        if self._lookups is None:
+            self._lookups = self._store.load_lookups()
+            self._lookups_at = time.time() if self._lookups is not None else 0
+        threading.Thread(target=self._reconcile, args=(include_archived, snap), daemon=True, name="roster-reconcile").start()
+        return snap
+
+    def _reconcile(self, include_archived, snap):
+        """Background: bring a disk snapshot up to date (delta if possible) and swap it in."""
+        try:
+            synced = self._synced_frame(snap, include_archived)
+            df, latest = synced if synced is not None else (self._loader(include_archived), None)
+            lookups = self._lookups_loader()
+        except Exception:
+            df, latest, lookups = None, None, None
+
+        with self._lock:
+            if self._snapshots.get(include_archived) is not snap:
+                return # invalidated or patched meanwhile; those paths reload on their own
+            if lookups is not None:
+                self._lookups, self._lookups_at = lookups, time.time()
+                self._persist(lookups=lookups)
+            if df is None or df.empty:
+                # Couldn't sync: stop serving the disk copy, the next get() loads normally
+                del self._snapshots[include_archived]
+                return
+            self._version += 1
+            fresh = RosterSnapshot(df, self._version, time.time(), roster_watermark(df) or latest)
+            self._snapshots[include_archived] = fresh
+            self._persist(include_archived, fresh)
+
+    def _persist(self, include_archived=None, snap=None, lookups=None):
+        """Queue a snapshot and/or lookups for the store without blocking the caller."""
+        if self._store is not None:
+            self._writes.put((include_archived, snap, lookups))
+
+    def _writer(self):
+        """The single persist thread: writes queued snapshots in order."""
+        while True:
+            include_archived, snap, lookups = self._writes.get()
+            try:
+                if snap is not None:
+                    self._store.save(include_archived, snap.df, snap.watermark)
+                if lookups is not None:
+                    self._store.save_lookups(lookups)
+            except Exception:
+                pass # the disk copy is an optimisation; the live cache is unaffected
+            finally:
+                self._writes.task_done()
+
+    def flush(self):
+        """Wait until every queued write has reached the store."""
+        self._writes.join()
+
+    def apply_changes(self, changed, deleted=()):
+        """
+        Patch live snapshots with resolved changed rows and deleted matrix numbers
+        (change feed). Each patched snapshot gets a new version.
+        """
+        if (changed is None or changed.empty) and not deleted:
+            return
+        with self._lock:
+            for include_archived, snap in list(self._snapshots.items()):
+                if snap.from_disk:
+                    continue # the background reconcile syncs everything since the disk watermark
+                df = merge_rows(snap.df, changed, include_archived)
+                fetched_at = time.time()
+                if deleted and include_archived:
+                    # A row leaving 'students' may just have moved to the archive table:
+                    # keep it and let the next get() probe both tables
+                    fetched_at = 0
+                elif deleted:
+                    df = df[~df["Matrix_No"].isin(deleted)].reset_index(drop=True)
+                self._version += 1
+                self._snapshots[include_archived] = RosterSnapshot(df, self._version, fetched_at, roster_watermark(df) or snap.watermark)
+
+    def lookups(self):
+        with self._lock:
+            if self._lookups is None or time.time() - self._lookups_at > self._ttl:
+                self._lookups = self._lookups_loader()
+                self._lookups_at = time.time()
+                self._persist(lookups=self._lookups)
+            return self._lookups
+
+    def invalidate(self, table=None, *args, **kwargs):
+        """
+        Signature fits db.on_change listeners. Student writes only mark snapshots stale
+        (the next get() syncs the delta); company/staff writes change resolved names and
+        lookups, so everything is dropped.
+        """
+        with self._lock:
+            if table == "students" and self._probe is not None:
+                for snap in self._snapshots.values():
+                    snap.fetched_at = 0
+            else:
+                self._snapshots.clear()
+                self._lookups = None
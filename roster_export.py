@@ -0,0 +1,118 @@
+import csv
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from analytics import DOC_COLS, MARK_COLS, status_masks, classify_status
+from grading import assign_grades
+
+# ===========================
+# ROSTER EXPORT
+# ===========================
+# The dashboard's columns written out chunk by chunk: each chunk is derived
+# (Status, document flags, grades) and appended to the file before the next is
+# built, so memory stays at one chunk on top of the roster snapshot whatever the
+# roster size. Rows are the raw roster values, not the editor's icons/"-" fillers.
+
+CHUNK_ROWS = 5000
+
+# Editor-only columns, and stored password hashes, never leave the app
+SKIP_COLUMNS = {"Sync?", "Password"}
+# Dashboard column label -> roster column
+COLUMN_ALIASES = {"FYP Title": "FYP_Title"}
+NUMERIC_COLUMNS = set(MARK_COLS)
+
+FORMATS = {"CSV": ".csv", "Excel": ".xlsx", "Parquet": ".parquet"}
+
+
+def export_columns(visible_cols):
+    """Export header for the columns visible in a dashboard tab, with a grade after each mark."""
+    cols = []
+    for c in visible_cols:
+        if c in SKIP_COLUMNS:
+            continue
+        cols.append(c)
+        if c in MARK_COLS:
+            cols.append(c.replace("Marks", "Grade"))
+    return cols
+
+
+def _chunk_frame(rows, columns, start, scales):
+    """One chunk in export layout: derived columns filled, text as str/None, marks as floats."""
+    masks = status_masks(rows)
+    out = {}
+    for c in columns:
+        src = COLUMN_ALIASES.get(c, c)
+        if c == "No.":
+            out[c] = np.arange(start + 1, start + len(rows) + 1)
+        elif c == "Status":
+            out[c] = np.asarray(classify_status(masks), dtype=object)
+        elif c in DOC_COLS:
+            out[c] = np.where(masks[f"{c}_missing"], "Missing", "Submitted").astype(object)
+        elif c.endswith("Grade") and c.replace("Grade", "Marks") in MARK_COLS:
+            mark_col = c.replace("Grade", "Marks")
+            out[c] = assign_grades(rows.get(mark_col), rows.get("Program"), rows.get("Cohort"), scales)
+        elif c in NUMERIC_COLUMNS:
+            out[c] = pd.to_numeric(rows[src], errors="coerce").to_numpy(dtype=float) if src in rows else np.full(len(rows), np.nan)
+        elif src in rows:
+            text = rows[src].astype(str).to_numpy(dtype=object)
+            out[c] = np.where(rows[src].notna().to_numpy() & (text != ""), text, None)
+        else:
+            out[c] = np.full(len(rows), None, dtype=object)
+    return pd.DataFrame(out, columns=columns)
+
+
+def iter_chunks(rows, columns, scales=None, chunk_size=CHUNK_ROWS):
+    for start in range(0, len(rows), chunk_size):
+        yield _chunk_frame(rows.iloc[start:start + chunk_size], columns, start, scales)
+
+
+def _write_csv(chunks, path, columns):
+    # utf-8-sig so Excel opens names with accents correctly
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        csv.writer(f).writerow(columns)
+        for chunk in chunks:
+            chunk.to_csv(f, header=False, index=False)
+
+
+def _write_xlsx(chunks, path, columns):
+    from openpyxl import Workbook # only Excel exports need it; keeps app startup light
+    # Write-only workbook: rows are streamed to the zip, not kept as cell objects
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Roster")
+    ws.append(columns)
+    for chunk in chunks:
+        for row in chunk.astype(object).where(chunk.notna(), None).to_numpy().tolist():
+            ws.append(row)
+    wb.save(path)
+
+
+def _write_parquet(chunks, path, columns):
+    schema = pa.schema([
+        (c, pa.int64() if c == "No." else pa.float64() if c in NUMERIC_COLUMNS else pa.string())
+        for c in columns
+    ])
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+WRITERS = {".csv": _write_csv, ".xlsx": _write_xlsx, ".parquet": _write_parquet}
+
+
+def export_roster(rows, visible_cols, fmt, path=None, scales=None, chunk_size=CHUNK_ROWS):
+    """
+    Write roster rows in the given format (a FORMATS key). Without a path, a
+    temp file is created. Returns (path, row count).
+    """
+    suffix = FORMATS[fmt]
+    if path is None:
+        fd, path = tempfile.mkstemp(prefix="roster_", suffix=suffix)
+        os.close(fd)
+    columns = export_columns(visible_cols)
+    WRITERS[suffix](iter_chunks(rows, columns, scales, chunk_size), path, columns)
+    return path, len(rows)
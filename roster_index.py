@@ -0,0 +1,272 @@
+import re
+import unicodedata
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+# ===========================
+# ROSTER INDEXES
+# ===========================
+# Lookups built once per roster snapshot so that dashboard filters become
+# dictionary lookups instead of row-by-row scans on every rerun.
+
+# Role -> raw DB id columns (see database.get_students, which keeps them)
+STAFF_ROLE_COLUMNS = {
+    "SV": ["fyp_sv_id", "li_sv_id"],
+    "Panel": ["fyp1_panel_id", "fyp2_panel_id"],
+    "Industry SV": ["li_industry_sv_id"],
+}
+
+# Dashboard "Filter by Role" choices -> index roles
+DASHBOARD_ROLES = {
+    "Supervisor (SV)": ["SV", "Industry SV"],
+    "Panelist": ["Panel"],
+    "Both (Any)": ["SV", "Panel", "Industry SV"],
+}
+
+
+def roster_version(df, columns=None):
+    """Cheap content hash of a roster DataFrame, used as a cache key."""
+    if df is None or df.empty:
+        return "empty"
+    cols = [c for c in (columns or df.columns) if c in df.columns]
+    hashed = pd.util.hash_pandas_object(df[cols], index=True)
+    return f"{len(df)}-{int(hashed.sum()) & 0xFFFFFFFFFFFFFFFF:x}"
+
+
+def normalize_staff_id(val):
+    """Same normalization as database.safe_map: 22, 22.0 and '22' -> '22'."""
+    if val is None or (not isinstance(val, str) and pd.isna(val)) or val == "" or val == "-":
+        return None
+    return str(val).split('.')[0]
+
+
+class StaffIndex:
+    """
+    Inverted index: staff id -> rows (and matrix numbers) per role.
+    Rows are stored as DataFrame index labels of the snapshot it was built from.
+    """
+
+    def __init__(self, df):
+        self._rows = {role: {} for role in STAFF_ROLE_COLUMNS}
+        self._matrix = df["Matrix_No"] if "Matrix_No" in df.columns else pd.Series(dtype=object)
+
+        for role, cols in STAFF_ROLE_COLUMNS.items():
+            bucket = self._rows[role]
+            for col in cols:
+                if col not in df.columns:
+                    continue
+                keys = df[col].map(normalize_staff_id)
+                keys = keys[keys.notna()]
+                # groupby().indices gives {key: positions} in a single pass
+                for sid, pos in keys.groupby(keys).indices.items():
+                    labels = keys.index[pos]
+                    prev = bucket.get(sid)
+                    bucket[sid] = labels if prev is None else prev.union(labels)
+
+    def rows(self, staff_id, roles=None):
+        """Index labels of students held by staff_id in any of the given roles."""
+        sid = normalize_staff_id(staff_id)
+        out = pd.Index([])
+        if sid is None:
+            return out
+        for role in roles or STAFF_ROLE_COLUMNS:
+            labels = self._rows.get(role, {}).get(sid)
+            if labels is not None:
+                out = labels if out.empty else out.union(labels)
+        return out
+
+    def matrices(self, staff_id, roles=None):
+        """Set of matrix numbers held by staff_id in any of the given roles."""
+        return set(self._matrix.loc[self.rows(staff_id, roles)].tolist())
+
+    def select(self, df, staff_id, roles=None):
+        """Rows of df (a slice of the indexed snapshot) held by staff_id."""
+        return df[df.index.isin(self.rows(staff_id, roles))]
+
+    def students_per_staff(self, roles=None):
+        """Series {staff id: distinct student count} without rescanning the roster."""
+        counts = {}
+        for role in roles or STAFF_ROLE_COLUMNS:
+            for sid, labels in self._rows.get(role, {}).items():
+                counts[sid] = counts[sid].union(labels) if sid in counts else labels
+        return pd.Series({sid: len(labels) for sid, labels in counts.items()}, dtype=int).sort_values(ascending=False)
+
+
+# Searchable columns -> rank weight (a hit on the matrix number beats a title hit)
+SEARCH_FIELDS = {"Matrix_No": 4, "Student_Name": 3, "Email": 2, "FYP_Title": 1}
+
+# Match kinds, multiplied with the field weight
+EXACT, PREFIX, INFIX = 3, 2, 1
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+_EMPTY = np.array([], dtype=np.int32)
+
+
+def fold_text(val):
+    """Case-fold and strip diacritics: 'Nurul Aín' -> 'nurul ain'."""
+    if val is None or (not isinstance(val, str) and pd.isna(val)):
+        return ""
+    text = unicodedata.normalize("NFKD", str(val))
+    return "".join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+
+
+def tokenize(val):
+    return _TOKEN_RE.findall(fold_text(val))
+
+
+class SearchIndex:
+    """
+    Token index over a roster snapshot for the student search boxes.
+    - sorted vocabulary + bisect for prefix matches (narrows as the user types)
+    - trigram -> token ids for infix matches (e.g. tail of a matrix number); terms
+      shorter than a trigram scan the vocabulary instead
+    Every query term must match (AND); rows are ranked by field weight x match kind.
+    """
+
+    def __init__(self, df, fields=None):
+        fields = {c: w for c, w in (fields or SEARCH_FIELDS).items() if c in df.columns}
+        self.labels = df.index
+
+        postings = {} # token -> {row position: best field weight}
+        for col, weight in fields.items():
+            for pos, val in enumerate(df[col].tolist()):
+                for tok in set(tokenize(val)):
+                    hits = postings.setdefault(tok, {})
+                    if hits.get(pos, 0) < weight:
+                        hits[pos] = weight
+
+        self.vocab = sorted(postings)
+        self._pos = [np.fromiter(postings[t].keys(), dtype=np.int32) for t in self.vocab]
+        self._wt = [np.fromiter(postings[t].values(), dtype=np.int32) for t in self.vocab]
+
+        grams = {}
+        for tid, tok in enumerate(self.vocab):
+            for g in {tok[i:i + 3] for i in range(len(tok) - 2)}:
+                grams.setdefault(g, []).append(tid)
+        self._grams = {g: np.array(ids, dtype=np.int32) for g, ids in grams.items()}
+
+    def _term_tokens(self, term):
+        """Token id -> match kind for a single query term."""
+        lo = bisect_left(self.vocab, term)
+        hi = bisect_left(self.vocab, term + "\U0010ffff")
+        kinds = dict.fromkeys(range(lo, hi), PREFIX)
+        if lo < hi and self.vocab[lo] == term:
+            kinds[lo] = EXACT
+
+        if len(term) >= 3:
+            grams = sorted({term[i:i + 3] for i in range(len(term) - 2)}, key=lambda g: len(self._grams.get(g, _EMPTY)))
+            cand = self._grams.get(grams[0], _EMPTY)
+            for g in grams[1:]:
+                if not len(cand): break
+                cand = np.intersect1d(cand, self._grams.get(g, _EMPTY), assume_unique=True)
+            for tid in cand.tolist():
+                if tid not in kinds and term in self.vocab[tid]:
+                    kinds[tid] = INFIX
+        else:
+            # Too short for a trigram: scan the vocabulary ('li' in 'malik'), like str.contains did
+            for tid, tok in enumerate(self.vocab):
+                if tid not in kinds and term in tok:
+                    kinds[tid] = INFIX
+        return kinds
+
+    def _term_scores(self, term):
+        """(row positions, best score per row) for one term, sorted by position."""
+        kinds = list(self._term_tokens(term).items())
+        if not kinds:
+            return _EMPTY, _EMPTY
+        pos = np.concatenate([self._pos[t] for t, _ in kinds])
+        score = np.concatenate([self._wt[t] * k for t, k in kinds])
+        order = np.lexsort((-score, pos))
+        pos, score = pos[order], score[order]
+        first = np.r_[True, pos[1:] != pos[:-1]]
+        return pos[first], score[first]
+
+    def search(self, query, limit=None):
+        """Ranked row positions matching every term of query (all rows if query is blank)."""
+        terms = tokenize(query)
+        if not terms:
+            return np.arange(len(self.labels))
+
+        pos, score = self._term_scores(terms[0])
+        for term in terms[1:]:
+            if not len(pos): break
+            other_pos, other_score = self._term_scores(term)
+            pos, i1, i2 = np.intersect1d(pos, other_pos, assume_unique=True, return_indices=True)
+            score = score[i1] + other_score[i2]
+
+        ranked = pos[np.lexsort((pos, -score))]
+        return ranked[:limit] if limit else ranked
+
+    def select(self, df, query):
+        """Rows of df (a slice of the indexed snapshot) matching query, best match first."""
+        labels = self.labels[self.search(query)]
+        return df.loc[labels[labels.isin(df.index)]]
+
+
+# ===========================
+# ROW SELECTION (Sync? ticks)
+# ===========================
+
+def ticked_matrices(view_matrices, default, editor_pages, column="Sync?"):
+    """
+    Boolean mask over view_matrices for the `column` checkbox.
+    editor_pages: [(matrix numbers shown by an editor, its session state)].
+    Each editor's edited_rows (keyed by row position on that page) is read once and
+    mapped to matrix numbers; later pages/editors win, like the tab order.
+    """
+    overrides = {}
+    for matrices, state in editor_pages:
+        for pos, changes in (state or {}).get("edited_rows", {}).items():
+            pos = int(pos)
+            if column in changes and 0 <= pos < len(matrices):
+                overrides[matrices[pos]] = bool(changes[column])
+
+    ticked = np.full(len(view_matrices), bool(default))
+    if overrides:
+        keys = pd.Series(view_matrices)
+        hit = keys.isin(overrides.keys()).to_numpy()
+        ticked[hit] = keys[hit].map(overrides).to_numpy(dtype=bool)
+    return ticked
+
+
+def matrix_indexed(df):
+    """df keyed by Matrix_No (first row wins on duplicates) for O(1) source-row lookups."""
+    keyed = df.set_index("Matrix_No", drop=False)
+    return keyed[~keyed.index.duplicated(keep="first")]
+
+
+def resolve_selection(view_df, source_by_matrix, default, editor_pages):
+    """
+    (ticked matrix numbers, their source rows) for the rows shown in view_df.
+    source_by_matrix is matrix_indexed() of the unformatted roster.
+    """
+    view_matrices = view_df["Matrix_No"].to_numpy()
+    matrices = view_matrices[ticked_matrices(view_matrices, default, editor_pages)]
+    rows = source_by_matrix.loc[pd.Index(matrices).unique().intersection(source_by_matrix.index, sort=False)]
+    return set(matrices.tolist()), rows
+
+
+# ===========================
+# PAGINATION
+# ===========================
+
+def sort_for_editor(df, sort_by=None, descending=False):
+    """Stable sort for the paginated editor; numeric-looking columns sort as numbers ('-' last)."""
+    if not sort_by or sort_by not in df.columns:
+        return df
+    def key(col):
+        num = pd.to_numeric(col, errors="coerce")
+        return num if num.notna().any() else col.astype(str).str.casefold()
+    return df.sort_values(sort_by, ascending=not descending, key=key, kind="stable", na_position="last")
+
+
+def page_bounds(n_rows, page, page_size):
+    """(start, stop, n_pages) for a 1-based page; page_size None means a single page."""
+    if not page_size:
+        return 0, n_rows, 1
+    n_pages = max(1, -(-n_rows // page_size))
+    page = min(max(1, int(page)), n_pages)
+    start = (page - 1) * page_size
+    return start, min(start + page_size, n_rows), n_pages
@@ -0,0 +1,109 @@
+import json
+import os
+import tempfile
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# ===========================
+# ON-DISK ROSTER SNAPSHOT
+# ===========================
+# The resolved roster and the dropdown lookups, persisted after each sync so a
+# fresh process (deploy, container restart) can paint the dashboard from local
+# disk while RosterCache reconciles with Supabase in the background.
+# Rosters are uncompressed Arrow IPC files, read through a memory map.
+#
+# The files live in WBL_SNAPSHOT_DIR (default .cache/roster under the app's working
+# directory), created owner-only. They hold student personal data (names, emails,
+# marks), so keep that directory out of backups/images you share; credentials are
+# never written (SECRET_COLUMNS are dropped on save).
+
+SNAPSHOT_FORMAT = 2 # bump when the resolved roster layout changes; older files are ignored and removed
+SNAPSHOT_DIR = os.environ.get("WBL_SNAPSHOT_DIR", os.path.join(".cache", "roster"))
+SECRET_COLUMNS = ["Password", "reset_password", "reset_expires_at"]
+
+
+def _arrow_safe(df):
+    """Object columns Arrow can't type (mixed ints/strings) are stored as text."""
+    out = df.copy()
+    for col in out.columns[out.dtypes == object]:
+        try:
+            pa.array(out[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            out[col] = out[col].map(lambda v: v if v is None or (isinstance(v, float) and pd.isna(v)) else str(v))
+    return out
+
+
+def _atomic_write(path, write):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp_")
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+class SnapshotStore:
+    def __init__(self, path=SNAPSHOT_DIR):
+        self.path = path
+
+    def _roster_file(self, include_archived):
+        return os.path.join(self.path, f"roster_v{SNAPSHOT_FORMAT}_{'all' if include_archived else 'active'}.arrow")
+
+    def _lookups_file(self):
+        return os.path.join(self.path, f"lookups_v{SNAPSHOT_FORMAT}.json")
+
+    def _prepare_dir(self):
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+        # Earlier formats may still hold columns that are no longer written (passwords)
+        for name in os.listdir(self.path):
+            if name.startswith(("roster_v", "lookups_v")) and not name.startswith((f"roster_v{SNAPSHOT_FORMAT}_", f"lookups_v{SNAPSHOT_FORMAT}.")):
+                try: os.remove(os.path.join(self.path, name))
+                except OSError: pass
+
+    def save(self, include_archived, df, watermark=None):
+        """Write the roster without SECRET_COLUMNS; readers never see a partial file."""
+        self._prepare_dir()
+        meta = {"format": SNAPSHOT_FORMAT, "saved_at": time.time(),
+                "watermark": None if watermark is None else pd.Timestamp(watermark).isoformat()}
+        table = pa.Table.from_pandas(_arrow_safe(df.drop(columns=SECRET_COLUMNS, errors="ignore")), preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"wbl": json.dumps(meta).encode()})
+        _atomic_write(self._roster_file(include_archived),
+                      lambda tmp: feather.write_feather(table, tmp, compression="uncompressed"))
+
+    def save_lookups(self, lookups):
+        self._prepare_dir()
+        # JSON keys are labels; ids may be numpy ints
+        data = {name: {label: (v.item() if hasattr(v, "item") else v) for label, v in mapping.items()}
+                for name, mapping in lookups.items()}
+        def write(tmp):
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"format": SNAPSHOT_FORMAT, "lookups": data}, f)
+        _atomic_write(self._lookups_file(), write)
+
+    def exists(self, include_archived):
+        return os.path.exists(self._roster_file(include_archived))
+
+    def load(self, include_archived):
+        """(df, watermark, saved_at) from disk, or None if there is no usable snapshot."""
+        try:
+            table = feather.read_table(self._roster_file(include_archived), memory_map=True)
+            meta = json.loads((table.schema.metadata or {}).get(b"wbl", b"{}"))
+            if meta.get("format") != SNAPSHOT_FORMAT:
+                return None
+            watermark = pd.Timestamp(meta["watermark"]) if meta.get("watermark") else None
+            return table.to_pandas(), watermark, meta.get("saved_at")
+        except Exception:
+            return None
+
+    def load_lookups(self):
+        try:
+            with open(self._lookups_file(), encoding="utf-8") as f:
+                data = json.load(f)
+            return data["lookups"] if data.get("format") == SNAPSHOT_FORMAT else None
+        except Exception:
+            return None
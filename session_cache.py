@@ -0,0 +1,64 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# ===========================
+# SESSION IDENTITY CACHE
+# ===========================
+# Right after login the user's working set (assigned students, rubrics, cohort
+# config) is fetched on a shared background pool, so the first portal render finds
+# it ready and later reruns read it from the session instead of the backend.
+# Each entry remembers the data version it was fetched at and is refetched once
+# that version moves on (a write, a change-feed patch) or it is older than ttl.
+# Loaders run off the script thread, so their error messages are captured with the
+# value (capture) and shown by the page; a load that reported errors is retried.
+
+_prefetch_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="login-prefetch")
+
+
+class IdentityCache:
+    def __init__(self, user_id, loaders, version_fn=None, ttl=300, capture=None):
+        """
+        loaders: {name: (loader(), [tables it reads])}
+        version_fn(tables) -> hashable version of those tables (e.g. db.change_version)
+        capture(loader) -> (value, [error messages]) (e.g. db.collect_errors)
+        """
+        self.user_id = user_id
+        self._loaders = loaders
+        self._version_fn = version_fn or (lambda tables: None)
+        self._ttl = ttl
+        self._capture = capture or (lambda loader: (loader(), []))
+        self._lock = threading.Lock()
+        self._entries = {} # name -> (version, submitted_at, future)
+        self.prefetch()
+
+    def _version(self, name):
+        return self._version_fn(self._loaders[name][1])
+
+    def prefetch(self, names=None):
+        """(Re)start background loads; returns immediately."""
+        with self._lock:
+            for name in names or self._loaders:
+                self._entries[name] = (self._version(name), time.time(), _prefetch_pool.submit(self._capture, self._loaders[name][0]))
+
+    def _stale(self, name):
+        version, submitted_at, future = self._entries[name]
+        if future.done() and (future.exception() is not None or future.result()[1]):
+            return True
+        return version != self._version(name) or time.time() - submitted_at > self._ttl
+
+    def get(self, name, timeout=None):
+        """The prefetched value (waits if it is still loading)."""
+        if self._stale(name):
+            self.prefetch([name])
+        return self._entries[name][2].result(timeout)[0]
+
+    def errors(self, name):
+        """Error messages reported while loading the current value (shown on the script thread)."""
+        future = self._entries[name][2]
+        if not future.done() or future.exception() is not None:
+            return []
+        return future.result()[1]
+
+    def ready(self, name):
+        return self._entries[name][2].done()
@@ -1,37 +1,104 @@
+import logging
+import threading
+import time
 import streamlit as st
-try:
-    from supabase import create_client, Client
-except ImportError:
-    pass # Handle case where module isn't installed yet
 
-def get_supabase_client():
+logger = logging.getLogger(__name__)
+
+class SupabaseUnavailable(RuntimeError):
+    """The client can't be built (missing secrets, bad config)."""
+
+def get_supabase_credentials():
+    """(url, key) from Streamlit secrets, (None, None) if missing."""
+    url = key = None
+    # Try nested [supabase] section first (Standard)
+    if "supabase" in st.secrets:
+        url = st.secrets["supabase"]["url"]
+        key = st.secrets["supabase"]["key"]
+    # Fallback: Try flat keys (Common mistake fix)
+    elif "supabase_url" in st.secrets and "supabase_key" in st.secrets:
+        url = st.secrets["supabase_url"]
+        key = st.secrets["supabase_key"]
+    # Fallback: Try just 'url' and 'key' if user pasted JUST the contents
+    elif "url" in st.secrets and "key" in st.secrets:
+        url = st.secrets["url"]
+        key = st.secrets["key"]
+    # Consolidate and Sanitize
+    if url and key:
+         # AUTO-FIX: Remove hidden spaces and newlines!
+         url = url.strip().replace("\n", "").replace("\r", "")
+         key = key.strip().replace("\n", "").replace("\r", "")
+         return url, key
+    return None, None
+
+def create_supabase_client():
+    """
+    Builds the client or raises SupabaseUnavailable. No Streamlit output: this can
+    run on background threads (LazyClient); callers on the script thread report it.
+    """
     try:
-        # Try nested [supabase] section first (Standard)
-        if "supabase" in st.secrets:
-            url = st.secrets["supabase"]["url"]
-            key = st.secrets["supabase"]["key"]
-        # Fallback: Try flat keys (Common mistake fix)
-        elif "supabase_url" in st.secrets and "supabase_key" in st.secrets:
-            url = st.secrets["supabase_url"]
-            key = st.secrets["supabase_key"]
-        # Fallback: Try just 'url' and 'key' if user pasted JUST the contents
-        elif "url" in st.secrets and "key" in st.secrets:
-            url = st.secrets["url"]
-            key = st.secrets["key"]
-        # Consolidate and Sanitize
-        if url and key:
-             # AUTO-FIX: Remove hidden spaces and newlines!
-             url = url.strip().replace("\n", "").replace("\r", "")
-             key = key.strip().replace("\n", "").replace("\r", "")
-        else:
-            st.error("❌ Missing Secrets! Please add [supabase] section with url and key.")
-            return None
-            
+        url, key = get_supabase_credentials()
+    except Exception as e:
+        raise SupabaseUnavailable(f"Supabase secrets unreadable: {e}") from e
+    if not (url and key):
+        raise SupabaseUnavailable("Missing Secrets! Please add [supabase] section with url and key.")
+    try:
+        # Imported here: the supabase package is the slowest import of the app (~0.35 s),
+        # and pages that never reach the database shouldn't pay for it
+        from supabase import create_client
         return create_client(url, key)
     except Exception as e:
-        st.error(f"Supabase Init Error: {e}")
+        raise SupabaseUnavailable(f"Supabase Init Error: {e}") from e
+
+def get_supabase_client():
+    """Client for script-thread callers; shows the error and returns None if it can't be built."""
+    try:
+        return create_supabase_client()
+    except SupabaseUnavailable as e:
+        st.error(f"❌ {e}")
         return None
 
+class LazyClient:
+    """
+    Stand-in for a module-level client: built by factory on first use, then every
+    attribute is the real client's. Falsy while the client can't be built; a failed
+    build is logged once and kept for retry_after seconds (see `error`) instead of
+    re-running the factory on every use.
+    """
+    def __init__(self, factory=create_supabase_client, retry_after=60):
+        self._factory = factory
+        self._retry_after = retry_after
+        self._client = None
+        self._error = None
+        self._failed_at = 0
+        self._lock = threading.Lock()
+
+    @property
+    def error(self):
+        """Why the client couldn't be built (None if it was, or hasn't been tried)."""
+        return self._error
+
+    def get(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None and time.time() - self._failed_at >= self._retry_after:
+                    try:
+                        self._client, self._error = self._factory(), None
+                    except Exception as e:
+                        if self._error is None:
+                            logger.error("Supabase client unavailable: %s", e)
+                        self._error, self._failed_at = str(e), time.time()
+        return self._client
+
+    def __bool__(self):
+        return self.get() is not None
+
+    def __getattr__(self, name):
+        client = self.get()
+        if client is None:
+            raise SupabaseUnavailable(f"Supabase client unavailable: {self._error}")
+        return getattr(client, name)
+
 def test_connection():
     """Checks if Supabase is reachable."""
     client = get_supabase_client()
@@ -79,6 +146,15 @@ def get_signed_url(bucket_name, file_path, expires_in=3600):
         return data # If it returns the string directly
     except: return None
 
+def get_signed_urls(bucket_name, file_paths, expires_in=3600):
+    """{path: signed url} for many files in one request; files that can't be signed are left out."""
+    client = get_supabase_client()
+    if not client or not file_paths: return {}
+    try:
+        items = client.storage.from_(bucket_name).create_signed_urls(list(file_paths), expires_in)
+        return {i["path"]: i["signedURL"] for i in items if i.get("signedURL") and not i.get("error")}
+    except: return {}
+
 def delete_from_bucket(bucket_name, file_path):
     client = get_supabase_client()
     if client:
@@ -0,0 +1,37 @@
+import sys
+sys.path.append('.')
+
+import numpy as np
+import pandas as pd
+
+from analytics import status_masks, classify_status, doc_icons
+
+
+def _roster():
+    return pd.DataFrame({
+        "Lapor Diri": ["a.pdf", "", None, np.nan, "-", "b.pdf"],
+        "Aku Janji": ["a.pdf", "a.pdf", "a.pdf", "a.pdf", "a.pdf", "b.pdf"],
+        "FYP 1 Marks": [70.0, 70.0, 70.0, 70.0, 70.0, 0.0],
+        "FYP 2 Marks": [70.0, None, 70.0, 70.0, 70.0, None],
+        "LI Marks": ["70", "-", 70.0, 70.0, 70.0, ""],
+    })
+
+
+def test_empty_and_null_documents_are_missing():
+    masks = status_masks(_roster())
+    # '' and NULL/NaN mean nothing was uploaded; '-' is the placeholder for a missing column
+    assert masks["Lapor Diri_missing"].tolist() == [False, True, True, True, False, False]
+    assert masks["docs_missing"].tolist() == [False, True, True, True, False, False]
+    assert doc_icons(masks, "Lapor Diri").tolist() == ["✅", "❌", "❌", "❌", "✅", "✅"]
+
+
+def test_status_precedence_and_grading_masks():
+    masks = status_masks(_roster())
+    assert masks["graded"].tolist() == [True, False, True, True, True, False]
+    assert masks["grading_pending"].tolist() == [False, False, False, False, False, True] # 0 counts as no mark
+    assert list(classify_status(masks)) == ["Graded", "Incomplete", "Incomplete", "Incomplete", "Graded", "Ongoing"]
+
+
+def test_missing_document_columns_count_as_missing():
+    masks = status_masks(pd.DataFrame({"FYP 1 Marks": [50.0]}))
+    assert masks["docs_missing"].tolist() == [True]
@@ -0,0 +1,64 @@
+import sys
+sys.path.append('.')
+
+import pandas as pd
+import pytest
+
+import campaigns
+from mail_queue import MailQueue, QUEUED
+
+
+def _roster():
+    return pd.DataFrame({
+        "Matrix_No": ["B01", "B02", "B03", "B04"],
+        "Student_Name": ["Nurul", "Malik", "Lee", "Tan"],
+        "Email": ["nurul@uni.my", " malik@uni.my ", "-", "tan@uni.my"],
+        "Lapor Diri": ["", "a.pdf", None, "d.pdf"],
+        "Aku Janji": [None, "b.pdf", "", "e.pdf"],
+        "FYP 1 Marks": [None, 0, 50, 60],
+        "FYP 2 Marks": [None, 70, 50, 60],
+        "LI Marks": [None, 70, None, 60],
+        "fyp_sv_id": [7.0, 7.0, 8, 7],
+        "fyp1_panel_id": [None, 9, None, None],
+        "fyp2_panel_id": [None, None, None, None],
+        "li_sv_id": [None, None, 8, 8],
+    })
+
+
+STAFF = pd.DataFrame({
+    "staff_id": [7, 8, 9],
+    "staff_name": ["Dr A", "Dr B", "Dr C"],
+    "staff_email": ["a@uni.my", "b@uni.my", ""],
+})
+
+
+def test_missing_docs_picks_students_with_an_email():
+    out = campaigns.missing_docs_recipients(_roster())
+    assert out.to_dict("records") == [
+        {"email": "nurul@uni.my", "name": "Nurul", "matrix": "B01", "missing_docs": "Lapor Diri, Aku Janji"},
+    ] # B03 is missing both but has no address
+
+
+def test_staff_are_reminded_of_their_own_subjects():
+    out = campaigns.staff_ungraded_recipients(_roster(), STAFF).set_index("name")
+    # Dr A supervises B01 (no marks) and B02 (FYP 1 is 0); B04 is fully graded
+    assert out.loc["Dr A", "count"] == 2 and out.loc["Dr A", "students"] == "- Malik (B02)\n- Nurul (B01)"
+    # Dr B: B03's LI mark; Dr B is FYP SV for B03 too, but those marks are in
+    assert out.loc["Dr B", "students"] == "- Lee (B03)"
+    assert "Dr C" not in out.index # no email on file
+
+
+def test_templates_only_take_the_campaigns_fields():
+    campaigns.check_template("missing_docs", "Hi {name}", "{matrix}: {missing_docs}")
+    with pytest.raises(ValueError, match=r"\{count\}"):
+        campaigns.check_template("missing_docs", "{count} pending", "Hi {name}")
+
+
+def test_launch_queues_one_rendered_message_per_recipient(tmp_path):
+    queue = MailQueue(str(tmp_path / "outbox.db"))
+    recipients = campaigns.missing_docs_recipients(_roster())
+    campaign, n = campaigns.launch(queue, "missing_docs", recipients, "Pending: {missing_docs}", "Hello {name}")
+    assert n == 1 and campaign.startswith("missing_docs-")
+    assert queue.status_counts(campaign) == {QUEUED: 1}
+    row = queue._conn.execute("select to_addr, subject, body from outbox").fetchone()
+    assert row == ("nurul@uni.my", "Pending: Lapor Diri, Aku Janji", "Hello Nurul")
@@ -0,0 +1,75 @@
+import sys
+sys.path.append('.')
+
+import time
+
+import pandas as pd
+import pytest
+
+from change_feed import ChangeFeed, LocalChangeSource
+from roster_cache import RosterCache
+
+
+def _resolve(rows):
+    """Stand-in for database.resolve_student_rows: raw rows -> roster rows."""
+    return pd.DataFrame(rows).rename(columns={"matrix_number": "Matrix_No", "fyp1_marks": "FYP 1 Marks"}).assign(is_archived=0)
+
+
+@pytest.fixture
+def roster():
+    loads = []
+    def loader(include_archived):
+        loads.append(include_archived)
+        return _resolve([{"matrix_number": "B01", "fyp1_marks": 50.0}, {"matrix_number": "B02", "fyp1_marks": None}])
+    cache = RosterCache(loader, lambda: {"companies": {}, "staff": {}}, ttl=3600)
+    source = LocalChangeSource()
+    feed = ChangeFeed(cache, _resolve, batch_window=0.2).start()
+    source.subscribe(feed)
+    yield cache, source, loads
+    feed.stop()
+
+
+def _wait_for_version(cache, version, timeout=5):
+    end = time.time() + timeout
+    while cache.version == version and time.time() < end:
+        time.sleep(0.02)
+
+
+def test_events_patch_the_roster_in_one_batch(roster):
+    cache, source, loads = roster
+    before = cache.get()
+
+    source.publish("students", "INSERT", {"matrix_number": "B03", "fyp1_marks": 70.0})
+    source.publish("students", "UPDATE", {"matrix_number": "B01", "fyp1_marks": 65.0})
+    source.publish("students", "DELETE", old_record={"matrix_number": "B02"})
+    _wait_for_version(cache, before.version)
+
+    snap = cache.get()
+    assert snap.version == before.version + 1 # one burst, one bump
+    assert snap.df.set_index("Matrix_No")["FYP 1 Marks"].to_dict() == {"B01": 65.0, "B03": 70.0}
+    assert loads == [False] # patched in place, never refetched
+
+
+def test_latest_event_per_student_wins(roster):
+    cache, source, loads = roster
+    before = cache.get()
+
+    source.publish("students", "DELETE", old_record={"matrix_number": "B01"})
+    source.publish("students", "INSERT", {"matrix_number": "B01", "fyp1_marks": 80.0})
+    _wait_for_version(cache, before.version)
+
+    marks = cache.get().df.set_index("Matrix_No")["FYP 1 Marks"]
+    assert marks["B01"] == 80.0 and pd.isna(marks["B02"])
+    assert loads == [False]
+
+
+def test_company_change_reloads_the_roster(roster):
+    cache, source, loads = roster
+    cache.get()
+
+    source.publish("companies", "UPDATE", {"company_id": 1, "company_name": "Acme Sdn Bhd"})
+    end = time.time() + 5
+    while cache._snapshots and time.time() < end:
+        time.sleep(0.02)
+    cache.get()
+    assert loads == [False, False]
@@ -0,0 +1,38 @@
+import sys
+sys.path.append('.')
+
+import pandas as pd
+import pytest
+
+from grading import GradeScale, DEFAULT_SCALE, assign_grades, scales_from_frame, scale_for
+
+
+def test_a_boundary_mark_gets_the_band_it_opens():
+    # side="right": 80 is an A, 79.99 is still an A-
+    assert DEFAULT_SCALE.bin([80, 79.99, 75, 74.5, 40, 39.99, 0, 100]).tolist() == ["A", "A-", "A-", "B+", "D", "E", "E", "A"]
+
+
+def test_missing_and_blank_marks_get_no_grade():
+    assert DEFAULT_SCALE.bin([None, float("nan"), "-", "", 52]).tolist() == [None, None, None, None, "C"]
+
+
+def test_invalid_scales_are_refused():
+    with pytest.raises(ValueError):
+        GradeScale([50, 40], ["F", "P", "D"])
+    with pytest.raises(ValueError):
+        GradeScale([50], ["F", "P", "D"])
+
+
+def test_each_group_is_binned_with_its_own_scale():
+    scales = scales_from_frame(pd.DataFrame({
+        "program": ["BEB", None, "BEC"],
+        "cohort": [None, "2024", "2023"],
+        "boundaries": [[50], "40; 70", "oops"], # the BEC row is invalid and skipped
+        "labels": [["F", "P"], "F, P, D", ["F", "P"]],
+    }))
+    assert set(scales) == {("BEB", None), (None, "2024")}
+    assert scale_for("BEB", "2024", scales).name == "BEB" # program beats cohort
+    assert scale_for("BEC", "2023", scales) is DEFAULT_SCALE
+
+    grades = assign_grades([50, 70, 70, 80], programs=["BEB", "BEC", "BEB", None], cohorts=[None, "2024", "2024", "2022"], scales=scales)
+    assert grades.tolist() == ["P", "D", "P", "A"]
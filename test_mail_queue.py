@@ -0,0 +1,82 @@
+import sys
+sys.path.append('.')
+
+import socket
+
+import pytest
+
+from mail_queue import MailQueue, MailWorker, SmtpSender, LocalSMTPServer, QUEUED, SENT, FAILED
+
+
+@pytest.fixture
+def server():
+    srv = LocalSMTPServer(reject={"nobody@uni.my"}).start()
+    yield srv
+    srv.stop()
+
+
+def _worker(queue, host, port, **kw):
+    return MailWorker(queue, SmtpSender(host, port, starttls=False, sender="wbl@uni.my"), rate_per_minute=0, **kw)
+
+
+def _outbox(queue):
+    return queue._conn.execute("select to_addr, status, body from outbox order by id").fetchall()
+
+
+def test_sent_and_failed_bodies_are_redacted(tmp_path, server):
+    queue = MailQueue(str(tmp_path / "outbox.db"))
+    queue.enqueue("a@uni.my", "Recovery", "Your temporary password: s3cret", campaign="recovery")
+    queue.enqueue("nobody@uni.my", "Recovery", "Your temporary password: s3cret", campaign="recovery")
+
+    worker = _worker(queue, *server.address)
+    assert worker.run_once() == 2
+    worker.sender.close()
+
+    assert [m["to"] for m in server.messages] == [["a@uni.my"]]
+    assert "s3cret" in server.messages[0]["data"]
+    assert _outbox(queue) == [("a@uni.my", SENT, ""), ("nobody@uni.my", FAILED, "")]
+    assert queue.status_counts("recovery") == {SENT: 1, FAILED: 1}
+
+
+def test_retry_keeps_the_body(tmp_path):
+    with socket.socket() as s: # a port nothing listens on
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    queue = MailQueue(str(tmp_path / "outbox.db"))
+    queue.enqueue("a@uni.my", "Hello", "body")
+
+    _worker(queue, "127.0.0.1", port).run_once()
+    assert _outbox(queue) == [("a@uni.my", QUEUED, "body")]
+
+
+def test_existing_outbox_is_scrubbed(tmp_path):
+    path = str(tmp_path / "outbox.db")
+    queue = MailQueue(path)
+    queue.enqueue("a@uni.my", "Hello", "old secret")
+    queue._conn.execute("update outbox set status = ?", (SENT,)) # written by an older version
+    assert _outbox(MailQueue(path)) == [("a@uni.my", SENT, "")]
+
+
+def test_campaign_history_can_leave_out_recovery_mail(tmp_path):
+    queue = MailQueue(str(tmp_path / "outbox.db"))
+    queue.enqueue("a@uni.my", "Recovery", "x", campaign="recovery")
+    queue.enqueue_many([("b@uni.my", "Reminder", "y")], campaign="missing_docs-20261019-090000")
+    assert [c["campaign"] for c in queue.campaigns(exclude=("recovery",))] == ["missing_docs-20261019-090000"]
+    assert len(queue.campaigns()) == 2
+
+
+def test_daily_cap_leaves_the_rest_queued(tmp_path, server):
+    queue = MailQueue(str(tmp_path / "outbox.db"))
+    for i in range(3):
+        queue.enqueue(f"s{i}@uni.my", "Reminder", "Upload your logbook", campaign="c1")
+
+    worker = _worker(queue, *server.address, daily_cap=2)
+    assert worker.run_once() == 2
+    assert worker.run_once() == 0 # at the cap: nothing claimed, nothing retried
+    worker.sender.close()
+
+    assert len(server.messages) == 2
+    assert queue.status_counts("c1") == {SENT: 2, QUEUED: 1}
+    assert queue._conn.execute("select attempts from outbox where status = ?", (QUEUED,)).fetchone()[0] == 0
+    assert 0 < queue.cap_resets_in(2) <= 24 * 3600
+    assert queue.cap_resets_in(3) == 0
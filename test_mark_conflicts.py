@@ -0,0 +1,157 @@
+import sys
+sys.path.append('.')
+
+import pandas as pd
+import pytest
+
+import database as db
+from marking import MARK_FIELDS, edit_baseline, baseline_row, mark_changes, mark_patches
+
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Query:
+    """The slice of the PostgREST query builder used by database._conditional_update."""
+
+    def __init__(self, table, action, data=None):
+        self.table, self.action, self.data, self.preds = table, action, data, []
+
+    def eq(self, col, val):
+        self.preds.append(lambda r: r.get(col) == val)
+        return self
+
+    def is_(self, col, val):
+        self.preds.append(lambda r: r.get(col) is None)
+        return self
+
+    def execute(self):
+        hits = [r for r in self.table.rows if all(p(r) for p in self.preds)]
+        if self.action == "update":
+            for r in hits:
+                r.update(self.data)
+                r["row_version"] += 1 # the 005 trigger
+        return _Result([dict(r) for r in hits])
+
+
+class _Table:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def update(self, data):
+        return _Query(self, "update", data)
+
+    def select(self, *cols):
+        return _Query(self, "select")
+
+    def insert(self, rows):
+        return _Query(self, "select")
+
+
+class FakeSupabase:
+    def __init__(self, students):
+        self.tables = {"students": _Table(students), "audit_logs": _Table([])}
+
+    def table(self, name):
+        return self.tables[name]
+
+    def rpc(self, *args):
+        raise RuntimeError("save_marks_batch not installed") # exercise the per-row conditional path
+
+
+@pytest.fixture
+def students(monkeypatch):
+    rows = [
+        {"matrix_number": "B01", "fyp1_marks": 60.0, "fyp2_marks": None, "email": "a@x", "fyp_title": "IoT", "row_version": 1},
+        {"matrix_number": "B02", "fyp1_marks": None, "fyp2_marks": None, "email": "b@x", "fyp_title": None, "row_version": 1},
+    ]
+    monkeypatch.setattr(db, "sb", FakeSupabase(rows))
+    return rows
+
+
+def _roster(rows):
+    """The App roster as the editor renders it (App column names)."""
+    return pd.DataFrame({
+        "Matrix_No": [r["matrix_number"] for r in rows],
+        "FYP 1 Marks": [r["fyp1_marks"] for r in rows],
+        "FYP 2 Marks": [r["fyp2_marks"] for r in rows],
+        "Email": [r["email"] for r in rows],
+        "FYP_Title": [r["fyp_title"] for r in rows],
+        "row_version": [r["row_version"] for r in rows],
+    })
+
+
+def _other_writer(rows, matrix, **values):
+    """Another session saves first; our live roster is delta-synced to it before Save."""
+    row = next(r for r in rows if r["matrix_number"] == matrix)
+    row.update(values)
+    row["row_version"] += 1
+
+
+def test_concurrent_mark_edit_is_a_conflict(students):
+    baseline = edit_baseline(_roster(students), list(MARK_FIELDS)) # editor renders
+    _other_writer(students, "B01", fyp1_marks=65.0)
+    live = _roster(students) # what a refetch / change feed now holds
+
+    edited = live[["Matrix_No", "FYP 1 Marks"]].copy()
+    edited["FYP 1 Marks"] = [70.0, 50.0]
+    changes = mark_changes(baseline, edited, {("B01", "FYP 1 Marks"), ("B02", "FYP 1 Marks")})
+    assert changes.set_index("Matrix_No")["old"].to_dict() == {"B01": 60.0, "B02": pytest.approx(float("nan"), nan_ok=True)}
+
+    results = db.save_marks_batch(mark_patches(changes))
+    assert not results["B01"][0] and results["B01"][1].startswith("Conflict")
+    assert results["B02"] == (True, "Saved")
+    assert students[0]["fyp1_marks"] == 65.0 # the other grader's mark survives
+    assert students[1]["fyp1_marks"] == 50.0
+
+
+def test_unrelated_concurrent_edit_still_saves(students):
+    baseline = edit_baseline(_roster(students), list(MARK_FIELDS))
+    _other_writer(students, "B01", fyp2_marks=80.0)
+
+    edited = pd.DataFrame({"Matrix_No": ["B01"], "FYP 1 Marks": [70.0]})
+    results = db.save_marks_batch(mark_patches(mark_changes(baseline, edited, {("B01", "FYP 1 Marks")})))
+    assert results["B01"] == (True, "Saved")
+    assert (students[0]["fyp1_marks"], students[0]["fyp2_marks"]) == (70.0, 80.0)
+
+
+def test_cells_not_edited_are_not_written(students):
+    baseline = edit_baseline(_roster(students), list(MARK_FIELDS))
+    _other_writer(students, "B01", fyp1_marks=65.0)
+    # The editor now shows the synced 65 in a cell the grader never touched
+    edited = pd.DataFrame({"Matrix_No": ["B01", "B02"], "FYP 1 Marks": [65.0, 40.0]})
+    changes = mark_changes(baseline, edited, {("B02", "FYP 1 Marks")})
+    assert changes["Matrix_No"].tolist() == ["B02"]
+
+
+def test_dashboard_field_edit_uses_render_time_row(students):
+    baseline = edit_baseline(_roster(students), db.EDITABLE_COLUMNS)
+    _other_writer(students, "B01", email="new@x")
+
+    ok, msg = db.update_student_field("B01", "Email", "mine@x", original=baseline_row(baseline, "B01"))
+    assert not ok and msg.startswith("Conflict")
+    assert students[0]["email"] == "new@x"
+
+
+def test_stale_mark_save_keeps_the_other_graders_mark(students):
+    baseline = edit_baseline(_roster(students), list(MARK_FIELDS))
+    _other_writer(students, "B01", fyp1_marks=65.0) # saved after our editor rendered
+
+    edited = pd.DataFrame({"Matrix_No": ["B01"], "FYP 1 Marks": [40.0]})
+    results = db.save_marks_batch(mark_patches(mark_changes(baseline, edited, {("B01", "FYP 1 Marks")})))
+    assert results["B01"][1].startswith("Conflict")
+    assert students[0]["fyp1_marks"] == 65.0
+    assert not hasattr(db, "update_student_marks") # the unconditional writer is gone
+
+
+def test_bulk_titles_check_the_previewed_titles(students):
+    baseline = edit_baseline(_roster(students), ["FYP_Title"]) # file previewed
+    _other_writer(students, "B01", fyp_title="Robotics")
+
+    upload = pd.DataFrame({"Matrix Number": ["B01", "B02", "B01"], "FYP Title": ["Drones", "Solar", "IoT"]})
+    count, errors = db.bulk_update_titles(upload, {m: baseline_row(baseline, m) for m in baseline})
+    assert count == 1 # B02; the unchanged B01 row is skipped
+    assert len(errors) == 1 and errors[0].startswith("B01: Conflict")
+    assert [r["fyp_title"] for r in students] == ["Robotics", "Solar"]
@@ -0,0 +1,45 @@
+import sys
+sys.path.append('.')
+
+import numpy as np
+import pandas as pd
+
+from marking import edit_baseline, mark_changes, invalid_marks, mark_patches, MARK_FIELDS
+
+
+def _baseline():
+    shown = pd.DataFrame({
+        "Matrix_No": ["B01", "B02", "B03"],
+        "FYP 1 Marks": [60.0, None, 70.0],
+        "FYP 2 Marks": [None, 55.5, 80.0],
+        "row_version": [3, 1, 2],
+    })
+    return edit_baseline(shown, list(MARK_FIELDS))
+
+
+def test_only_changed_marks_are_reported():
+    edited = pd.DataFrame({
+        "Matrix_No": ["B01", "B02", "B03"],
+        "FYP 1 Marks": ["60", "", 120.0], # same mark as text, still blank, out of range
+        "FYP 2 Marks": [None, 55.501, None], # unchanged after rounding, cleared
+    })
+    changes = mark_changes(_baseline(), edited)
+    assert list(zip(changes["Matrix_No"], changes["column"])) == [("B03", "FYP 1 Marks"), ("B03", "FYP 2 Marks")]
+    assert changes["old"].tolist() == [70.0, 80.0]
+    assert changes["row_version"].tolist() == [2, 2]
+    assert invalid_marks(changes).tolist() == [True, False] # 120 is refused, a blank clears
+
+
+def test_hidden_subjects_and_untouched_cells_are_not_compared():
+    edited = pd.DataFrame({"Matrix_No": ["B01", "B02"], "FYP 1 Marks": [65.0, 40.0]}) # FYP 2 not shown
+    assert mark_changes(_baseline(), edited, cells={("B02", "FYP 1 Marks")})["Matrix_No"].tolist() == ["B02"]
+    assert mark_changes(_baseline(), edited.drop(columns="FYP 1 Marks")).empty
+
+
+def test_patches_group_a_students_marks():
+    edited = pd.DataFrame({"Matrix_No": ["B02", "B09"], "FYP 1 Marks": [45.0, 50.0], "FYP 2 Marks": [np.nan, 60.0]})
+    patches = mark_patches(mark_changes(_baseline(), edited))
+    assert patches == [
+        {"matrix_number": "B02", "row_version": 1, "expected": {"fyp1_marks": None, "fyp2_marks": 55.5}, "fyp1_marks": 45.0, "fyp2_marks": None},
+        {"matrix_number": "B09", "expected": {"fyp1_marks": None, "fyp2_marks": None}, "fyp1_marks": 50.0, "fyp2_marks": 60.0}, # not in the baseline
+    ]
@@ -0,0 +1,102 @@
+import sys
+sys.path.append('.')
+
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import credentials
+import database as db
+from credentials import hash_password, hash_passwords, verify_password
+
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Query:
+    def __init__(self, rows, data=None):
+        self.rows, self.data, self.preds = rows, data, []
+
+    def eq(self, col, val):
+        self.preds.append(lambda r: r.get(col) == val)
+        return self
+
+    def execute(self):
+        hits = [r for r in self.rows if all(p(r) for p in self.preds)]
+        for r in hits:
+            if self.data is not None: r.update(self.data)
+        return _Result([dict(r) for r in hits])
+
+
+class FakeSupabase:
+    def __init__(self, staff):
+        self.staff = staff
+
+    def table(self, name):
+        return self
+
+    def select(self, *cols):
+        return _Query(self.staff)
+
+    def update(self, data):
+        return _Query(self.staff, data)
+
+
+@pytest.fixture
+def staff(monkeypatch):
+    row = {"staff_id": 7, "staff_id_number": "S7", "staff_email": "z@uni.my", "staff_password": hash_password("old-pass")}
+    monkeypatch.setattr(db, "sb", FakeSupabase([row]))
+    return row
+
+
+def test_reset_keeps_the_current_password(staff):
+    assert db.reset_staff_password("S7", "wrong@uni.my")[0] is False
+    ok, temp = db.reset_staff_password("S7", "Z@uni.my ")
+    assert ok and temp
+    # Knowing the ID and email is not enough to lock the owner out
+    assert db.verify_staff_login("S7", "old-pass") is not None
+    assert staff["reset_password"] is None # the owner's login cancelled the reset
+    assert db.verify_staff_login("S7", temp) is None
+
+
+def test_temporary_password_replaces_on_first_use(staff):
+    ok, temp = db.reset_staff_password("S7", "z@uni.my")
+    assert db.verify_staff_login("S7", temp) is not None
+    assert staff["reset_password"] is None
+    assert db.verify_staff_login("S7", temp) is not None # now the password
+    assert db.verify_staff_login("S7", "old-pass") is None
+
+
+def test_expired_reset_is_refused(staff):
+    ok, temp = db.reset_staff_password("S7", "z@uni.my")
+    staff["reset_expires_at"] = (datetime.now(timezone.utc) - timedelta(minutes=1)).isoformat()
+    assert db.verify_staff_login("S7", temp) is None
+    assert db.verify_staff_login("S7", "old-pass") is not None
+
+
+def test_login_row_leaves_out_password_and_reset(staff):
+    db.reset_staff_password("S7", "z@uni.my")
+    row = db.verify_staff_login("S7", "old-pass")
+    assert row["staff_id"] == 7
+    assert not {"staff_password", *db.RESET_COLUMNS} & set(row)
+
+
+def test_password_writes_hash_on_the_pool(staff, monkeypatch):
+    threads = []
+    def hashing(password, cost=None):
+        threads.append(threading.current_thread().name)
+        return hash_password(password, cost=4)
+    monkeypatch.setattr(credentials, "hash_password", hashing)
+
+    assert db.update_staff_password("S7", "new-pass") == (True, "Password updated.")
+    assert db.reset_staff_password("S7", "z@uni.my")[0]
+    assert len(threads) == 2 and all(t.startswith("password-verify") for t in threads)
+    assert verify_password("new-pass", staff["staff_password"])[0]
+
+
+def test_bulk_hashes_keep_their_order_across_chunks():
+    hashes = hash_passwords([f"B0{i}" for i in range(5)], chunk=2)
+    assert [verify_password(f"B0{i}", h)[0] for i, h in enumerate(hashes)] == [True] * 5
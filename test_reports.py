@@ -0,0 +1,44 @@
+import io
+import re
+import sys
+import zipfile
+sys.path.append('.')
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from grading import grade_order
+from reports import render_report
+
+
+def _report():
+    rows = pd.DataFrame({
+        "Matrix_No": ["B03", "B01", "B02", "B04"],
+        "Student_Name": ["C", "A", "B", "D"],
+        "FYP 1 Marks": [92.0, 55.0, None, 81.0],
+        "FYP 1 SV": ["Dr A", "Dr B", "-", None],
+        "FYP 1 Panel": [None] * 4,
+        "FYP_Company": ["Acme"] * 4,
+        "FYP Title": ["IoT"] * 4,
+    })
+    return render_report("BEB", "2024", "FYP 1", rows)
+
+
+def test_chart_references_the_grade_table():
+    name, data = _report()
+    assert name == "BEB/2024/BEB_2024_FYP_1.xlsx"
+    labels = grade_order(None)
+
+    summary = load_workbook(io.BytesIO(data))["Summary"]
+    table = [[c.value for c in row] for row in summary.iter_rows(min_col=1, max_col=2)]
+    header = table.index(["Grade Range", "Count"]) + 1
+    assert [r[0] for r in table[header:]] == labels
+    assert sum(r[1] for r in table[header:]) == 3 # graded students only
+
+    chart = zipfile.ZipFile(io.BytesIO(data)).read("xl/charts/chart1.xml").decode()
+    refs = re.findall(r"<(?:c:)?f>([^<]+)</(?:c:)?f>", chart)
+    last = header + len(labels)
+    # Series title = the "Count" header, categories/values = exactly the grade rows
+    assert f"'Summary'!$B${header}" in refs or f"'Summary'!B{header}" in refs
+    assert f"'Summary'!$A${header + 1}:$A${last}" in refs
+    assert f"'Summary'!$B${header + 1}:$B${last}" in refs
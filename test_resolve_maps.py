@@ -0,0 +1,62 @@
+import sys
+sys.path.append('.')
+
+import pandas as pd
+import pytest
+
+import database as db
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    calls = []
+    def companies():
+        calls.append("companies")
+        return pd.DataFrame({"company_id": [1], "Company Name": ["Acme"], "State": ["Johor"], "Address": ["a"]})
+    def staff():
+        calls.append("staff")
+        return pd.DataFrame({"staff_id": [2], "staff_name": ["Dr B"]})
+    monkeypatch.setattr(db, "get_companies", companies)
+    monkeypatch.setattr(db, "get_staff", staff)
+    monkeypatch.setattr(db, "_resolve_maps", (None, 0, None))
+    return calls
+
+
+ROW = {"matrix_number": "B01", "name": "A", "fyp_company_id": 1, "fyp_sv_id": 2, "fyp1_panel_id": None}
+
+
+def test_feed_batches_reuse_the_company_and_staff_maps(fetches):
+    for _ in range(3):
+        df = db.resolve_student_rows([ROW])
+    assert fetches == ["companies", "staff"]
+    assert df[["FYP_Company", "FYP_State", "FYP 1 SV"]].iloc[0].tolist() == ["Acme", "Johor", "Dr B"]
+
+
+def test_company_write_drops_the_maps(fetches):
+    db.resolve_student_rows([ROW])
+    db.notify_change("companies")
+    db.resolve_student_rows([ROW])
+    assert fetches == ["companies", "staff"] * 2
+
+
+def test_full_load_fetches_fresh_maps(fetches):
+    db.resolve_student_rows([ROW])
+    db._resolve_students(pd.DataFrame([ROW]))
+    assert fetches == ["companies", "staff"] * 2
+
+
+class _Wipe:
+    def table(self, name): return self
+    def delete(self): return self
+    def neq(self, col, val): return self
+    def execute(self): return None
+
+
+def test_clear_all_data_drops_the_maps_and_notifies_every_table(fetches, monkeypatch):
+    monkeypatch.setattr(db, "sb", _Wipe())
+    db.resolve_student_rows([ROW])
+    before = {t: db.change_version(t) for t in ("students", "companies", "staff", "rubrics")}
+    assert db.clear_all_data() == (True, "All data wiped.")
+    assert all(db.change_version(t) == v + 1 for t, v in before.items())
+    db.resolve_student_rows([ROW])
+    assert fetches == ["companies", "staff"] * 2
@@ -0,0 +1,60 @@
+import sys
+sys.path.append('.')
+
+import pandas as pd
+import pytest
+
+import database as db
+
+
+ROW = {"matrix_number": "B01", "name": "A", "search_text": "b01 a", "search_tsv": "'a':2 'b01':1",
+       "reset_password": "scrypt$...", "reset_expires_at": None}
+
+
+class _Query:
+    def __init__(self, calls, cols):
+        self.calls, self.cols = calls, cols
+        calls.append(cols)
+
+    def limit(self, n):
+        return self
+
+    def order(self, col):
+        return self
+
+    def execute(self):
+        keep = ROW if self.cols == "*" else {c: ROW[c] for c in self.cols.split(",")}
+        return type("Result", (), {"data": [dict(keep)]})()
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.selects = []
+
+    def table(self, name):
+        return self
+
+    def select(self, cols):
+        return _Query(self.selects, cols)
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    sb = FakeSupabase()
+    monkeypatch.setattr(db, "sb", sb)
+    monkeypatch.setattr(db, "_roster_columns", {})
+    return sb
+
+
+def test_roster_reads_leave_search_and_reset_columns_on_the_server(fake):
+    for _ in range(2):
+        rows = db._fetch_student_rows("students")
+    assert fake.selects == ["*", "matrix_number,name", "matrix_number,name"] # columns learned once
+    assert rows == [{"matrix_number": "B01", "name": "A"}]
+
+
+def test_resolved_roster_drops_unfetched_columns(monkeypatch):
+    monkeypatch.setattr(db, "_cached_resolve_maps", lambda: ({}, {}, {}, {}))
+    df = db.resolve_student_rows([ROW])
+    assert not set(db.UNFETCHED_COLUMNS) & set(df.columns)
+    assert df["Matrix_No"].tolist() == ["B01"]
@@ -0,0 +1,57 @@
+import sys
+sys.path.append('.')
+
+import csv
+
+import pandas as pd
+import pyarrow.parquet as pq
+from openpyxl import load_workbook
+
+from roster_export import export_roster, export_columns
+
+VISIBLE = ["Sync?", "No.", "Matrix_No", "Student_Name", "Password", "Lapor Diri", "FYP 1 Marks", "Status", "FYP Title"]
+
+
+def _roster(n=5):
+    return pd.DataFrame({
+        "Matrix_No": [f"B{i:02d}" for i in range(n)],
+        "Student_Name": ["Nurul Aín", None, "", "Lee", "Tan"][:n],
+        "Password": ["scrypt$14$8$1$salt$hash"] * n,
+        "Lapor Diri": ["a.pdf", "", None, "d.pdf", "e.pdf"][:n],
+        "Aku Janji": ["x.pdf"] * n,
+        "FYP 1 Marks": [80, None, "45.5", 40, 0][:n],
+        "FYP 2 Marks": [70] * n,
+        "LI Marks": [60] * n,
+        "FYP_Title": ["IoT"] * n,
+    })
+
+
+def test_header_skips_editor_columns_and_passwords():
+    assert export_columns(VISIBLE) == ["No.", "Matrix_No", "Student_Name", "Lapor Diri", "FYP 1 Marks", "FYP 1 Grade", "Status", "FYP Title"]
+
+
+def test_chunks_are_written_as_one_roster(tmp_path):
+    path, n = export_roster(_roster(), VISIBLE, "CSV", path=str(tmp_path / "r.csv"), chunk_size=2)
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert n == len(rows) == 5
+    assert "Password" not in rows[0] and "scrypt" not in open(path, encoding="utf-8-sig").read()
+    assert [r["No."] for r in rows] == ["1", "2", "3", "4", "5"] # numbering continues across chunks
+    assert [r["Student_Name"] for r in rows] == ["Nurul Aín", "", "", "Lee", "Tan"]
+    assert [r["Lapor Diri"] for r in rows] == ["Submitted", "Missing", "Missing", "Submitted", "Submitted"]
+    assert [r["FYP 1 Grade"] for r in rows] == ["A", "", "D+", "D", "E"]
+    assert [r["Status"] for r in rows] == ["Graded", "Incomplete", "Incomplete", "Graded", "Ongoing"] # a 0 mark is ungraded
+    assert rows[0]["FYP Title"] == "IoT"
+
+
+def test_parquet_and_excel_keep_types(tmp_path):
+    path, _ = export_roster(_roster(), VISIBLE, "Parquet", path=str(tmp_path / "r.parquet"), chunk_size=2)
+    table = pq.read_table(path)
+    assert "Password" not in table.column_names
+    assert table.column("FYP 1 Marks").to_pylist() == [80.0, None, 45.5, 40.0, 0.0]
+    assert table.column("No.").to_pylist() == [1, 2, 3, 4, 5]
+
+    path, _ = export_roster(_roster(3), VISIBLE, "Excel", path=str(tmp_path / "r.xlsx"), chunk_size=2)
+    rows = list(load_workbook(path, read_only=True)["Roster"].values)
+    assert rows[0] == tuple(export_columns(VISIBLE))
+    assert [r[4] for r in rows[1:]] == [80, None, 45.5]
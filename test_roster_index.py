@@ -0,0 +1,101 @@
+import sys
+sys.path.append('.')
+
+import pandas as pd
+
+from roster_index import StaffIndex, SearchIndex, DASHBOARD_ROLES, ticked_matrices, resolve_selection, matrix_indexed
+
+
+def _roster():
+    # Raw id columns as database.get_students keeps them: floats, strings and blanks mixed
+    return pd.DataFrame({
+        "Matrix_No": ["B01", "B02", "B03", "B04"],
+        "fyp_sv_id": [22.0, "22", 7, None],
+        "li_sv_id": [22, None, None, "-"],
+        "fyp1_panel_id": [7, 22.0, "", 7],
+        "fyp2_panel_id": [None, None, None, None],
+        "li_industry_sv_id": [None, None, None, 5],
+    }, index=[10, 11, 12, 13])
+
+
+def test_staff_ids_are_normalized_across_columns():
+    index = StaffIndex(_roster())
+    assert index.matrices("22", ["SV"]) == {"B01", "B02"} # 22.0, "22" and 22 are one id
+    assert index.matrices(22.0) == {"B01", "B02"}
+    assert index.matrices(7, ["Panel"]) == {"B01", "B04"}
+    assert index.matrices(None) == set()
+    assert index.rows("99").empty
+
+
+def test_dashboard_roles_select_rows_of_a_slice():
+    df = _roster()
+    index = StaffIndex(df)
+    assert index.select(df, 7, DASHBOARD_ROLES["Supervisor (SV)"])["Matrix_No"].tolist() == ["B03"]
+    assert index.select(df, 7, DASHBOARD_ROLES["Both (Any)"])["Matrix_No"].tolist() == ["B01", "B03", "B04"]
+    assert index.select(df.loc[[12, 13]], 7)["Matrix_No"].tolist() == ["B03", "B04"] # filtered view
+    assert index.select(df, 5, DASHBOARD_ROLES["Panelist"]).empty
+
+
+def test_students_per_staff_counts_each_student_once():
+    index = StaffIndex(_roster())
+    # B01 is 22's SV on both FYP and LI, and B02 also has 22 as panel: two students, not four
+    assert index.students_per_staff().to_dict() == {"22": 2, "7": 3, "5": 1}
+    assert index.students_per_staff(["Panel"]).to_dict() == {"7": 2, "22": 1}
+    assert index.students_per_staff().index[0] == "7" # busiest first
+
+
+def _students():
+    return pd.DataFrame({
+        "Matrix_No": ["B032110001", "B032110042", "B032110777"],
+        "Student_Name": ["Nurul Aín", "Malik Tan", "Ain Lee"],
+        "Email": ["nurul@uni.my", "malik@uni.my", "lee@uni.my"],
+        "FYP_Title": ["Solar tracker", "Smart ain't grid", "Malik's IoT farm"],
+    }, index=[5, 6, 7])
+
+
+def test_search_ranks_by_field_and_match_kind():
+    index = SearchIndex(_students())
+    # Exact name hits (weight 3) beat the exact title hit (weight 1); folding drops the accent
+    assert index.search("ain").tolist() == [0, 2, 1]
+    # A name prefix outranks the same word inside a title
+    assert index.search("mal").tolist() == [1, 2]
+    assert index.search("").tolist() == [0, 1, 2]
+    assert index.search("zzz").tolist() == []
+
+
+def test_search_matches_infixes_and_short_terms():
+    index = SearchIndex(_students())
+    assert index.search("0042").tolist() == [1] # tail of a matrix number (trigram path)
+    assert index.search("li").tolist() == [1, 2] # shorter than a trigram: vocabulary scan
+    assert index.search("lee solar").tolist() == [] # every term must match
+    assert index.search("malik iot").tolist() == [2] # both terms, across name and title fields
+
+
+def test_search_select_keeps_the_ranking_within_a_slice():
+    df = _students()
+    index = SearchIndex(df)
+    assert index.select(df, "ain")["Matrix_No"].tolist() == ["B032110001", "B032110777", "B032110042"]
+    assert index.select(df.loc[[6, 7]], "ain")["Matrix_No"].tolist() == ["B032110777", "B032110042"]
+
+
+def test_ticks_map_page_positions_to_matrix_numbers():
+    view = ["B01", "B02", "B03", "B04"]
+    pages = [
+        (["B01", "B02"], {"edited_rows": {0: {"Sync?": False}, 1: {"FYP 1 Marks": 50}}}), # int keys
+        (["B03", "B04"], {"edited_rows": {"1": {"Sync?": False}, "7": {"Sync?": False}}}), # str keys, stale row
+    ]
+    assert ticked_matrices(view, True, pages).tolist() == [False, True, True, False]
+    assert ticked_matrices(view, False, [(["B03"], {"edited_rows": {"0": {"Sync?": True}}}), (["B03"], None)]).tolist() == [False, False, True, False]
+
+
+def test_later_editor_wins_for_the_same_student():
+    pages = [(["B02"], {"edited_rows": {0: {"Sync?": True}}}), (["B02"], {"edited_rows": {"0": {"Sync?": False}}})]
+    assert ticked_matrices(["B01", "B02"], False, pages).tolist() == [False, False]
+
+
+def test_selection_returns_the_source_rows():
+    source = pd.DataFrame({"Matrix_No": ["B01", "B02", "B02", "B03"], "Email": ["a", "b", "b2", "c"]})
+    view = pd.DataFrame({"Matrix_No": ["B03", "B02", "B09"]}) # formatted view, B09 left the roster
+    matrices, rows = resolve_selection(view, matrix_indexed(source), True, [(["B03"], {"edited_rows": {"0": {"Sync?": False}}})])
+    assert matrices == {"B02", "B09"}
+    assert rows["Email"].tolist() == ["b"] # first duplicate wins; unknown matrix dropped
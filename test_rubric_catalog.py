@@ -0,0 +1,82 @@
+import sys
+sys.path.append('.')
+
+import pytest
+
+import database as db
+
+
+class _Query:
+    def __init__(self, sb, rows):
+        self.sb, self.rows = sb, rows
+
+    def select(self, cols):
+        self.sb.calls.append(("select", cols))
+        return self
+
+    def eq(self, col, val):
+        self.sb.calls.append(("eq", col, val))
+        return self
+
+    def order(self, col, desc=False):
+        self.sb.calls.append(("order", col, desc))
+        return self
+
+    def range(self, start, end):
+        self.sb.calls.append(("range", start, end))
+        return self
+
+    def execute(self):
+        return type("Result", (), {"data": self.rows})()
+
+
+class FakeSupabase:
+    def __init__(self, rubrics, catalog=None):
+        self.rubrics, self.catalog, self.calls = rubrics, catalog, []
+
+    def table(self, name):
+        return _Query(self, self.rubrics)
+
+    def rpc(self, name, params):
+        if self.catalog is None:
+            raise RuntimeError("rubric_catalog not installed")
+        return _Query(self, self.catalog)
+
+
+RUBRICS = [
+    {"subject": "FYP 1", "cohort": "2024"},
+    {"subject": "FYP 1", "cohort": "2024"},
+    {"subject": "FYP 1", "cohort": None},
+    {"subject": "LI", "cohort": 2023},
+]
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    sb = FakeSupabase(RUBRICS)
+    monkeypatch.setattr(db, "sb", sb)
+    return sb
+
+
+def test_catalog_counts_from_the_server(fake):
+    fake.catalog = [{"subject": "FYP 1", "cohort": "2024", "n": 2}, {"subject": "LI", "cohort": None, "n": 5}]
+    assert db.get_rubric_catalog() == {("FYP 1", "2024"): 2, ("LI", ""): 5}
+    assert fake.calls == [] # no rubric rows read
+
+
+def test_catalog_falls_back_to_two_columns(fake):
+    assert db.get_rubric_catalog() == {("FYP 1", "2024"): 2, ("FYP 1", ""): 1, ("LI", "2023"): 1}
+    assert fake.calls == [("select", "subject,cohort")]
+
+
+def test_page_is_filtered_ordered_and_ranged_by_the_server(fake):
+    df = db.get_rubric_page("FYP 1", "2024", offset=40, limit=20)
+    assert len(df) == len(RUBRICS)
+    assert fake.calls == [
+        ("select", "*"), ("eq", "subject", "FYP 1"), ("eq", "cohort", "2024"),
+        ("order", "cohort", True), ("order", "item_name", False), ("order", "rubric_id", False),
+        ("range", 40, 59),
+    ]
+    fake.calls.clear()
+    db.get_rubric_page("LI")
+    assert ("eq", "cohort", None) not in fake.calls and ("range", 0, 19) in fake.calls
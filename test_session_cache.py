@@ -0,0 +1,62 @@
+import sys
+sys.path.append('.')
+
+import pytest
+
+import database as db
+from session_cache import IdentityCache
+
+
+@pytest.fixture
+def loads():
+    return {"students": 0, "rubrics": 0}
+
+
+def _cache(loads, versions, **kw):
+    def loader(name):
+        def load():
+            loads[name] += 1
+            return f"{name} v{loads[name]}"
+        return load
+    return IdentityCache("S7", {
+        "students": (loader("students"), ["students", "companies"]),
+        "rubrics": (loader("rubrics"), ["rubrics"]),
+    }, version_fn=lambda tables: tuple(versions.get(t, 0) for t in tables), **kw)
+
+
+def test_values_are_reused_until_their_tables_change(loads):
+    versions = {}
+    cache = _cache(loads, versions)
+    assert cache.get("students", timeout=5) == "students v1"
+    assert cache.get("students", timeout=5) == "students v1"
+
+    versions["companies"] = 1 # a write to a table the students entry reads
+    assert cache.get("students", timeout=5) == "students v2"
+    assert cache.get("rubrics", timeout=5) == "rubrics v1" # other entries keep their value
+    assert loads == {"students": 2, "rubrics": 1}
+
+
+def test_old_values_are_refetched_after_ttl(loads):
+    cache = _cache(loads, {}, ttl=60)
+    assert cache.get("rubrics", timeout=5) == "rubrics v1"
+    version, _, future = cache._entries["rubrics"]
+    cache._entries["rubrics"] = (version, 0, future) # fetched long ago
+    assert cache.get("rubrics", timeout=5) == "rubrics v2"
+
+
+def test_errors_are_captured_and_the_load_retried(loads):
+    def capture(loader):
+        value = loader()
+        return value, ["Error fetching students: timeout"] if value == "students v1" else []
+    cache = _cache(loads, {}, capture=capture)
+    assert cache.get("students", timeout=5) == "students v1"
+    assert cache.errors("students") == ["Error fetching students: timeout"] # shown by the page
+    assert cache.get("students", timeout=5) == "students v2" # a load that reported errors is retried
+    assert cache.errors("students") == []
+
+
+def test_change_version_feeds_the_cache():
+    cache = IdentityCache("S7", {"rubrics": (lambda: db.change_version("rubrics"), ["rubrics"])}, version_fn=lambda tables: tuple(db.change_version(t) for t in tables))
+    before = cache.get("rubrics", timeout=5)
+    db.notify_change("rubrics")
+    assert cache.get("rubrics", timeout=5) == before + 1
@@ -0,0 +1,32 @@
+import sys
+sys.path.append('.')
+
+import pytest
+
+from bench_startup import app_imports, first_paint, LAZY_MODULES, FIRST_PAINT_TARGET_S, APP_IMPORTS_TARGET_S
+
+# Startup budgets from bench_startup.py, measured in fresh interpreters (a few seconds each)
+
+
+@pytest.fixture(scope="module")
+def landing():
+    return first_paint()[0]
+
+
+def test_landing_page_renders(landing):
+    assert not landing["exceptions"], landing["exceptions"]
+    assert landing["title"] == ["🎓 WBL Student Management System"]
+
+
+def test_heavy_modules_stay_lazy(landing):
+    eager = [m for m in LAZY_MODULES if m in landing["loaded"]]
+    assert not eager, f"loaded at startup, should be lazy: {eager}"
+
+
+def test_first_paint_budget(landing):
+    assert landing["first_paint_s"] < FIRST_PAINT_TARGET_S
+
+
+def test_app_import_budget():
+    total = sum(secs for secs, _ in app_imports().values())
+    assert total < APP_IMPORTS_TARGET_S, f"app imports {total:.2f} s > {APP_IMPORTS_TARGET_S} s"
@@ -0,0 +1,79 @@
+import sys
+sys.path.append('.')
+
+import pandas as pd
+import pytest
+
+import database as db
+
+
+class _Query:
+    """Records the PostgREST calls made on a students / companies query."""
+
+    def __init__(self, sb, table):
+        self.sb, self.table, self.calls = sb, table, []
+        sb.queries.append(self)
+
+    def select(self, cols):
+        self.calls.append(("select", cols))
+        return self
+
+    def eq(self, col, val):
+        self.calls.append(("eq", col, val))
+        return self
+
+    def or_(self, expr):
+        self.calls.append(("or", expr))
+        return self
+
+    def order(self, col):
+        return self
+
+    def execute(self):
+        return type("Result", (), {"data": self.sb.data[self.table]})()
+
+
+class FakeSupabase:
+    def __init__(self, companies, students):
+        self.data = {"companies": companies, "students": students}
+        self.queries = []
+
+    def table(self, name):
+        return _Query(self, name)
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    sb = FakeSupabase([{"company_id": 1}, {"company_id": 4}], [{"matrix_number": "B01", "program": "BEB"}])
+    monkeypatch.setattr(db, "sb", sb)
+    monkeypatch.setattr(db, "_roster_columns", {"students": "matrix_number,program"})
+    monkeypatch.setattr(db, "_fetch_resolve_maps", lambda: ({}, {}, {}, {}))
+    return sb
+
+
+def test_filters_become_predicates(fake):
+    eqs, groups = db.student_filter_predicates({"program": "BEB", "cohort": None, "state": "Johor", "staff_id": 7, "staff_columns": ["fyp_sv_id", "li_industry_sv_id"]})
+    assert eqs == {"program": "BEB"}
+    assert groups == [["fyp_company_id.in.(1,4)", "li_company_id.in.(1,4)"], ["fyp_sv_id.eq.7"]] # unknown staff column dropped
+    assert fake.queries[0].calls == [("select", "company_id"), ("eq", "state", "Johor")]
+
+
+def test_several_or_groups_must_all_hold(fake):
+    query = db.apply_student_filters(fake.table("students"), ({"cohort": "2024"}, [["a.eq.1", "b.eq.1"], ["c.eq.2"]]))
+    assert query.calls == [("eq", "cohort", "2024"), ("or", "and(or(a.eq.1,b.eq.1),or(c.eq.2))")]
+    single = db.apply_student_filters(fake.table("students"), ({}, [["a.eq.1", "b.eq.1"]]))
+    assert single.calls == [("or", "a.eq.1,b.eq.1")]
+
+
+def test_empty_slices_skip_the_roster_query(fake):
+    fake.data["companies"] = []
+    assert db.get_students_slice({"state": "Perlis"}).empty
+    assert db.get_students_slice({"staff_id": 7, "staff_columns": ["li_industry_sv_id"]}).empty
+    assert [q.table for q in fake.queries] == ["companies"]
+
+
+def test_slice_reads_only_the_filtered_rows(fake):
+    df = db.get_students_slice({"program": "BEB"})
+    [students] = fake.queries
+    assert students.calls == [("select", "matrix_number,program"), ("eq", "program", "BEB")]
+    assert df["Matrix_No"].tolist() == ["B01"]
@@ -0,0 +1,37 @@
+import sys
+sys.path.append('.')
+
+import pytest
+
+from supabase_handler import LazyClient, SupabaseUnavailable, create_supabase_client
+
+
+def test_failed_build_is_cached_not_retried_per_call():
+    calls = []
+    def factory():
+        calls.append(1)
+        raise SupabaseUnavailable("Missing Secrets!")
+    client = LazyClient(factory, retry_after=60)
+    assert not client and not client
+    with pytest.raises(SupabaseUnavailable, match="Missing Secrets"):
+        client.table("students")
+    assert len(calls) == 1
+    assert client.error == "Missing Secrets!"
+
+
+def test_build_is_retried_after_the_window():
+    results = [SupabaseUnavailable("down"), "client"]
+    def factory():
+        r = results.pop(0)
+        if isinstance(r, Exception): raise r
+        return type("Client", (), {"table": lambda self, name: name})()
+    client = LazyClient(factory, retry_after=0)
+    assert not client
+    assert client.table("students") == "students"
+    assert client.error is None
+
+
+def test_factory_raises_instead_of_rendering(monkeypatch):
+    monkeypatch.setattr("supabase_handler.get_supabase_credentials", lambda: (None, None))
+    with pytest.raises(SupabaseUnavailable):
+        create_supabase_client()